@@ -0,0 +1,4 @@
+"""Performance benchmarks for TalkMatch hot paths.
+
+Run ``python -m benchmarks`` from the repository root.
+"""
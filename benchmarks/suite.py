@@ -0,0 +1,279 @@
+"""Benchmark cases and runner for matcher, stores and the chat turn path.
+
+Each case builds its fixtures outside the timed region and returns a
+zero-argument callable.  Results are written as JSON and compared with a
+stored baseline; a case whose median exceeds ``threshold`` times its
+baseline median is reported as a regression and makes the run exit 1.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+from talkmatch.ai import AIClient
+from talkmatch.chat import ChatSession
+from talkmatch.coverage import ObjectiveCoverage
+from talkmatch.fake_openai import FakeOpenAI
+from talkmatch.matcher import Matcher
+from talkmatch.objectives import PROFILE_OBJECTIVES
+from talkmatch.pools import PooledMatcher, PoolPolicy
+from talkmatch.simulator import generate_personas
+from talkmatch.storage import ChatStore, MatchMatrixStore, ProfileStore, available_codecs
+from talkmatch.storage.codecs import decode, get_codec
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+Case = Callable[[Path], Callable[[], object]]
+CASES: List[Tuple[str, Case]] = []
+
+
+def benchmark(name: str) -> Callable[[Case], Case]:
+    """Register a benchmark case under ``name``."""
+
+    def register(case: Case) -> Case:
+        CASES.append((name, case))
+        return case
+
+    return register
+
+
+def _stub_ai() -> AIClient:
+    return AIClient(openai_client=FakeOpenAI())
+
+
+def _users(n: int) -> List[str]:
+    return [f"user{i:05d}" for i in range(n)]
+
+
+def _matrix(users: List[str]) -> Dict[str, Dict[str, float]]:
+    return {
+        u: {v: ((i * 31 + j * 17) % 100) / 100 for j, v in enumerate(users) if v != u}
+        for i, u in enumerate(users)
+    }
+
+
+def _history(n: int) -> List[Dict[str, str]]:
+    return [
+        {"role": "user" if i % 2 else "assistant", "content": f"message {i} " * 8}
+        for i in range(n)
+    ]
+
+
+# Matcher ---------------------------------------------------------------------
+for _n in (10, 25, 50):
+
+    @benchmark(f"matcher.calculate[n={_n}]")
+    def _calculate(tmp: Path, n: int = _n) -> Callable[[], object]:
+        users = _users(n)
+        matcher = Matcher(users, path=tmp / "matrix.json")
+        profiles = ProfileStore(base_dir=tmp)
+        profiles.profiles.update({u: f"profile of {u}" for u in users})
+        ai = _stub_ai()
+        return lambda: matcher.calculate(ai, profile_store=profiles)
+
+
+for _n in (50, 200):
+
+    @benchmark(f"pooled.calculate[n={_n}]")
+    def _pooled_calculate(tmp: Path, n: int = _n) -> Callable[[], object]:
+        attributes = {p.name: p.attributes for p in generate_personas(n)}
+        matcher = PooledMatcher(
+            list(attributes), tmp / "pools", attributes.__getitem__, PoolPolicy(("languages", "age"))
+        )
+        profiles = ProfileStore(base_dir=tmp)
+        profiles.profiles.update({u: f"profile of {u}" for u in attributes})
+        ai = _stub_ai()
+        return lambda: matcher.calculate(ai, profile_store=profiles)
+
+
+for _n in (100, 1000):
+
+    @benchmark(f"matcher.top_matches[n={_n}]")
+    def _top_matches(tmp: Path, n: int = _n) -> Callable[[], object]:
+        users = _users(n)
+        matcher = Matcher([], path=tmp / "matrix.json")
+        matcher.users = users
+        matcher.matrix = _matrix(users)
+        return lambda: matcher.top_matches(users[n // 2])
+
+
+# Stores ------------------------------------------------------------------------
+for _n in (100, 500):
+
+    @benchmark(f"match_matrix.save[n={_n}]")
+    def _matrix_save(tmp: Path, n: int = _n) -> Callable[[], object]:
+        store = MatchMatrixStore(tmp / "matrix.json")
+        matrix = _matrix(_users(n))
+        return lambda: store.save(matrix)
+
+    @benchmark(f"match_matrix.load[n={_n}]")
+    def _matrix_load(tmp: Path, n: int = _n) -> Callable[[], object]:
+        users = _users(n)
+        store = MatchMatrixStore(tmp / "matrix.json")
+        store.save(_matrix(users))
+        return lambda: store.load(users)
+
+
+for _spec in available_codecs():
+
+    @benchmark(f"codec.matrix_roundtrip[n=500,codec={_spec}]")
+    def _codec_matrix(tmp: Path, spec: str = _spec) -> Callable[[], object]:
+        codec = get_codec(spec)
+        matrix = _matrix(_users(500))
+        return lambda: decode(codec.encode(matrix))
+
+
+for _n in (100, 1000, 5000):
+
+    @benchmark(f"chat_store.save[messages={_n}]")
+    def _chat_save(tmp: Path, n: int = _n) -> Callable[[], object]:
+        store = ChatStore(path=tmp / "history.json")
+        history = _history(n)
+        return lambda: store.save(history)
+
+
+for _n in (100, 1000):
+
+    @benchmark(f"profile_store.update[profiles={_n}]")
+    def _profile_update(tmp: Path, n: int = _n) -> Callable[[], object]:
+        store = ProfileStore(base_dir=tmp)
+        store.profiles.update({u: "likes hiking, wants kids " * 20 for u in _users(n)})
+        ai = _stub_ai()
+        return lambda: store.update(ai, "user00000", "I work as a nurse")
+
+
+for _n in (1000, 10000):
+
+    @benchmark(f"coverage.users_above[users={_n}]")
+    def _coverage_above(tmp: Path, n: int = _n) -> Callable[[], object]:
+        coverage = ObjectiveCoverage()
+        for i, u in enumerate(_users(n)):
+            coverage.update(u, " ".join(PROFILE_OBJECTIVES[: i % (len(PROFILE_OBJECTIVES) + 1)]))
+        return lambda: (coverage.users_above(0.5), coverage.histogram())
+
+
+# Session turn ------------------------------------------------------------------
+for _n in (10, 500):
+
+    @benchmark(f"chat_session.turn[history={_n}]")
+    def _turn(tmp: Path, n: int = _n) -> Callable[[], object]:
+        history = ChatStore(path=tmp / "history.json")
+        history.save(_history(n))
+        session = ChatSession(
+            ai_client=_stub_ai(),
+            profile_store=ProfileStore(base_dir=tmp),
+            chat_store=history,
+        )
+        return lambda: session.send_client_message("Alice", "I love hiking")
+
+
+# Runner --------------------------------------------------------------------------
+def measure(func: Callable[[], object], rounds: int, min_time: float) -> Dict[str, float]:
+    """Time ``func`` and return per-call statistics in seconds."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or number >= 1 << 16:
+            break
+        number *= 2
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return {
+        "median": statistics.median(samples),
+        "min": min(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "rounds": rounds,
+        "calls_per_round": number,
+    }
+
+
+def run(selected: str = "", rounds: int = 5, min_time: float = 0.05) -> Dict[str, object]:
+    """Run all cases whose name contains ``selected``."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name, case in CASES:
+        if selected not in name:
+            continue
+        with tempfile.TemporaryDirectory() as tmp:
+            func = case(Path(tmp))
+            results[name] = measure(func, rounds, min_time)
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(
+    results: Dict[str, object], baseline: Dict[str, object], threshold: float
+) -> List[str]:
+    """Print a comparison table and return names of regressed cases."""
+    current = results["benchmarks"]
+    previous = baseline.get("benchmarks", {})
+    regressions = []
+    print(f"{'benchmark':40} {'median':>12} {'baseline':>12} {'ratio':>7}")
+    for name, stats in current.items():
+        base = previous.get(name)
+        median = stats["median"]
+        if base is None:
+            print(f"{name:40} {median * 1e6:10.1f}us {'-':>12} {'new':>7}")
+            continue
+        ratio = median / base["median"] if base["median"] else float("inf")
+        flag = " REGRESSION" if ratio > threshold else ""
+        print(
+            f"{name:40} {median * 1e6:10.1f}us {base['median'] * 1e6:10.1f}us "
+            f"{ratio:6.2f}x{flag}"
+        )
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="TalkMatch benchmark suite")
+    parser.add_argument("-k", "--filter", default="", help="only run matching cases")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05)
+    parser.add_argument("--output", type=Path, help="write JSON results here")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="overwrite the baseline"
+    )
+    parser.add_argument(
+        "--threshold", type=float, default=1.5, help="allowed slowdown ratio"
+    )
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.rounds, args.min_time)
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"baseline written to {args.baseline}")
+        return 0
+    baseline = (
+        json.loads(args.baseline.read_text(encoding="utf-8"))
+        if args.baseline.exists()
+        else {}
+    )
+    regressions = compare(results, baseline, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
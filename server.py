@@ -0,0 +1,69 @@
+import argparse
+import logging
+from pathlib import Path
+
+from talkmatch import metrics
+from talkmatch.ai import AIClient
+from talkmatch.fake_openai import FakeOpenAI, LatencyModel
+from talkmatch.resilience import resilient_factory
+from talkmatch.server import run_server, stub_client_factory
+from talkmatch.session_manager import SessionManager
+from talkmatch.sharding import ShardRouter
+from talkmatch.storage import BASE_DIR
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Headless TalkMatch chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR)
+    parser.add_argument(
+        "--shards", type=int, default=0, help="worker processes (0 = in-process)"
+    )
+    parser.add_argument(
+        "--stub", action="store_true", help="use the offline fake backend instead of OpenAI"
+    )
+    parser.add_argument("--stub-latency", type=float, default=0.0, help="mean seconds")
+    parser.add_argument("--stub-jitter", type=float, default=0.0)
+    parser.add_argument(
+        "--metrics", action="store_true", help="collect metrics for GET /metrics"
+    )
+    parser.add_argument(
+        "--auto-match",
+        action="store_true",
+        help="check readiness and score new pairs in the background (not with --shards)",
+    )
+    args = parser.parse_args()
+    if args.shards and args.auto_match:
+        # Shard workers have no background scheduler; match with POST /calculate.
+        parser.error("--auto-match cannot be combined with --shards")
+    if args.metrics:
+        metrics.set_sink(metrics.InMemorySink())
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    logging.getLogger("openai").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.stub:
+        backend = FakeOpenAI(
+            latency=LatencyModel("lognormal", args.stub_latency, args.stub_jitter)
+        )
+        factory = stub_client_factory(backend)
+    else:
+        factory = AIClient
+    if args.shards:
+        manager = ShardRouter(
+            shards=args.shards,
+            base_dir=args.data_dir,
+            ai_client_factory=resilient_factory(factory),
+        )
+    else:
+        manager = SessionManager(
+            base_dir=args.data_dir, ai_client_factory=resilient_factory(factory)
+        )
+        if args.auto_match:
+            manager.scheduler.start()
+    try:
+        run_server(args.host, args.port, manager=manager, workers=args.workers)
+    finally:
+        manager.close()
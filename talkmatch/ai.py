@@ -6,11 +6,60 @@ it can be easily mocked during testing.
 from __future__ import annotations
 
 import os
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterator, List, Dict, Any, Tuple
 
 from openai import OpenAI
 
+from . import metrics, prompt_builder
+from .cassette import recorder_for, replayer_for
+
+if TYPE_CHECKING:
+    from .usage import UsageLedger
+
+_current_call: ContextVar[Tuple[str, str | None]] = ContextVar(
+    "talkmatch_ai_call", default=("other", None)
+)
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+
+
+@contextmanager
+def ai_call(call_type: str, user: str | None = None) -> Iterator[None]:
+    """Attribute AI requests made in this block to ``call_type`` and ``user``.
+
+    ``user`` is inherited from an enclosing block when not given.
+    """
+    if user is None:
+        user = _current_call.get()[1]
+    token = _current_call.set((call_type, user))
+    try:
+        yield
+    finally:
+        _current_call.reset(token)
+
+
+def current_call() -> Tuple[str, str | None]:
+    """Return the ``(call_type, user)`` of the innermost :func:`ai_call`."""
+    return _current_call.get()
+
+
+def cached_tokens(usage: Any) -> int:
+    """Return the provider-cached prompt tokens reported in ``usage``."""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return int(getattr(details, "cached_tokens", None) or 0)
+
+
+def _track_in_flight(delta: int) -> None:
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight += delta
+        metrics.gauge("ai_in_flight", _in_flight)
+
 
 @dataclass
 class AIClient:
@@ -21,23 +70,82 @@ class AIClient:
     max_tokens: int = 500
     # Optional preconfigured OpenAI client for dependency injection.
     openai_client: Any | None = None
+    # Append every call to this trace file (see ``talkmatch.cassette``).
+    record_path: Path | str | None = None
+    # Serve calls from this trace file instead of the API.
+    replay_path: Path | str | None = None
+    # Sleep for the recorded latency when replaying.
+    replay_latency: bool = False
+    # Ledger receiving token usage of every call (set by ``SessionManager``).
+    ledger: UsageLedger | None = None
 
     def __post_init__(self) -> None:
+        replay = self.replay_path or os.getenv("TALKMATCH_REPLAY")
+        if replay:
+            self.client = replayer_for(Path(replay), self.replay_latency)
+            return
+
         if self.openai_client is not None:
             # Use the provided client directly.
             self.client = self.openai_client
-            return
+        else:
+            key = self.api_key or os.getenv("OPENAI_API_KEY")
+            if not key:
+                raise ValueError("OPENAI_API_KEY is not set")
+            self.client = OpenAI(api_key=key)
 
-        key = self.api_key or os.getenv("OPENAI_API_KEY")
-        if not key:
-            raise ValueError("OPENAI_API_KEY is not set")
-        self.client = OpenAI(api_key=key)
+        record = self.record_path or os.getenv("TALKMATCH_RECORD")
+        if record:
+            self.client = recorder_for(self.client, Path(record))
 
     def get_response(self, messages: List[Dict[str, str]]) -> str:
         """Send messages to the OpenAI API and return the assistant reply."""
-        completion = self.client.chat.completions.create(
+        if metrics.enabled():
+            completion = self._instrumented_complete(messages)
+        else:
+            completion = self._complete(messages)
+        if self.ledger is not None:
+            usage = getattr(completion, "usage", None)
+            if usage is not None:
+                call_type, user = current_call()
+                self.ledger.record(
+                    call_type,
+                    user,
+                    int(usage.prompt_tokens or 0),
+                    int(usage.completion_tokens or 0),
+                    cached_tokens(usage),
+                )
+        return completion.choices[0].message.content
+
+    def _instrumented_complete(self, messages: List[Dict[str, str]]) -> Any:
+        call_type, user = current_call()
+        metrics.increment("ai_requests", call_type=call_type)
+        prompt_builder.TRACKER.observe(call_type, user, messages)
+        _track_in_flight(1)
+        try:
+            with metrics.span("ai_request_seconds", call_type=call_type):
+                completion = self._complete(messages)
+        except Exception:
+            metrics.increment("ai_errors", call_type=call_type)
+            raise
+        finally:
+            _track_in_flight(-1)
+        usage = getattr(completion, "usage", None)
+        if usage is not None:
+            metrics.increment(
+                "ai_prompt_tokens", usage.prompt_tokens or 0, call_type=call_type
+            )
+            metrics.increment(
+                "ai_completion_tokens", usage.completion_tokens or 0, call_type=call_type
+            )
+            metrics.increment(
+                "ai_cached_prompt_tokens", cached_tokens(usage), call_type=call_type
+            )
+        return completion
+
+    def _complete(self, messages: List[Dict[str, str]]) -> Any:
+        return self.client.chat.completions.create(
             model="gpt-4o-mini",
             messages=messages,
             max_tokens=self.max_tokens,
         )
-        return completion.choices[0].message.content
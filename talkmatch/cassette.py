@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+"""Record and replay AI calls through compact trace files.
+
+A trace is a JSON-lines file (gzip-compressed when the name ends in
+``.gz``) holding one line per completion: the request key, start offset,
+latency, request messages, reply and token usage.  :class:`RecordingClient`
+wraps any OpenAI-style client and appends to a trace, while
+:class:`ReplayClient` serves recorded replies deterministically, optionally
+sleeping for the original latency, and keeps track of unmatched requests.
+
+``AIClient(record_path=...)`` and ``AIClient(replay_path=...)`` (or the
+``TALKMATCH_RECORD``/``TALKMATCH_REPLAY`` environment variables) switch the
+client into these modes.  Recorders for the same path share one trace
+writer, so traffic from many sessions and backends lands in one trace, and
+clients replaying the same path share one replayer.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from types import SimpleNamespace
+from typing import IO, Any, Deque, Dict, Iterator, List
+
+from .fake_openai import classify, make_completion
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def request_key(model: str, messages: List[Dict[str, str]], max_tokens: int | None) -> str:
+    """Return a stable digest identifying a completion request."""
+    canonical = json.dumps(
+        [model, max_tokens, [[m["role"], m["content"]] for m in messages]],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _open(path: Path, mode: str) -> IO[str]:
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return path.open(mode, encoding="utf-8")
+
+
+def read_trace(path: Path) -> Iterator[Dict[str, Any]]:
+    """Yield the entries of a trace file in recorded order."""
+    with _open(Path(path), "r") as handle:
+        for line in handle:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _usage_dict(usage: Any) -> Dict[str, int] | None:
+    if usage is None:
+        return None
+    data = {
+        name: getattr(usage, name)
+        for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+        if isinstance(getattr(usage, name, None), int)
+    }
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if isinstance(cached, int):
+        data["cached_tokens"] = cached
+    return data
+
+
+def _usage_namespace(data: Dict[str, int]) -> Any:
+    data = dict(data)
+    details = SimpleNamespace(cached_tokens=data.pop("cached_tokens", 0))
+    return SimpleNamespace(**data, prompt_tokens_details=details)
+
+
+class _TraceWriter:
+    """Append-only handle on one trace file, shared by its recorders."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.handle = _open(path, "a")
+        self.started = time.time()
+        self.users = 0
+
+    def write(self, line: str) -> None:
+        with self.lock:
+            self.handle.write(line + "\n")
+            self.handle.flush()
+
+
+@dataclass
+class RecordingClient:
+    """Wrap an OpenAI-style client and append every call to a trace."""
+
+    inner: Any
+    path: Path
+
+    def __post_init__(self) -> None:
+        self.path = Path(self.path)
+        self._writer = _acquire_writer(self.path)
+        self._closed = False
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        started = time.perf_counter()
+        offset = time.time() - self._writer.started
+        completion = self.inner.chat.completions.create(
+            model=model, messages=messages, **kwargs
+        )
+        latency = time.perf_counter() - started
+        entry = {
+            "k": request_key(model, messages, kwargs.get("max_tokens")),
+            "type": classify(messages),
+            "ts": round(offset, 4),
+            "latency": round(latency, 4),
+            "model": model,
+            "max_tokens": kwargs.get("max_tokens"),
+            "messages": [[m["role"], m["content"]] for m in messages],
+            "reply": completion.choices[0].message.content,
+            "usage": _usage_dict(getattr(completion, "usage", None)),
+        }
+        self._writer.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        return completion
+
+    def close(self) -> None:
+        """Release the trace; it is closed once its last recorder closes."""
+        if not self._closed:
+            self._closed = True
+            _release_writer(self._writer)
+
+
+@dataclass
+class ReplayClient:
+    """Serve recorded completions in place of an OpenAI-style client.
+
+    Identical requests are answered in recorded order; once exhausted the
+    last reply for that request repeats.  Requests never seen in the trace
+    are listed in :attr:`unmatched` and raise :class:`CassetteMiss` unless a
+    ``fallback`` client is supplied.
+    """
+
+    path: Path
+    use_latency: bool = False
+    fallback: Any | None = None
+    unmatched: List[Dict[str, Any]] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = defaultdict(deque)
+        self._last: Dict[str, Dict[str, Any]] = {}
+        self.recorded = 0
+        for entry in read_trace(self.path):
+            self._entries[entry["k"]].append(entry)
+            self.recorded += 1
+        self.matched = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model: str, messages: List[Dict[str, str]], **kwargs: Any) -> Any:
+        key = request_key(model, messages, kwargs.get("max_tokens"))
+        with self._lock:
+            queue = self._entries.get(key)
+            entry = queue.popleft() if queue else self._last.get(key)
+            if entry is not None:
+                self._last[key] = entry
+                self.matched += 1
+            else:
+                self.unmatched.append(
+                    {
+                        "k": key,
+                        "type": classify(messages),
+                        "last": messages[-1]["content"][:200] if messages else "",
+                    }
+                )
+        if entry is None:
+            if self.fallback is not None:
+                return self.fallback.chat.completions.create(
+                    model=model, messages=messages, **kwargs
+                )
+            raise CassetteMiss(key)
+        if self.use_latency:
+            time.sleep(entry["latency"])
+        usage = _usage_namespace(entry["usage"]) if entry.get("usage") else None
+        return make_completion(model, entry["reply"], usage, id=f"replay-{key[:8]}")
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize matched, unmatched and never-used recorded calls."""
+        with self._lock:
+            unused = sum(len(queue) for queue in self._entries.values())
+            return {
+                "recorded": self.recorded,
+                "matched": self.matched,
+                "unmatched": len(self.unmatched),
+                "unused": unused,
+                "unmatched_requests": list(self.unmatched),
+            }
+
+
+_shared_lock = threading.Lock()
+_writers: Dict[Path, _TraceWriter] = {}
+_replayers: Dict[Path, ReplayClient] = {}
+
+
+def _acquire_writer(path: Path) -> _TraceWriter:
+    path = path.resolve()
+    with _shared_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = _TraceWriter(path)
+        writer.users += 1
+        return writer
+
+
+def _release_writer(writer: _TraceWriter) -> None:
+    with _shared_lock:
+        writer.users -= 1
+        if writer.users > 0:
+            return
+        if _writers.get(writer.path) is writer:
+            del _writers[writer.path]
+    with writer.lock:
+        writer.handle.close()
+
+
+def recorder_for(inner: Any, path: Path) -> RecordingClient:
+    """Return a recorder wrapping ``inner`` that appends to the trace at ``path``."""
+    return RecordingClient(inner, Path(path))
+
+
+def replayer_for(path: Path, use_latency: bool = False) -> ReplayClient:
+    """Return the shared replayer for ``path``.
+
+    Raises ``ValueError`` if ``path`` is already replayed with a different
+    ``use_latency``.
+    """
+    path = Path(path).resolve()
+    with _shared_lock:
+        replayer = _replayers.get(path)
+        if replayer is None:
+            replayer = _replayers[path] = ReplayClient(path, use_latency=use_latency)
+        elif replayer.use_latency != use_latency:
+            raise ValueError(
+                f"{path} is already replayed with use_latency={replayer.use_latency}"
+            )
+        return replayer
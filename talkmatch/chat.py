@@ -1,21 +1,25 @@
 """Chat session logic for TalkMatch."""
 from __future__ import annotations
 
+import logging
 from dataclasses import dataclass, field
-from typing import List, Dict, Optional, Callable
+from typing import Dict, List, Mapping, Optional, Callable, Sequence
 
-from .ai import AIClient
+from . import metrics, prompt_budget, prompt_builder
+from .ai import AIClient, ai_call
 from .storage import ProfileStore, ChatStore
 from .fake_user import FakeUser
 from .prompts import AMBASSADOR_ROLE, COLLECT_INFO_PROMPT
 from .objectives import PROFILE_OBJECTIVES
 from .ambassador import Ambassador
+from .message_log import MessageLog
 
+logger = logging.getLogger(__name__)
 
 AMBASSADOR_SYSTEM_PROMPT = (
     AMBASSADOR_ROLE
     + "\n"
-    + COLLECT_INFO_PROMPT.replace("{objectives}", ", ".join(PROFILE_OBJECTIVES))
+    + prompt_builder.fill(COLLECT_INFO_PROMPT, objectives=", ".join(PROFILE_OBJECTIVES))
 )
 
 
@@ -27,68 +31,111 @@ class ChatSession:
     ai_client: AIClient
     profile_store: ProfileStore = field(default_factory=ProfileStore)
     chat_store: ChatStore | None = None
-    messages: List[Dict[str, str]] = field(
-        default_factory=lambda: [
-            {"role": "system", "content": AMBASSADOR_SYSTEM_PROMPT}
-        ]
+    messages: MessageLog = field(
+        default_factory=lambda: [{"role": "system", "content": AMBASSADOR_SYSTEM_PROMPT}]
     )
     fake_user: Optional[FakeUser] = None
     ambassador: Ambassador = field(default_factory=Ambassador)
     update_callback: Optional[Callable[[], None]] = None
+    # Called with each reply as soon as it is in ``messages``, before saving.
+    reply_callback: Optional[Callable[[str], None]] = None
+    # Return False to defer the profile rebuild for a user (budget exceeded).
+    allow_profile_update: Optional[Callable[[str], bool]] = None
+    # Messages kept in memory; older ones stay in the store's archive.
+    recent_messages: int = 200
 
     def __post_init__(self) -> None:
+        omitted, omitted_roles = 0, None
         if self.chat_store:
-            loaded = self.chat_store.load()
-            if loaded:
-                self.messages = loaded
+            recent = self.chat_store.load_recent(self.recent_messages)
+            if recent.messages:
+                self.messages = recent.messages
+                omitted, omitted_roles = recent.omitted, recent.omitted_roles
+        # Compact records with running sizes for prompt budgeting.
+        self.messages = MessageLog(
+            self.messages,
+            measure=prompt_budget.message_tokens,
+            omitted=omitted,
+            omitted_roles=omitted_roles,
+        )
         self.set_persona(None)
 
     def send_client_message(self, name: str, text: str) -> str:
         """Handle a message from any client (user or persona)."""
 
-        self.messages.append({"role": "user", "content": text})
-        self.profile_store.update(self.ai_client, name, text)
-        if self.fake_user:
-            reply = self.fake_user.get_reply()
-        elif self.ambassador.state == "linked":
-            reply = text
-        else:
-            messages = self.messages
-            if self.ambassador.state == "acting" and self.ambassador.persona:
-                profile = self.profile_store.read(self.ambassador.persona)
-                persona_prompt = (
-                    f"Act as {self.ambassador.persona} using this profile: {profile}. "
-                    "Maintain the current topic and shift gradually from the ambassador's tone to "
-                    f"{self.ambassador.persona}'s style."
-                )
-                messages = messages + [{"role": "system", "content": persona_prompt}]
-            elif self.ambassador.state == "linking" and self.ambassador.link_context:
-                link_prompt = (
-                    f"Other user recently said: {self.ambassador.link_context}"
-                )
-                messages = messages + [{"role": "system", "content": link_prompt}]
+        with metrics.span("chat_turn_seconds"):
+            self.messages.append({"role": "user", "content": text})
+            with metrics.span("chat_stage_seconds", stage="profile_update"):
+                if self.allow_profile_update is None or self.allow_profile_update(name):
+                    try:
+                        self.profile_store.update(self.ai_client, name, text)
+                    except Exception as exc:
+                        # Keep the live chat going; the text is merged next time.
+                        logger.warning("profile update for %s failed: %s", name, exc)
+                        self.profile_store.defer(name, text)
+                else:
+                    self.profile_store.defer(name, text)
+            if self.fake_user:
+                reply = self.fake_user.get_reply()
+            elif self.ambassador.state == "linked":
+                reply = text
             else:
-                profile = self.profile_store.read(name).lower()
-                outstanding = [
-                    obj for obj in PROFILE_OBJECTIVES if obj.lower() not in profile
-                ]
-                if outstanding:
-                    info_prompt = COLLECT_INFO_PROMPT.replace(
-                        "{objectives}", ", ".join(outstanding)
-                    )
-                    messages = messages + [
-                        {"role": "system", "content": info_prompt}
-                    ]
-            reply = self.ai_client.get_response(messages)
-        self.messages.append({"role": "assistant", "content": reply})
-        self.save_history()
-        if self.update_callback:
-            self.update_callback()
+                with metrics.span("chat_stage_seconds", stage="prompt_assembly"):
+                    messages = self._build_messages(name)
+                with metrics.span("chat_stage_seconds", stage="llm_call"):
+                    with ai_call("chat", name):
+                        reply = self.ai_client.get_response(messages)
+            self.messages.append({"role": "assistant", "content": reply})
+            if self.reply_callback:
+                self.reply_callback(reply)
+            with metrics.span("chat_stage_seconds", stage="history_save"):
+                self.save_history()
+            if self.update_callback:
+                with metrics.span("chat_stage_seconds", stage="update_callback"):
+                    self.update_callback()
         return reply
 
+    def _build_messages(self, name: str) -> Sequence[Mapping[str, str]]:
+        """Return the prompt for the next reply in the current ambassador mode.
+
+        The system prompt and history form a stable, append-only prefix; the
+        mode instruction always goes last so it never invalidates it.
+        """
+        instruction = None
+        if self.ambassador.state == "acting" and self.ambassador.persona:
+            persona = self.ambassador.persona
+            profile = prompt_budget.truncate(
+                self.profile_store.read(persona), prompt_budget.split_budget("chat", 4), "chat"
+            )
+            instruction = prompt_builder.persona_message(persona, profile)
+        elif self.ambassador.state == "linking" and self.ambassador.link_context:
+            instruction = prompt_builder.link_message(self.ambassador.link_context)
+        else:
+            outstanding = self.profile_store.missing_objectives(name)
+            if outstanding:
+                instruction = prompt_builder.info_message(outstanding)
+        messages = prompt_builder.chat_messages(self.messages, instruction)
+        return prompt_budget.fit_messages(messages, "chat")
+
     def save_history(self) -> None:
         if self.chat_store:
             self.chat_store.save(self.messages)
+            # Drop archived messages once the in-memory log doubles its window.
+            if len(self.messages) > 2 * self.recent_messages:
+                archived = self.chat_store.archived - 1 - self.messages.omitted
+                self.messages = self.messages.compact(
+                    min(archived, len(self.messages) - 1 - self.recent_messages)
+                )
+
+    def history(self, start: int = 1, stop: int | None = None) -> List[Dict[str, str]]:
+        """Return messages ``start`` to ``stop`` of the full history.
+
+        Index 0 is the system prompt; messages no longer held in memory are
+        paged in from the chat store's archive.
+        """
+        if self.messages.omitted == 0 or self.chat_store is None:
+            return self.messages.to_dicts(start, stop)
+        return self.chat_store.page(start, stop)
 
     def switch_to_fake_user(self, fake_user: FakeUser) -> None:
         self.fake_user = fake_user
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+"""Keyword coverage of profile objectives for every user.
+
+:class:`ObjectiveCoverage` keeps a users x objectives coverage matrix as
+Python integer bitsets: one bitset of users per objective and one per
+number of objectives covered.  An objective counts as covered when its
+name appears in the lowercased profile text, the same check the chat
+prompt uses.  Updating a user rescans only that user's profile; the
+queries below never touch the profile text.
+
+* :meth:`~ObjectiveCoverage.missing` returns a user's missing objectives
+  from a per-mask cache.
+* :meth:`~ObjectiveCoverage.users_above` ORs the count bitsets at or
+  above the threshold.
+* :meth:`~ObjectiveCoverage.histogram` is a popcount per count bitset.
+
+Updates and the bitset queries hold a lock, so callers on different
+threads see every user in exactly one count bitset.
+"""
+
+import math
+import threading
+from typing import Dict, List, Sequence, Tuple
+
+from .objectives import PROFILE_OBJECTIVES
+
+
+class ObjectiveCoverage:
+    """Which objectives each user's profile mentions, as bitsets."""
+
+    def __init__(self, objectives: Sequence[str] = PROFILE_OBJECTIVES) -> None:
+        self.objectives: Tuple[str, ...] = tuple(objectives)
+        self._lock = threading.Lock()
+        self._needles = [obj.lower() for obj in self.objectives]
+        # Bit position of each user in the bitsets; freed slots are reused.
+        self._slots: Dict[str, int] = {}
+        self._names: List[str | None] = []
+        self._free: List[int] = []
+        # Objectives covered by each user, bit j for objective j.
+        self._masks: Dict[str, int] = {}
+        # Profile text each mask was computed from, see :meth:`sync`.
+        self._texts: Dict[str, str] = {}
+        # Users covering each objective.
+        self._columns: List[int] = [0] * len(self.objectives)
+        # Users covering exactly k objectives, for k = 0..len(objectives).
+        self._levels: List[int] = [0] * (len(self.objectives) + 1)
+        self._missing: Dict[int, Tuple[str, ...]] = {}
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __contains__(self, user: object) -> bool:
+        return user in self._slots
+
+    # Updates ----------------------------------------------------------------
+    def update(self, user: str, profile: str) -> None:
+        """Recompute ``user``'s row from their profile text."""
+        with self._lock:
+            self._update(user, profile)
+
+    def _update(self, user: str, profile: str) -> None:
+        text = profile.lower()
+        mask = 0
+        for j, needle in enumerate(self._needles):
+            if needle in text:
+                mask |= 1 << j
+        slot = self._slots.get(user)
+        if slot is None:
+            slot = self._free.pop() if self._free else len(self._names)
+            if slot == len(self._names):
+                self._names.append(user)
+            else:
+                self._names[slot] = user
+            self._slots[user] = slot
+        else:
+            self._clear(slot, self._masks[user])
+        bit = 1 << slot
+        for j in range(len(self._columns)):
+            if mask >> j & 1:
+                self._columns[j] |= bit
+        self._levels[mask.bit_count()] |= bit
+        self._masks[user] = mask
+        self._texts[user] = profile
+
+    def sync(self, user: str, profile: str) -> None:
+        """Update ``user`` unless their row already reflects ``profile``.
+
+        The check is by identity, so it is O(1) for unchanged profiles.
+        """
+        with self._lock:
+            if self._texts.get(user) is not profile:
+                self._update(user, profile)
+
+    def remove(self, user: str) -> None:
+        with self._lock:
+            self._remove(user)
+
+    def _remove(self, user: str) -> None:
+        slot = self._slots.pop(user, None)
+        if slot is None:
+            return
+        self._clear(slot, self._masks.pop(user))
+        self._texts.pop(user, None)
+        self._names[slot] = None
+        self._free.append(slot)
+
+    def _clear(self, slot: int, mask: int) -> None:
+        keep = ~(1 << slot)
+        for j in range(len(self._columns)):
+            if mask >> j & 1:
+                self._columns[j] &= keep
+        self._levels[mask.bit_count()] &= keep
+
+    # Queries ----------------------------------------------------------------
+    def missing(self, user: str) -> Tuple[str, ...]:
+        """Return the objectives ``user``'s profile does not mention yet."""
+        mask = self._masks.get(user, 0)
+        missing = self._missing.get(mask)
+        if missing is None:
+            missing = self._missing[mask] = tuple(
+                obj for j, obj in enumerate(self.objectives) if not mask >> j & 1
+            )
+        return missing
+
+    def coverage(self, user: str) -> float:
+        """Return the share of objectives ``user`` covers, 0.0 to 1.0."""
+        if not self.objectives:
+            return 1.0
+        return self._masks.get(user, 0).bit_count() / len(self.objectives)
+
+    def users_above(self, minimum: float) -> List[str]:
+        """Return the users covering at least ``minimum`` of the objectives."""
+        need = max(0, math.ceil(minimum * len(self.objectives) - 1e-9))
+        bits = 0
+        with self._lock:
+            for level in self._levels[need:]:
+                bits |= level
+            return self._decode(bits)
+
+    def users_missing(self, objective: str) -> List[str]:
+        """Return the users whose profile does not mention ``objective``."""
+        j = self.objectives.index(objective)
+        everyone = 0
+        with self._lock:
+            covered = self._columns[j]
+            for level in self._levels:
+                everyone |= level
+            return self._decode(everyone & ~covered)
+
+    def histogram(self) -> List[int]:
+        """Return how many users cover exactly k objectives, for each k."""
+        with self._lock:
+            return [level.bit_count() for level in self._levels]
+
+    def _decode(self, bits: int) -> List[str]:
+        # One pass over the binary digits, lowest slot first.
+        digits = bin(bits)[:1:-1]
+        return [self._names[i] for i, d in enumerate(digits) if d == "1"]  # type: ignore[misc]
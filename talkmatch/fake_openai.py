@@ -0,0 +1,407 @@
+from __future__ import annotations
+
+"""Offline stand-in for the OpenAI chat completion API.
+
+:class:`FakeOpenAI` mimics ``client.chat.completions.create`` closely enough
+to be passed as ``AIClient(openai_client=...)``.  Replies are deterministic
+per prompt and shaped by prompt type (chat, profile, readiness score or
+match score), while latency, token throughput, injected 429/500 errors and
+streaming are configurable so ``SessionManager`` can be measured offline.
+
+Run ``python -m talkmatch.fake_openai --port 8001`` to expose the same
+backend as a local HTTP endpoint for ``OpenAI(base_url=...)``.
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List
+
+CHAT_REPLIES = [
+    "Ha, tell me more about that.",
+    "Oh nice! What got you into it?",
+    "Same here honestly. What's your weekend usually like?",
+    "lol fair. Do you see yourself settling down at some point?",
+    "Sounds fun. What do you do for work?",
+    "Hmm interesting, what matters most to you in a partner?",
+    "Cool. Which languages do you speak?",
+    "That's sweet. How old are you if you don't mind me asking?",
+]
+
+_INFO_RE = re.compile(r"<USER_INFO>(.*?)</USER_INFO>", re.S)
+_MESSAGES_RE = re.compile(r"<CHAT_MESSAGES>(.*?)</CHAT_MESSAGES>", re.S)
+
+
+class FakeAPIError(Exception):
+    """Injected API failure exposing ``status_code`` like ``openai.APIStatusError``."""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate of roughly four characters per token."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def make_completion(model: str, content: str, usage: Any = None, id: str = "fake") -> Any:
+    """Build an object shaped like an OpenAI ``ChatCompletion``."""
+    message = SimpleNamespace(role="assistant", content=content)
+    return SimpleNamespace(
+        id=id,
+        model=model,
+        choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+        usage=usage,
+    )
+
+
+def classify(messages: List[Dict[str, str]]) -> str:
+    """Return the prompt type of ``messages``: match, readiness, profile or chat."""
+    prompt = messages[-1]["content"] if messages else ""
+    if len(messages) == 1 and messages[0]["role"] == "user":
+        if "romantic compatibility" in prompt:
+            return "match"
+        if "percentage of objectives" in prompt:
+            return "readiness"
+        if "<USER_INFO>" in prompt:
+            return "profile"
+    return "chat"
+
+
+class PrefixCache:
+    """Simulate provider prompt caching over 128-token prefix blocks.
+
+    Like OpenAI, prompts shorter than 1024 tokens are never cached and hits
+    are reported in whole blocks of the longest previously seen prefix.
+    """
+
+    MIN_TOKENS = 1024
+    BLOCK_TOKENS = 128
+
+    def __init__(self, max_entries: int = 100_000) -> None:
+        self.max_entries = max_entries
+        self._seen: OrderedDict[bytes, None] = OrderedDict()
+
+    def lookup(self, messages: List[Dict[str, str]]) -> int:
+        """Return the cached token count for ``messages`` and remember them."""
+        text = "".join(f"{m['role']}\n{m['content']}\n" for m in messages).encode("utf-8")
+        block = self.BLOCK_TOKENS * 4
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(text[: self.MIN_TOKENS * 4 - block])
+        cached, missed = 0, False
+        for end in range(self.MIN_TOKENS * 4, len(text) + 1, block):
+            digest.update(text[end - block : end])
+            key = digest.copy().digest()
+            if key in self._seen:
+                self._seen.move_to_end(key)
+                if not missed:
+                    cached = end // 4
+            else:
+                missed = True
+                self._seen[key] = None
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return cached
+
+
+@dataclass
+class LatencyModel:
+    """Sample per-request latency in seconds.
+
+    ``distribution`` is one of ``constant``, ``uniform``, ``normal``,
+    ``lognormal`` or ``exponential``; ``mean`` and ``jitter`` (the spread or
+    standard deviation) shape the time to first token.  ``tokens_per_second``
+    adds generation time proportional to the completion length.
+    """
+
+    distribution: str = "constant"
+    mean: float = 0.0
+    jitter: float = 0.0
+    tokens_per_second: float = 0.0
+
+    def first_token(self, rng: random.Random) -> float:
+        if self.mean <= 0:
+            return 0.0
+        if self.distribution == "uniform":
+            value = rng.uniform(self.mean - self.jitter, self.mean + self.jitter)
+        elif self.distribution == "normal":
+            value = rng.gauss(self.mean, self.jitter)
+        elif self.distribution == "lognormal":
+            sigma = self.jitter / self.mean if self.jitter else 0.0
+            value = rng.lognormvariate(math.log(self.mean) - sigma**2 / 2, sigma)
+        elif self.distribution == "exponential":
+            value = rng.expovariate(1 / self.mean)
+        else:
+            value = self.mean
+        return max(0.0, value)
+
+    def per_token(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+
+@dataclass
+class FakeOpenAI:
+    """Deterministic, latency-configurable replacement for ``openai.OpenAI``."""
+
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    error_rate_429: float = 0.0
+    error_rate_500: float = 0.0
+    # Requests per minute before 429s are returned; 0 disables the limit.
+    rate_limit_rpm: int = 0
+    seed: int = 0
+    sleep: Callable[[float], None] = time.sleep
+    calls: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cached_tokens: int = 0
+    # Report ``prompt_tokens_details.cached_tokens`` for repeated prefixes.
+    prompt_cache: bool = True
+
+    def __post_init__(self) -> None:
+        self._cache = PrefixCache()
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+        self._window: List[float] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    # Reply generation -------------------------------------------------------
+    def reply_for(self, messages: List[Dict[str, str]]) -> str:
+        """Return the canned reply for ``messages`` without latency or errors."""
+        kind = classify(messages)
+        prompt = messages[-1]["content"] if messages else ""
+        digest = int.from_bytes(
+            hashlib.blake2b(prompt.encode("utf-8"), digest_size=8).digest(), "big"
+        )
+        if kind == "match":
+            return f"{(digest % 101) / 100:.2f}"
+        if kind == "readiness":
+            return str(40 + digest % 61)
+        if kind == "profile":
+            new = _MESSAGES_RE.search(prompt)
+            # The existing profile is the last tagged block before the messages.
+            infos = _INFO_RE.findall(prompt, 0, new.start() if new else len(prompt))
+            existing = infos[-1].strip() if infos else ""
+            added = new.group(1).strip() if new else ""
+            profile = f"{existing} {added}".strip()[-2000:]
+            return f"<USER_INFO>{profile}</USER_INFO>"
+        return CHAT_REPLIES[digest % len(CHAT_REPLIES)]
+
+    # OpenAI-compatible API ----------------------------------------------------
+    def create(
+        self,
+        model: str = "gpt-4o-mini",
+        messages: List[Dict[str, str]] | None = None,
+        max_tokens: int | None = None,
+        stream: bool = False,
+        **_: Any,
+    ) -> Any:
+        # Normalize to plain dicts, as a JSON round trip to the real API would.
+        messages = [
+            m.to_dict() if hasattr(m, "to_dict") else {"role": m["role"], "content": m["content"]}
+            for m in messages or []
+        ]
+        kind = classify(messages)
+        with self._lock:
+            self.calls[kind] += 1
+            delay = self.latency.first_token(self._rng)
+            roll = self._rng.random()
+            limited = self._rate_limited()
+        if limited or roll < self.error_rate_429:
+            self._fail(429, "Rate limit exceeded", delay)
+        if roll < self.error_rate_429 + self.error_rate_500:
+            self._fail(500, "Internal server error", delay)
+
+        content = self.reply_for(messages)
+        if max_tokens:
+            content = content[: max_tokens * 4]
+        prompt_tokens = sum(count_tokens(m["content"]) for m in messages)
+        completion_tokens = count_tokens(content)
+        with self._lock:
+            cached = min(self._cache.lookup(messages), prompt_tokens) if self.prompt_cache else 0
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.cached_tokens += cached
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            total_tokens=prompt_tokens + completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached),
+        )
+        if stream:
+            return self._stream(model, content, delay)
+        self.sleep(delay + completion_tokens * self.latency.per_token())
+        return make_completion(model, content, usage, id=f"fake-{self.calls.total()}")
+
+    def _rate_limited(self) -> bool:
+        if not self.rate_limit_rpm:
+            return False
+        now = time.monotonic()
+        self._window = [t for t in self._window if now - t < 60.0]
+        if len(self._window) >= self.rate_limit_rpm:
+            return True
+        self._window.append(now)
+        return False
+
+    def _fail(self, status: int, message: str, delay: float) -> None:
+        with self._lock:
+            self.errors[status] += 1
+        self.sleep(delay)
+        raise FakeAPIError(status, message)
+
+    def _stream(self, model: str, content: str, delay: float) -> Iterator[Any]:
+        self.sleep(delay)
+        per_token = self.latency.per_token()
+        pieces = re.findall(r"\S*\s*", content)
+        for piece in pieces:
+            if not piece:
+                continue
+            self.sleep(count_tokens(piece) * per_token)
+            delta = SimpleNamespace(role="assistant", content=piece)
+            yield SimpleNamespace(
+                model=model,
+                choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)],
+            )
+        yield SimpleNamespace(
+            model=model,
+            choices=[
+                SimpleNamespace(
+                    index=0, delta=SimpleNamespace(content=None), finish_reason="stop"
+                )
+            ],
+        )
+
+
+# Local HTTP endpoint ---------------------------------------------------------
+def make_handler(backend: FakeOpenAI) -> type:
+    """Create a request handler serving ``/v1/chat/completions`` from ``backend``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+            pass
+
+        def _send_json(self, status: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server API
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "not found"}})
+                return
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            try:
+                result = backend.create(**request)
+            except FakeAPIError as exc:
+                self._send_json(
+                    exc.status_code,
+                    {"error": {"message": str(exc), "code": exc.status_code}},
+                )
+                return
+            if request.get("stream"):
+                self._send_stream(result)
+                return
+            self._send_json(
+                200,
+                {
+                    "id": result.id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": result.model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": result.choices[0].message.content,
+                            },
+                            "finish_reason": "stop",
+                        }
+                    ],
+                    "usage": {
+                        **vars(result.usage),
+                        "prompt_tokens_details": vars(result.usage.prompt_tokens_details),
+                    },
+                },
+            )
+
+        def _send_stream(self, chunks: Iterator[Any]) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for chunk in chunks:
+                choice = chunk.choices[0]
+                delta = {"content": choice.delta.content} if choice.delta.content else {}
+                payload = {
+                    "id": "fake-stream",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": chunk.model,
+                    "choices": [
+                        {"index": 0, "delta": delta, "finish_reason": choice.finish_reason}
+                    ],
+                }
+                self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.close_connection = True
+
+    return Handler
+
+
+def serve(backend: FakeOpenAI, host: str = "127.0.0.1", port: int = 8001) -> ThreadingHTTPServer:
+    """Return an HTTP server exposing ``backend``; call ``serve_forever`` to run it."""
+    server = ThreadingHTTPServer((host, port), make_handler(backend))
+    server.daemon_threads = True
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local fake OpenAI endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--distribution", default="lognormal")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    backend = FakeOpenAI(
+        latency=LatencyModel(
+            args.distribution, args.latency, args.jitter, args.tokens_per_second
+        ),
+        error_rate_429=args.error_429,
+        error_rate_500=args.error_500,
+        rate_limit_rpm=args.rpm,
+        seed=args.seed,
+    )
+    server = serve(backend, args.host, args.port)
+    print(f"fake OpenAI endpoint on http://{args.host}:{server.server_port}/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
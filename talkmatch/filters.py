@@ -2,12 +2,17 @@ from __future__ import annotations
 
 """User list filters for matchmaking."""
 
+import logging
 from typing import Protocol, List
 
-from .ai import AIClient
+from . import metrics
+from .ai import AIClient, ai_call
+from .coverage import ObjectiveCoverage
 from .profile import ProfileStore
 from .readiness import ReadinessEvaluator, PROFILE_OBJECTIVES
 
+logger = logging.getLogger(__name__)
+
 
 class UserFilter(Protocol):
     """Filter a list of user names."""
@@ -17,17 +22,52 @@ class UserFilter(Protocol):
 
 
 class ReadinessFilter(UserFilter):
-    """Filter out users whose profiles are not ready."""
+    """Filter out users whose profiles are not ready.
+
+    With ``min_coverage`` above 0, users whose profile mentions fewer than
+    that share of the objectives are rejected from the coverage bitsets
+    without an AI call; only the rest are scored by the model.  Keyword
+    coverage undercounts (a profile can cover "kids" without the word), so
+    the prefilter is off by default.
+    """
 
-    def __init__(self, ai_client: AIClient, profile_store: ProfileStore) -> None:
+    def __init__(
+        self, ai_client: AIClient, profile_store: ProfileStore, min_coverage: float = 0.0
+    ) -> None:
         self.evaluator = ReadinessEvaluator(ai_client)
         self.profile_store = profile_store
+        self.min_coverage = min_coverage
+        self._coverage: ObjectiveCoverage | None = None
 
     def filter(self, users: List[str]) -> List[str]:
-        return [
-            name
-            for name in users
-            if self.evaluator.is_ready(
-                PROFILE_OBJECTIVES, self.profile_store.read(name)
-            )
-        ]
+        with metrics.span("readiness_filter_seconds"):
+            candidates = self._covered(users)
+            if len(candidates) < len(users):
+                metrics.increment("readiness_skipped", len(users) - len(candidates))
+            return [name for name in candidates if self._is_ready(name)]
+
+    def _covered(self, users: List[str]) -> List[str]:
+        """Return the ``users`` that pass the ``min_coverage`` prefilter."""
+        if self.min_coverage <= 0:
+            return users
+        coverage = self.profile_store.coverage
+        if coverage.objectives != tuple(PROFILE_OBJECTIVES):
+            # Objectives differ from the store's; keep a matrix of our own.
+            if self._coverage is None or self._coverage.objectives != tuple(PROFILE_OBJECTIVES):
+                self._coverage = ObjectiveCoverage(PROFILE_OBJECTIVES)
+            coverage = self._coverage
+        for name in users:
+            coverage.sync(name, self.profile_store.read(name))
+        passed = set(coverage.users_above(self.min_coverage))
+        return [name for name in users if name in passed]
+
+    def _is_ready(self, name: str) -> bool:
+        try:
+            with ai_call("readiness", name):
+                return self.evaluator.is_ready(
+                    PROFILE_OBJECTIVES, self.profile_store.read(name)
+                )
+        except Exception as exc:
+            # Treat users as not ready for this run rather than aborting it.
+            logger.warning("readiness check for %s failed: %s", name, exc)
+            return False
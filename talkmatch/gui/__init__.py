@@ -1,7 +1,8 @@
 """GUI components for TalkMatch."""
 
 from .chat_box import ChatBox
+from .chat_view import VirtualChatView
 from .control_panel import ControlPanel, run_app
 from .persona_controller import PersonaChatController
 
-__all__ = ["ChatBox", "ControlPanel", "PersonaChatController", "run_app"]
+__all__ = ["ChatBox", "ControlPanel", "PersonaChatController", "VirtualChatView", "run_app"]
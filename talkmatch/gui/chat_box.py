@@ -8,14 +8,13 @@ from tkinter import scrolledtext
 from ..chat import ChatSession
 from ..personas import Persona
 from ..prompts import GREETING_TEMPLATE
+from .chat_view import VirtualChatView
 from .persona_controller import PersonaChatController
 
-ROLE_COLORS = {
-    "Ambassador [trying": "orange",
-    "Ambassador [linked": "blue",
-    "Ambassador": "green",
-    "Other": "purple",
-}
+# Messages rendered when a window opens and per page loaded while scrolling.
+PAGE_SIZE = 50
+# Messages kept in the text widget; older ones are paged in on demand.
+MAX_RENDERED = 200
 
 def make_greeting(name: str) -> str:
     return GREETING_TEMPLATE.format(name=name)
@@ -24,12 +23,14 @@ def make_greeting(name: str) -> str:
 class ChatBox(tk.Toplevel):
     """A window showing conversation with a single persona."""
 
-    def __init__(self, master: tk.Misc, persona: Persona, session: ChatSession):
+    def __init__(
+        self, master: tk.Misc, persona: Persona, session: ChatSession, speculate: bool = False
+    ):
         super().__init__(master)
         self.persona = persona
         self.session = session
         self.controller: PersonaChatController = PersonaChatController(
-            self, persona, session
+            self, persona, session, speculate=speculate
         )
 
         # When this window is restored, raise all windows so they stay grouped.
@@ -63,53 +64,39 @@ class ChatBox(tk.Toplevel):
         )
         self.match_area.pack(fill=tk.BOTH, expand=False, padx=5, pady=5)
 
-        if len(self.session.messages) > 1:
-            for msg in self.session.messages[1:]:
-                role = (
-                    persona.name
-                    if msg["role"] == "user"
-                    else self.controller.ambassador_label()
-                )
-                self.display_message(role, msg["content"])
+        self.view = VirtualChatView(
+            self.chat_area,
+            page=lambda start, stop: self.session.history(start + 1, stop + 1),
+            length=lambda: self.session.messages.total - 1,
+            label=self._label,
+            page_size=PAGE_SIZE,
+            max_messages=MAX_RENDERED,
+            scrollbar=self.chat_area.vbar,
+        )
+        if self.session.messages.total > 1:
+            self.view.open()
         else:
             greeting = make_greeting(persona.name)
             self.display_message(self.controller.ambassador_label(), greeting)
             self.session.messages.append({"role": "assistant", "content": greeting})
             self.session.save_history()
+        self.controller.speculate()
+
+    def _label(self, message) -> str:
+        if message["role"] == "user":
+            return self.persona.name
+        return self.controller.ambassador_label()
 
     def display_message(self, role: str, content: str) -> None:
-        if not content.strip():
-            content = "Empty response"
-        self.chat_area.configure(state="normal")
-        tag_role = (
-            role.replace(" ", "_")
-            .replace("(", "")
-            .replace(")", "")
-            .replace("[", "")
-            .replace("]", "")
-        )
-        name_tag = f"{tag_role}_name"
-        if name_tag not in self.chat_area.tag_names():
-            color = "purple"
-            for prefix, val in ROLE_COLORS.items():
-                if role.startswith(prefix):
-                    color = val
-                    break
-            self.chat_area.tag_config(tag_role, foreground=color)
-            self.chat_area.tag_config(
-                name_tag, foreground=color, font=("Helvetica", 10, "bold")
-            )
-        self.chat_area.insert(tk.END, f"{role}: ", name_tag)
-        self.chat_area.insert(tk.END, f"{content}\n\n", tag_role)
-        self.chat_area.configure(state="disabled")
-        self.chat_area.yview(tk.END)
+        self.view.append(role, content)
 
     def send_message(self) -> None:
         text = self.entry.get().strip()
         if not text:
             return
-        self.entry.delete(0, tk.END)
-        self.controller.send_message(text)
+        # Keep the text in the entry if the window is still busy.
+        if self.controller.send_message(text):
+            self.entry.delete(0, tk.END)
 
     def next_message(self) -> None:
         self.controller.next_message()
@@ -0,0 +1,199 @@
+"""Virtualized rendering of a chat history into a Tk text widget."""
+
+from __future__ import annotations
+
+import tkinter as tk
+from collections import deque
+from typing import Any, Callable, Deque, List, Mapping, Sequence, Tuple
+
+ROLE_COLORS = {
+    "Ambassador [trying": "orange",
+    "Ambassador [linked": "blue",
+    "Ambassador": "green",
+    "Other": "purple",
+}
+
+Item = Tuple[str, str]
+
+
+def _tag_name(role: str) -> str:
+    return (
+        role.replace(" ", "_")
+        .replace("(", "")
+        .replace(")", "")
+        .replace("[", "")
+        .replace("]", "")
+    )
+
+
+class VirtualChatView:
+    """Keep at most ``max_messages`` messages of a history in ``text``.
+
+    ``page(start, stop)`` returns messages of the history (without the
+    system prompt) and ``length()`` its size; ``label(message)`` names the
+    speaker.  :meth:`open` renders only the newest page.  Scrolling to the
+    top loads the previous page, and messages pushed out of the widget at
+    the bottom come back when scrolling down again.  Every page goes in with
+    one ``insert`` call while the widget is unlocked once.
+    """
+
+    def __init__(
+        self,
+        text: Any,
+        page: Callable[[int, int], Sequence[Mapping[str, str]]],
+        length: Callable[[], int],
+        label: Callable[[Mapping[str, str]], str],
+        page_size: int = 50,
+        max_messages: int = 200,
+        scrollbar: Any = None,
+    ) -> None:
+        self.text = text
+        self._page = page
+        self._length = length
+        self._label = label
+        self.page_size = page_size
+        self.max_messages = max(max_messages, page_size)
+        # History index of the first rendered message.
+        self.first = 0
+        self._items: Deque[Item] = deque()
+        self._lines: Deque[int] = deque()
+        # Messages trimmed from the bottom; the last one sits right below the window.
+        self._below: Deque[Item] = deque()
+        self._tags: set = set()
+        self._scheduled = False
+        self._scrollbar = scrollbar
+        text.configure(yscrollcommand=self._on_scroll)
+
+    # Rendering ------------------------------------------------------------
+    def open(self) -> None:
+        """Render the newest page, replacing whatever is shown."""
+        total = self._length()
+        self.first = max(0, total - self.page_size)
+        messages = self._page(self.first, total)
+        self._items.clear()
+        self._lines.clear()
+        self._below.clear()
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        self._insert(tk.END, [(self._label(m), m["content"]) for m in messages])
+        self.text.configure(state="disabled")
+        self.text.yview(tk.END)
+
+    def append(self, role: str, content: str) -> None:
+        """Show a new message at the bottom, trimming the oldest if needed."""
+        item = (role, content)
+        if self._below:
+            # The user is reading older messages; keep the new one for later.
+            self._below.appendleft(item)
+            return
+        self.text.configure(state="normal")
+        self._insert(tk.END, [item])
+        self._trim_top()
+        self.text.configure(state="disabled")
+        self.text.yview(tk.END)
+
+    def load_older(self) -> int:
+        """Render the page above the window; return how many messages were added."""
+        self._scheduled = False
+        if self.first == 0:
+            return 0
+        start = max(0, self.first - self.page_size)
+        items = [(self._label(m), m["content"]) for m in self._page(start, self.first)]
+        top = self._top_line()
+        self.text.configure(state="normal")
+        added = self._insert("1.0", items, front=True)
+        self.first = start
+        self._trim_bottom()
+        self.text.configure(state="disabled")
+        self.text.yview(f"{top + added}.0")
+        return len(items)
+
+    def load_newer(self) -> int:
+        """Render messages trimmed from the bottom back into the window."""
+        self._scheduled = False
+        if not self._below:
+            return 0
+        items = [self._below.pop() for _ in range(min(self.page_size, len(self._below)))]
+        top = self._top_line()
+        self.text.configure(state="normal")
+        self._insert(tk.END, items)
+        removed = self._trim_top()
+        self.text.configure(state="disabled")
+        self.text.yview(f"{max(1, top - removed)}.0")
+        return len(items)
+
+    @property
+    def rendered(self) -> int:
+        return len(self._items)
+
+    # Internals ------------------------------------------------------------
+    def _insert(self, index: str, items: List[Item], front: bool = False) -> int:
+        chunks: List[Any] = []
+        lines = []
+        for role, content in items:
+            if not content.strip():
+                content = "Empty response"
+            tag = self._tag(role)
+            chunks += [f"{role}: ", f"{tag}_name", f"{content}\n\n", tag]
+            lines.append(content.count("\n") + 2)
+        if chunks:
+            self.text.insert(index, *chunks)
+        if front:
+            self._items.extendleft(reversed(items))
+            self._lines.extendleft(reversed(lines))
+        else:
+            self._items.extend(items)
+            self._lines.extend(lines)
+        return sum(lines)
+
+    def _tag(self, role: str) -> str:
+        tag = _tag_name(role)
+        if tag not in self._tags:
+            color = "purple"
+            for prefix, value in ROLE_COLORS.items():
+                if role.startswith(prefix):
+                    color = value
+                    break
+            self.text.tag_config(tag, foreground=color)
+            self.text.tag_config(f"{tag}_name", foreground=color, font=("Helvetica", 10, "bold"))
+            self._tags.add(tag)
+        return tag
+
+    def _trim_top(self) -> int:
+        excess = len(self._items) - self.max_messages
+        if excess <= 0:
+            return 0
+        lines = 0
+        for _ in range(excess):
+            self._items.popleft()
+            lines += self._lines.popleft()
+        self.text.delete("1.0", f"{lines + 1}.0")
+        self.first += excess
+        return lines
+
+    def _trim_bottom(self) -> None:
+        excess = len(self._items) - self.max_messages
+        if excess <= 0:
+            return
+        lines = 0
+        for _ in range(excess):
+            self._below.append(self._items.pop())
+            lines += self._lines.pop()
+        kept = sum(self._lines)
+        self.text.delete(f"{kept + 1}.0", tk.END)
+
+    def _top_line(self) -> int:
+        return int(str(self.text.index("@0,0")).split(".")[0])
+
+    def _on_scroll(self, top: str, bottom: str) -> None:
+        if self._scrollbar is not None:
+            self._scrollbar.set(top, bottom)
+        if self._scheduled:
+            return
+        if float(top) <= 0.0 and self.first > 0:
+            self._scheduled = True
+            self.text.after_idle(self.load_older)
+        elif float(bottom) >= 1.0 and self._below:
+            self._scheduled = True
+            self.text.after_idle(self.load_newer)
+
@@ -6,24 +6,29 @@ from typing import Dict
 
 from ..session_manager import SessionManager
 from .chat_box import ChatBox
+from .dashboard import DashboardPane
+from .ui_queue import WorkQueue, dispatcher_for
 from ..ai import AIClient
 
 
 class ControlPanel(tk.Tk):
     """Main control panel that spawns chat windows and delegates logic."""
 
-    def __init__(self, manager: SessionManager | None = None) -> None:
+    def __init__(self, manager: SessionManager | None = None, speculate: bool = False) -> None:
         super().__init__()
         self.title("TalkMatch Control Panel")
         # Position the control panel and chat windows so they do not overlap.
-        self.geometry("300x200+20+50")
+        self.geometry("300x420+20+50")
 
         self.session_manager = manager or SessionManager()
+        self.dispatcher = dispatcher_for(self)
+        # Clearing waits for a scheduler run in flight; keep it off the Tk thread.
+        self.work_queue = WorkQueue(1, "talkmatch-control")
         self.windows: Dict[str, ChatBox] = {}
 
         for idx, persona in enumerate(self.session_manager.personas):
             session = self.session_manager.sessions[persona.name]
-            win = ChatBox(self, persona, session)
+            win = ChatBox(self, persona, session, speculate=speculate)
             # Arrange chat windows horizontally with a small gap.
             win.geometry(f"+{350 + idx * 320}+50")
             self.windows[persona.name] = win
@@ -33,28 +38,48 @@ class ControlPanel(tk.Tk):
 
         self.session_manager.update_callback = self.update_match_display
 
-        tk.Button(self, text="Calculate matches", command=self.calculate).pack(
-            padx=10, pady=5
-        )
-        tk.Button(self, text="Clear matches", command=self.clear).pack(padx=10, pady=5)
+        # Matching runs in the background; the button only asks for a run now
+        # that scores the pending pairs.
+        tk.Button(self, text="Match pending now", command=self.calculate).pack(padx=10, pady=5)
+        self.clear_button = tk.Button(self, text="Clear matches", command=self.clear)
+        self.clear_button.pack(padx=10, pady=5)
+        self.dashboard = DashboardPane(self)
+        self.dashboard.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
         self.refresh_matches()
+        self.session_manager.scheduler.start()
 
     def calculate(self) -> None:
-        self.session_manager.calculate()
+        self.session_manager.scheduler.trigger()
 
     def clear(self) -> None:
-        self.session_manager.clear()
+        if self.work_queue.submit(self._clear):
+            self.clear_button.config(state=tk.DISABLED)
+
+    def _clear(self) -> None:
+        try:
+            self.session_manager.clear()
+        finally:
+            # The cleared matches reach the windows through update_callback.
+            self.dispatcher.post(lambda: self.clear_button.config(state=tk.NORMAL))
 
     def refresh_matches(self) -> None:
         self.session_manager.refresh_matches()
 
     def update_match_display(self, matches) -> None:
+        # Called from chat worker threads; widgets are updated on the Tk thread.
+        self.dispatcher.post(lambda: self._show_matches(matches))
+
+    def _show_matches(self, matches) -> None:
         for name, win in self.windows.items():
             win.controller.update_match_display(
                 matches.get(name, [])
             )
 
+    def destroy(self) -> None:
+        self.work_queue.close()
+        super().destroy()
+
     def bring_all_to_front(self) -> None:
         """Raise all application windows above others."""
         windows = [self, *self.windows.values()]
@@ -65,8 +90,12 @@ class ControlPanel(tk.Tk):
         self.after(0, lambda: [w.attributes("-topmost", False) for w in windows])
 
 
-def run_app(openai_client=None) -> None:
-    """Launch the control panel with optional preconfigured OpenAI client."""
+def run_app(openai_client=None, speculate: bool = False) -> None:
+    """Launch the control panel with optional preconfigured OpenAI client.
+
+    ``speculate`` pre-generates each persona's next message in the background.
+    """
     factory = (lambda: AIClient(openai_client=openai_client)) if openai_client else AIClient
     manager = SessionManager(ai_client_factory=factory)
-    ControlPanel(manager).mainloop()
+    ControlPanel(manager, speculate=speculate).mainloop()
+    manager.close()
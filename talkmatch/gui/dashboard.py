@@ -0,0 +1,149 @@
+"""Live load dashboard for the control panel.
+
+:class:`DashboardModel` turns consecutive :class:`~talkmatch.metrics.InMemorySink`
+snapshots into the figures an operator watches: AI requests in flight,
+queued work, latency percentiles per call type, token throughput, prompt
+cache hit rate, store write rates, the speculative message hit rate and
+the progress of a running match calculation.  Rates are differences
+between two snapshots, so nothing is computed per event;
+:class:`DashboardPane` takes one snapshot per refresh.
+"""
+
+from __future__ import annotations
+
+import time
+import tkinter as tk
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Tuple
+
+from .. import metrics
+
+# Milliseconds between dashboard refreshes.
+REFRESH_MS = 1000
+
+
+def _total(series: List[Mapping[str, Any]], name: str, key: str = "value") -> float:
+    return sum(s[key] for s in series if s["name"] == name)
+
+
+def _value(series: List[Mapping[str, Any]], name: str) -> float | None:
+    for s in series:
+        if s["name"] == name and not s["labels"]:
+            return s["value"]
+    return None
+
+
+@dataclass
+class DashboardState:
+    """Figures shown by the dashboard for one refresh."""
+
+    in_flight: int = 0
+    queue_depth: int = 0
+    writes_pending: int = 0
+    # call type -> (p50, p95) request latency in seconds.
+    latency: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    tokens_per_minute: float = 0.0
+    cache_hit_rate: float | None = None
+    writes_per_second: float = 0.0
+    bytes_per_second: float = 0.0
+    # (pairs done, pairs total) of the latest calculate() run.
+    progress: Tuple[int, int] | None = None
+    eta: float | None = None
+    # Share of speculative persona messages that were used.
+    speculation_hit_rate: float | None = None
+
+    def lines(self) -> List[str]:
+        rows = [
+            f"AI in flight: {self.in_flight}",
+            f"Queued: {self.queue_depth} UI tasks, {self.writes_pending} store writes",
+        ]
+        for call_type, (p50, p95) in sorted(self.latency.items()):
+            rows.append(f"{call_type}: p50 {p50 * 1000:.0f}ms  p95 {p95 * 1000:.0f}ms")
+        hit = "-" if self.cache_hit_rate is None else f"{self.cache_hit_rate:.0%}"
+        rows.append(f"Tokens/min: {self.tokens_per_minute:.0f}  cache hits: {hit}")
+        rows.append(
+            f"Writes/s: {self.writes_per_second:.1f} ({self.bytes_per_second / 1024:.1f} KiB/s)"
+        )
+        if self.speculation_hit_rate is not None:
+            rows.append(f"Speculation hits: {self.speculation_hit_rate:.0%}")
+        if self.progress is not None:
+            done, total = self.progress
+            eta = "" if self.eta is None else f", ETA {self.eta:.0f}s"
+            rows.append(f"Matching: {done}/{total} pairs{eta}")
+        return rows
+
+
+class DashboardModel:
+    """Compute :class:`DashboardState` from successive metric snapshots."""
+
+    def __init__(self) -> None:
+        self._previous: Dict[str, Any] | None = None
+
+    def update(self, snapshot: Dict[str, Any], now: float | None = None) -> DashboardState:
+        counters = snapshot["counters"]
+        gauges = snapshot["gauges"]
+        distributions = snapshot["distributions"]
+        state = DashboardState(
+            in_flight=int(_total(gauges, "ai_in_flight")),
+            queue_depth=int(_total(gauges, "ui_queue_depth")),
+            writes_pending=int(_total(gauges, "store_writes_pending")),
+            latency={
+                s["labels"].get("call_type", "?"): (s["p50"], s["p95"])
+                for s in distributions
+                if s["name"] == "ai_request_seconds"
+            },
+        )
+        prompt = _total(counters, "ai_prompt_tokens")
+        if prompt:
+            state.cache_hit_rate = _total(counters, "ai_cached_prompt_tokens") / prompt
+
+        taken = _total(counters, "speculation_hits") + _total(counters, "speculation_misses")
+        if taken:
+            state.speculation_hit_rate = _total(counters, "speculation_hits") / taken
+
+        previous, self._previous = self._previous, snapshot
+        elapsed = snapshot["uptime"] - previous["uptime"] if previous else 0.0
+        if elapsed > 0:  # A reset sink restarts the uptime; skip rates then.
+            before = previous["counters"]
+            tokens = prompt + _total(counters, "ai_completion_tokens")
+            tokens -= _total(before, "ai_prompt_tokens") + _total(before, "ai_completion_tokens")
+            state.tokens_per_minute = max(0.0, tokens) * 60 / elapsed
+            writes = _total(distributions, "store_save_seconds", "count") - _total(
+                previous["distributions"], "store_save_seconds", "count"
+            )
+            state.writes_per_second = max(0.0, writes) / elapsed
+            written = _total(counters, "store_bytes_written") - _total(before, "store_bytes_written")
+            state.bytes_per_second = max(0.0, written) / elapsed
+
+        total = _value(gauges, "matcher_progress_total")
+        if total:
+            done = int(_value(gauges, "matcher_progress_done") or 0)
+            state.progress = (done, int(total))
+            started = _value(gauges, "matcher_progress_started")
+            if started and 0 < done < total:
+                spent = (time.time() if now is None else now) - started
+                state.eta = spent / done * (total - done)
+        return state
+
+
+class DashboardPane(tk.LabelFrame):
+    """Show :class:`DashboardState` and refresh it every ``interval_ms``."""
+
+    def __init__(self, master: tk.Misc, interval_ms: int = REFRESH_MS) -> None:
+        super().__init__(master, text="Load")
+        self.interval_ms = interval_ms
+        self.model = DashboardModel()
+        self.text = tk.StringVar(value="Collecting metrics...")
+        tk.Label(
+            self, textvariable=self.text, justify=tk.LEFT, anchor="w", font=("Courier", 9)
+        ).pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        if not metrics.enabled():
+            metrics.set_sink(metrics.InMemorySink())
+        self.after(self.interval_ms, self.refresh)
+
+    def refresh(self) -> None:
+        sink = metrics.get_sink()
+        snapshot = getattr(sink, "snapshot", None)
+        if snapshot is not None:
+            self.text.set("\n".join(self.model.update(snapshot()).lines()))
+        self.after(self.interval_ms, self.refresh)
@@ -1,68 +1,124 @@
 """Controller for persona-specific chat logic."""
 from __future__ import annotations
 
-import threading
-import time
 import tkinter as tk
 from typing import TYPE_CHECKING, List, Tuple
 
-from ..ai import AIClient
+from .. import metrics
+from ..ai import AIClient, ai_call
+from ..prompt_budget import fit_messages
 from ..chat import ChatSession
+from ..message_log import MessageView
 from ..personas import Persona
+from ..speculation import Speculator
+from .ui_queue import UIDispatcher, WorkQueue, dispatcher_for
 
-REPLY_DELAY = 1
+# Tasks a chat window may queue before further clicks are refused.
+MAX_QUEUED = 8
 
 if TYPE_CHECKING:
     from .chat_box import ChatBox
 
 
 class PersonaChatController:
-    """Handle AI interactions for a single persona chat."""
-
-    def __init__(self, chat_box: ChatBox, persona: Persona, session: ChatSession) -> None:
+    """Handle AI interactions for a single persona chat.
+
+    Chat turns run in order on the controller's :class:`WorkQueue` and
+    results reach the window through the shared :class:`UIDispatcher`.
+    Starting a persona generation, or sending a message by hand, supersedes
+    generations that are still queued or waiting for the AI.
+
+    With ``speculate`` the next persona message is generated in the
+    background as soon as an ambassador reply lands, so the "AI" button
+    usually finds it ready.  A hand-written message invalidates it.
+    """
+
+    def __init__(
+        self,
+        chat_box: ChatBox,
+        persona: Persona,
+        session: ChatSession,
+        dispatcher: UIDispatcher | None = None,
+        work_queue: WorkQueue | None = None,
+        persona_ai: AIClient | None = None,
+        speculate: bool = False,
+    ) -> None:
         self.chat_box = chat_box
         self.persona = persona
         self.session = session
-        self.persona_ai = AIClient()
+        self.persona_ai = persona_ai or AIClient()
         self.client_name = persona.name
+        self.dispatcher = dispatcher or dispatcher_for(chat_box)
+        self.work_queue = work_queue or WorkQueue(MAX_QUEUED, f"talkmatch-{persona.name}")
+        # Bumped on the Tk thread; a generation runs only while it holds the latest.
+        self._generation = 0
+        self.speculator: Speculator[str] | None = None
+        if speculate:
+            self.speculator = Speculator("persona")
+            session.reply_callback = lambda reply: self.speculate()
 
     def ambassador_label(self) -> str:
         return self.session.ambassador_label()
 
-    def send_message(self, text: str) -> None:
+    def speculate(self) -> None:
+        """Start generating the persona's next message if it is their turn."""
+        messages = self.session.messages
+        if self.speculator is not None and messages[-1]["role"] == "assistant":
+            self.speculator.start(messages.total, self._compose)
+
+    def send_message(self, text: str) -> bool:
+        """Queue a hand-written message; return False if the queue is full."""
+        if not self.work_queue.submit(lambda: self._reply(text)):
+            return False
+        if self.speculator is not None:
+            self.speculator.invalidate()
+        self._generation += 1
         self.chat_box.display_message(self.persona.name, text)
-
-        def run() -> None:
-            time.sleep(REPLY_DELAY)
-            reply = self.session.send_client_message(self.persona.name, text)
-            self.chat_box.after(
-                0, lambda: self.chat_box.display_message(self.ambassador_label(), reply)
-            )
-
-        threading.Thread(target=run, daemon=True).start()
-
-    def next_message(self) -> None:
-        def worker() -> None:
-            context = [{"role": "system", "content": self.persona.system_prompt}]
-            context.extend(self.session.messages[1:])
-            persona_msg = self.persona_ai.get_response(context)
-            self.chat_box.after(
-                0, lambda: self.chat_box.display_message(self.persona.name, persona_msg)
-            )
-
-            def reply_worker() -> None:
-                time.sleep(REPLY_DELAY)
-                reply = self.session.send_client_message(self.persona.name, persona_msg)
-                self.chat_box.after(
-                    0,
-                    lambda: self.chat_box.display_message(
-                        self.ambassador_label(), reply
-                    ),
-                )
-
-            threading.Thread(target=reply_worker, daemon=True).start()
-
-        threading.Thread(target=worker, daemon=True).start()
+        return True
+
+    def next_message(self) -> bool:
+        """Queue an AI-written persona message, superseding earlier ones."""
+        self._generation += 1
+        generation = self._generation
+        return self.work_queue.submit(lambda: self._generate(generation))
+
+    def close(self) -> None:
+        self._generation += 1
+        self.work_queue.close()
+        if self.speculator is not None:
+            self.speculator.close()
+
+    def _superseded(self, generation: int) -> bool:
+        if generation == self._generation:
+            return False
+        metrics.increment("persona_generations_cancelled")
+        return True
+
+    def _generate(self, generation: int) -> None:
+        if self._superseded(generation):
+            return
+        persona_msg = None
+        if self.speculator is not None:
+            persona_msg = self.speculator.take(self.session.messages.total)
+        if persona_msg is None:
+            persona_msg = self._compose()
+        if self._superseded(generation):
+            return
+        self.dispatcher.post(
+            lambda: self.chat_box.display_message(self.persona.name, persona_msg)
+        )
+        self._reply(persona_msg)
+
+    def _compose(self) -> str:
+        system = {"role": "system", "content": self.persona.system_prompt}
+        context = fit_messages(MessageView([system], self.session.messages.view(1)), "persona")
+        with ai_call("persona", self.persona.name):
+            return self.persona_ai.get_response(context)
+
+    def _reply(self, text: str) -> None:
+        reply = self.session.send_client_message(self.persona.name, text)
+        label = self.ambassador_label()
+        self.dispatcher.post(lambda: self.chat_box.display_message(label, reply))
 
     def update_match_display(
         self, matches: List[Tuple[str, float]]
@@ -0,0 +1,121 @@
+"""Background work and batched UI updates for the Tk front end.
+
+Tk widgets may only be touched from the main thread.  Controllers run
+their AI calls on a :class:`WorkQueue` (one worker thread behind a bounded
+queue) and hand results back through :class:`UIDispatcher`, which drains
+everything posted since the last frame in one ``after()`` callback instead
+of scheduling a Tk event per update.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+from typing import Any, Callable
+
+from .. import metrics
+
+logger = logging.getLogger(__name__)
+
+Task = Callable[[], None]
+
+
+class WorkQueue:
+    """Run tasks in order on one worker thread; refuse them once ``maxsize`` wait."""
+
+    def __init__(self, maxsize: int = 8, name: str = "talkmatch-ui") -> None:
+        self._queue: queue.Queue[Task | None] = queue.Queue(maxsize)
+        self._name = name
+        self._thread: threading.Thread | None = None
+        self._closed = False
+        self._start_lock = threading.Lock()
+
+    def submit(self, task: Task) -> bool:
+        """Queue ``task``; return False if the queue is full or closed."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(task)
+        except queue.Full:
+            metrics.increment("ui_tasks_rejected")
+            return False
+        metrics.gauge("ui_queue_depth", self._queue.qsize(), queue=self._name)
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+                self._thread.start()
+        return True
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def close(self) -> None:
+        """Stop after the running task; queued tasks are dropped."""
+        self._closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass  # The worker sees ``_closed`` after its current task.
+
+    def _run(self) -> None:
+        while not self._closed:
+            task = self._queue.get()
+            if task is None:
+                return
+            metrics.gauge("ui_queue_depth", self._queue.qsize(), queue=self._name)
+            try:
+                task()
+            except Exception:
+                logger.exception("UI task failed")
+
+
+class UIDispatcher:
+    """Run callbacks posted from any thread on the Tk thread, once per frame."""
+
+    def __init__(self, widget: Any, interval_ms: int = 16, max_batch: int = 200) -> None:
+        self.widget = widget
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._queue: queue.SimpleQueue[Task] = queue.SimpleQueue()
+        self._job = widget.after(interval_ms, self._poll)
+
+    def post(self, callback: Task) -> None:
+        """Schedule ``callback`` for the next frame; safe from worker threads."""
+        self._queue.put(callback)
+
+    def drain(self) -> int:
+        """Run up to ``max_batch`` posted callbacks now; return how many ran."""
+        ran = 0
+        while ran < self.max_batch:
+            try:
+                callback = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            ran += 1
+            try:
+                callback()
+            except Exception:
+                logger.exception("UI update failed")
+        if ran:
+            metrics.observe("ui_updates_per_frame", ran)
+        return ran
+
+    def close(self) -> None:
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _poll(self) -> None:
+        self.drain()
+        self._job = self.widget.after(self.interval_ms, self._poll)
+
+
+def dispatcher_for(widget: Any) -> UIDispatcher:
+    """Return the dispatcher shared by all windows of ``widget``'s Tk root."""
+    root = widget._root()
+    dispatcher = getattr(root, "_talkmatch_dispatcher", None)
+    if dispatcher is None:
+        dispatcher = UIDispatcher(root)
+        root._talkmatch_dispatcher = dispatcher
+    return dispatcher
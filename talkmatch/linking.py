@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+"""Event-driven linking of reciprocated persona pairs.
+
+When two users' ambassadors are acting as each other, :class:`LinkTracker`
+watches the pair and advances both ambassadors from message events alone:
+``acting`` -> ``linking`` once both users have sent ``threshold`` messages,
+then ``linking`` -> ``linked`` when their latest messages agree.  Messages
+from users without a watched pair cost one dict lookup.
+"""
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from .ambassador import Ambassador
+
+logger = logging.getLogger(__name__)
+
+# ``(event, user_a, user_b)`` where event is "linking" or "linked".
+LinkListener = Callable[[str, str, str], None]
+
+
+@dataclass
+class _Pair:
+    users: Tuple[str, str]
+    ambassadors: Dict[str, Ambassador]
+    counts: Dict[str, int]
+    last: Dict[str, str]
+
+    def other(self, user: str) -> str:
+        a, b = self.users
+        return b if user == a else a
+
+
+@dataclass
+class LinkTracker:
+    """Keep per-pair message counters and drive linking transitions."""
+
+    threshold: int = 2
+    listeners: List[LinkListener] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pairs: Dict[str, _Pair] = {}
+
+    def subscribe(self, listener: LinkListener) -> None:
+        """Call ``listener(event, a, b)`` whenever a pair changes state."""
+        self.listeners.append(listener)
+
+    def watch(
+        self,
+        a: str,
+        ambassador_a: Ambassador,
+        count_a: int,
+        last_a: str,
+        b: str,
+        ambassador_b: Ambassador,
+        count_b: int,
+        last_b: str,
+    ) -> None:
+        """Start tracking the reciprocated pair ``a``/``b``.
+
+        ``count_*`` and ``last_*`` seed the counters with each user's message
+        count and latest message so far.
+        """
+        pair = _Pair(
+            (a, b),
+            {a: ambassador_a, b: ambassador_b},
+            {a: count_a, b: count_b},
+            {a: last_a, b: last_b},
+        )
+        with self._lock:
+            self._unwatch(a)
+            self._unwatch(b)
+            self._pairs[a] = self._pairs[b] = pair
+        logger.debug("watching link pair %s<->%s", a, b)
+
+    def unwatch(self, user: str) -> None:
+        """Stop tracking ``user`` and their partner."""
+        with self._lock:
+            self._unwatch(user)
+
+    def _unwatch(self, user: str) -> None:
+        pair = self._pairs.pop(user, None)
+        if pair is not None:
+            self._pairs.pop(pair.other(user), None)
+
+    def partner(self, user: str) -> str | None:
+        pair = self._pairs.get(user)
+        return pair.other(user) if pair else None
+
+    def on_message(self, user: str, text: str) -> None:
+        """Record a message from ``user`` and advance their pair if watched."""
+        if user not in self._pairs:
+            return
+        events = []
+        with self._lock:
+            pair = self._pairs.get(user)
+            if pair is None:
+                return
+            pair.counts[user] += 1
+            pair.last[user] = text
+            events = self._advance(pair, user)
+        for event in events:
+            for listener in list(self.listeners):
+                listener(event, *pair.users)
+
+    def _advance(self, pair: _Pair, user: str) -> List[str]:
+        a, b = pair.users
+        amb_a, amb_b = pair.ambassadors[a], pair.ambassadors[b]
+        events = []
+        if amb_a.state == amb_b.state == "acting":
+            if min(pair.counts.values()) >= self.threshold:
+                amb_a.begin_link(b, pair.last[b])
+                amb_b.begin_link(a, pair.last[a])
+                events.append("linking")
+        elif amb_a.state == amb_b.state == "linking":
+            # Keep the partner's prompt current with what this user said.
+            pair.ambassadors[pair.other(user)].link_context = pair.last[user]
+        if amb_a.state == amb_b.state == "linking":
+            if pair.last[a].lower() == pair.last[b].lower():
+                amb_a.finalize_link()
+                amb_b.finalize_link()
+                events.append("linked")
+        return events
@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+"""Tiled, resumable pairwise match computation.
+
+:class:`MatchJob` splits the upper triangle of the user-pair space into
+square tiles of ``tile_size`` x ``tile_size`` users and hands them to a
+:class:`TileExecutor`.  Scores are merged into the :class:`Matcher` as
+tiles finish and the matrix is saved together with a checkpoint listing
+completed tiles, so an interrupted run continues with the tiles that were
+not yet saved.
+
+Executors only need :meth:`TileExecutor.map_tiles`, which takes the tiles
+plus the profiles they reference and yields :class:`TileResult` objects in
+completion order; a multi-node implementation can ship tiles to remote
+workers behind the same call.  The bundled pools give every worker slot a
+contiguous run of tiles (so consecutive prompts share Person A's prefix)
+and let idle slots steal from the back of the busiest slot's queue, which
+evens out tiles that take longer because of slow or failing calls.
+
+Run ``python -m talkmatch.match_job --data-dir data`` to score every user
+with a stored profile.
+"""
+
+import argparse
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    FrozenSet,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Tuple,
+)
+
+from . import metrics
+from .ai import AIClient, ai_call
+from .matcher import Matcher, _parse_score, build_prompt
+from .storage import BASE_DIR, MatchCheckpointStore, ProfileStore
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Tile:
+    """Pairs between one block of rows and one block of columns."""
+
+    row: int
+    col: int
+    rows: Tuple[str, ...]
+    cols: Tuple[str, ...]
+    # Pairs that already hold an official match and must not be rescored.
+    skip: FrozenSet[Pair] = frozenset()
+
+    @property
+    def key(self) -> str:
+        return f"{self.row}:{self.col}"
+
+    def pairs(self) -> Iterator[Pair]:
+        for i, u in enumerate(self.rows):
+            # Diagonal tiles only cover their own upper triangle.
+            cols = self.cols[i + 1 :] if self.row == self.col else self.cols
+            for v in cols:
+                if (u, v) not in self.skip:
+                    yield u, v
+
+
+@dataclass
+class TileResult:
+    key: str
+    scores: List[Tuple[str, str, float]]
+    failed: List[Pair]
+
+
+def make_tiles(
+    users: Sequence[str],
+    tile_size: int,
+    skip: FrozenSet[Pair] = frozenset(),
+) -> List[Tile]:
+    """Cover the upper-triangular pairs of ``users`` with square tiles."""
+    blocks = [tuple(users[i : i + tile_size]) for i in range(0, len(users), tile_size)]
+    tiles = []
+    for r, rows in enumerate(blocks):
+        for c in range(r, len(blocks)):
+            cols = blocks[c]
+            members = set(rows) | set(cols)
+            tile_skip = frozenset(p for p in skip if p[0] in members and p[1] in members)
+            tiles.append(Tile(r, c, rows, cols, tile_skip))
+    return tiles
+
+
+def score_tile(tile: Tile, ai_client: AIClient, profiles: Mapping[str, str]) -> TileResult:
+    """Ask the AI for every pair in ``tile``; failed pairs are reported, not raised."""
+    scores: List[Tuple[str, str, float]] = []
+    failed: List[Pair] = []
+    with ai_call("match"):
+        for u, v in tile.pairs():
+            try:
+                reply = ai_client.get_response(
+                    [{"role": "user", "content": build_prompt(u, v, profiles)}]
+                )
+            except Exception as exc:
+                logger.warning("scoring %s/%s failed: %s", u, v, exc)
+                failed.append((u, v))
+                continue
+            scores.append((u, v, _parse_score(reply)))
+    return TileResult(tile.key, scores, failed)
+
+
+class WorkStealingQueue:
+    """Per-slot tile queues; an idle slot steals from the busiest one."""
+
+    def __init__(self, tiles: Sequence[Tile], slots: int) -> None:
+        # Deal contiguous runs so each slot walks neighbouring rows.
+        per_slot = max(1, -(-len(tiles) // max(1, slots)))
+        self._queues: List[Deque[Tile]] = [
+            deque(tiles[i * per_slot : (i + 1) * per_slot]) for i in range(max(1, slots))
+        ]
+        self.steals = 0
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues)
+
+    def take(self, slot: int) -> Optional[Tile]:
+        """Return the next tile for ``slot``, stealing if its own queue is empty."""
+        own = self._queues[slot]
+        if own:
+            return own.popleft()
+        victim = max(self._queues, key=len)
+        if not victim:
+            return None
+        self.steals += 1
+        return victim.pop()
+
+
+class TileExecutor(Protocol):
+    """Run tiles somewhere and yield their results as they complete."""
+
+    def map_tiles(
+        self, tiles: Sequence[Tile], profiles: Mapping[str, str]
+    ) -> Iterator[TileResult]:
+        ...
+
+
+# Process-pool worker state, set once per worker by the pool initializer.
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(ai_client_factory: Callable[[], AIClient], profiles: Dict[str, str]) -> None:
+    _worker["ai"] = ai_client_factory()
+    _worker["profiles"] = profiles
+
+
+def _score_in_worker(tile: Tile) -> TileResult:
+    return score_tile(tile, _worker["ai"], _worker["profiles"])
+
+
+@dataclass
+class _PoolTileExecutor(ABC):
+    ai_client_factory: Callable[[], AIClient] = AIClient
+    workers: int = 4
+
+    @abstractmethod
+    def _open(self, profiles: Dict[str, str]) -> Tuple[Executor, Callable[[Tile], Any]]:
+        """Return the pool to score on and the function scoring one tile."""
+
+    def map_tiles(
+        self, tiles: Sequence[Tile], profiles: Mapping[str, str]
+    ) -> Iterator[TileResult]:
+        queue = WorkStealingQueue(tiles, self.workers)
+        pool, score = self._open(dict(profiles))
+        in_flight: Dict[Future, int] = {}
+
+        def feed(slot: int) -> None:
+            tile = queue.take(slot)
+            if tile is not None:
+                in_flight[pool.submit(score, tile)] = slot
+
+        try:
+            for slot in range(self.workers):
+                feed(slot)
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # Refill the slot before handing the result to the caller.
+                    feed(in_flight.pop(future))
+                    yield future.result()
+        finally:
+            for future in in_flight:
+                future.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+            metrics.increment("match_tile_steals", queue.steals)
+
+
+@dataclass
+class ThreadTileExecutor(_PoolTileExecutor):
+    """Score tiles on threads; enough when the AI calls dominate."""
+
+    def _open(self, profiles: Dict[str, str]) -> Tuple[Executor, Callable[[Tile], Any]]:
+        ai = self.ai_client_factory()
+        pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="talkmatch-tile")
+        return pool, lambda tile: score_tile(tile, ai, profiles)
+
+
+@dataclass
+class ProcessTileExecutor(_PoolTileExecutor):
+    """Score tiles on a local process pool, one AI client per process.
+
+    Under the ``spawn`` start method ``ai_client_factory`` must be picklable.
+    """
+
+    workers: int = field(default_factory=lambda: os.cpu_count() or 4)
+    mp_context: Any = None
+
+    def _open(self, profiles: Dict[str, str]) -> Tuple[Executor, Callable[[Tile], Any]]:
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=self.mp_context,
+            initializer=_init_worker,
+            initargs=(self.ai_client_factory, profiles),
+        )
+        return pool, _score_in_worker
+
+
+@dataclass
+class MatchJob:
+    """Score all pairs of ``users`` tile by tile with resumable checkpoints."""
+
+    matcher: Matcher
+    executor: TileExecutor
+    checkpoint: MatchCheckpointStore = field(default_factory=MatchCheckpointStore)
+    tile_size: int = 64
+    # Seconds between matrix and checkpoint writes while the job runs.
+    save_interval: float = 5.0
+
+    def run(
+        self,
+        profile_store: ProfileStore,
+        users: List[str] | None = None,
+        should_stop: Callable[[], bool] | None = None,
+    ) -> bool:
+        """Score the remaining tiles; return True once every tile is done.
+
+        ``should_stop`` is checked after each finished tile.  Pairs whose AI
+        call fails end up in ``matcher.remaining`` when the job completes.
+        """
+        users = list(users or self.matcher.users)
+        state = self.checkpoint.load()
+        if state.get("users") != users or state.get("tile_size") != self.tile_size:
+            state = {"users": users, "tile_size": self.tile_size, "done": [], "failed": []}
+        done = set(state["done"])
+        failed = [tuple(p) for p in state["failed"]]
+        official = frozenset(
+            (u, v)
+            for u in users
+            for v, score in self.matcher.matrix.get(u, {}).items()
+            if score >= 1.0
+        )
+        tiles = [t for t in make_tiles(users, self.tile_size, official) if t.key not in done]
+        if done:
+            logger.info("resuming match job: %d tiles done, %d left", len(done), len(tiles))
+        total = len(done) + len(tiles)
+        profiles = {user: profile_store.read(user) for user in users}
+        last_save = time.monotonic()
+        stopped = False
+
+        def save() -> None:
+            # Matrix first, so every tile named in the checkpoint is on disk.
+            self.matcher.store.save(self.matcher.matrix)
+            state["done"] = sorted(done)
+            state["failed"] = [list(p) for p in failed]
+            self.checkpoint.save(state)
+
+        with metrics.span("match_job_seconds"):
+            results = self.executor.map_tiles(tiles, profiles)
+            try:
+                for result in results:
+                    for u, v, score in result.scores:
+                        self.matcher.matrix[u][v] = score
+                        self.matcher.matrix[v][u] = score
+                    metrics.increment("matcher_pairs_scored", len(result.scores))
+                    metrics.increment("match_tiles_done")
+                    failed.extend(result.failed)
+                    done.add(result.key)
+                    if time.monotonic() - last_save >= self.save_interval:
+                        save()
+                        last_save = time.monotonic()
+                    if should_stop is not None and should_stop():
+                        stopped = len(done) < total
+                        break
+            finally:
+                close = getattr(results, "close", None)
+                if close is not None:
+                    close()
+                save()
+        if stopped:
+            logger.info("match job stopped with %d tiles done", len(done))
+            return False
+        self.matcher.remaining = [(u, v) for u, v in failed] or None
+        self.checkpoint.path.unlink(missing_ok=True)
+        return True
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Score all user pairs in tiles")
+    parser.add_argument("--data-dir", type=Path, default=BASE_DIR)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--tile-size", type=int, default=64)
+    parser.add_argument(
+        "--threads", action="store_true", help="use threads instead of processes"
+    )
+    parser.add_argument(
+        "--stub", action="store_true", help="use the offline fake backend instead of OpenAI"
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    factory: Callable[[], AIClient] = AIClient
+    if args.stub:
+        from .server import stub_client_factory
+
+        factory = stub_client_factory()
+    profiles = ProfileStore(base_dir=args.data_dir / "profiles")
+    matcher = Matcher(list(profiles.profiles), path=args.data_dir / "match_matrix.json")
+    executor_type = ThreadTileExecutor if args.threads else ProcessTileExecutor
+    job = MatchJob(
+        matcher,
+        executor_type(factory, args.workers),
+        MatchCheckpointStore(args.data_dir / "match_job.json"),
+        tile_size=args.tile_size,
+    )
+    started = time.perf_counter()
+    job.run(profiles)
+    print(f"scored {len(matcher.users)} users in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,25 +2,28 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterator, List, Set, Tuple
+import logging
 import re
+import time
 
-from .ai import AIClient
+from . import metrics, prompt_builder
+from .prompt_budget import split_budget, truncate
+from .ai import AIClient, ai_call
+from .resilience import CircuitOpenError
 from .storage import ProfileStore, MatchMatrixStore
 
+logger = logging.getLogger(__name__)
+
 _SCORE_RE = re.compile(r"0(?:\.\d+)?|1(?:\.0+)?")
 
 
 def build_prompt(user_a: str, user_b: str, profiles: Dict[str, str]) -> str:
     """Construct the compatibility prompt for two users."""
-    profile_a = profiles.get(user_a, "") or "No information."
-    profile_b = profiles.get(user_b, "") or "No information."
-    return (
-        "Rate the romantic compatibility of the two people on a scale from 0 to 1.\n"
-        f"Person A profile:\n{profile_a}\n"
-        f"Person B profile:\n{profile_b}\n"
-        "Respond with only the numeric score."
-    )
+    share = split_budget("match", 2)
+    profile_a = truncate(profiles.get(user_a, "") or "No information.", share, "match")
+    profile_b = truncate(profiles.get(user_b, "") or "No information.", share, "match")
+    return prompt_builder.match_prompt(profile_a, profile_b)
 
 
 def _parse_score(reply: str) -> float:
@@ -37,6 +40,8 @@ class Matcher:
     path: Path | None = None
     matrix: Dict[str, Dict[str, float]] = field(init=False)
     store: MatchMatrixStore = field(init=False)
+    # Pairs left unscored by a run that was stopped early.
+    remaining: List[Tuple[str, str]] | None = field(init=False, default=None)
 
     def __post_init__(self) -> None:
         self.store = MatchMatrixStore(self.path) if self.path else MatchMatrixStore()
@@ -45,6 +50,27 @@ class Matcher:
     def _save(self) -> None:
         self.store.save(self.matrix)
 
+    def add_user(self, user: str) -> None:
+        """Add ``user`` to the matrix with zero scores against everyone."""
+        if user in self.users:
+            return
+        row = self.matrix.setdefault(user, {})
+        for other in self.users:
+            row.setdefault(other, 0.0)
+            self.matrix.setdefault(other, {}).setdefault(user, 0.0)
+        self.users.append(user)
+
+    def remove_user(self, user: str) -> None:
+        """Remove ``user``'s row and column from the matrix."""
+        if user not in self.users:
+            return
+        self.users.remove(user)
+        self.matrix.pop(user, None)
+        for row in self.matrix.values():
+            row.pop(user, None)
+        if self.remaining is not None:
+            self.remaining = [p for p in self.remaining if user not in p]
+
     def clear(self) -> None:
         """Reset all match scores to zero and persist the empty matrix."""
         self.matrix = {u: {v: 0.0 for v in self.users if v != u} for u in self.users}
@@ -55,6 +81,10 @@ class Matcher:
         ai_client: AIClient,
         profile_store: ProfileStore | None = None,
         users: List[str] | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        resume: bool = False,
+        pairs: List[Tuple[str, str]] | None = None,
+        on_score: Callable[[str, str], None] | None = None,
     ) -> None:
         """Ask the AI to rate compatibility for each user pair.
 
@@ -63,21 +93,84 @@ class Matcher:
         expected to return a floating point number between 0 and 1.  The score
         is stored symmetrically in the matrix.  Because our demo only has a
         handful of users we simply perform one request per pair.
+
+        ``should_stop`` is checked before each pair; once it returns True the
+        unscored pairs are kept in :attr:`remaining` and a later call with
+        ``resume=True`` continues with them instead of starting over.  Pairs
+        whose AI call fails are skipped and also kept in :attr:`remaining`,
+        so one error does not abort the run.
+
+        ``pairs`` limits the run to the given pairs of ``users``, e.g. those
+        touching users whose profiles changed.  ``on_score`` is called with
+        each pair right after its score lands in the matrix.
         """
 
         target_users = users or self.users
         store = profile_store or ProfileStore()
-        profiles = {user: store.read(user) for user in target_users}
-        for i, u in enumerate(target_users):
-            for v in target_users[i + 1 :]:
+        todo: Iterator[Tuple[str, str]] = self._pairs(target_users)
+        total = len(target_users) * (len(target_users) - 1) // 2
+        if resume and self.remaining is not None:
+            pairs = self.remaining
+        if pairs is not None:
+            targets = set(target_users)
+            selected = [(u, v) for u, v in pairs if u in targets and v in targets]
+            todo, total = iter(selected), len(selected)
+        self.remaining = None
+        # Progress for dashboards: pairs handled so far out of ``total``.
+        done = 0
+        metrics.gauge("matcher_progress_started", time.time())
+        metrics.gauge("matcher_progress_total", total)
+        metrics.gauge("matcher_progress_done", 0)
+        failed: List[Tuple[str, str]] = []
+        with metrics.span("matcher_calculate_seconds"), ai_call("match"):
+            profiles = {user: store.read(user) for user in target_users}
+            for u, v in todo:
+                metrics.gauge("matcher_progress_done", done)
+                done += 1
                 if self.matrix.get(u, {}).get(v, 0.0) >= 1.0:
                     continue
+                if should_stop is not None and should_stop():
+                    self.remaining = [(u, v), *todo]
+                    break
                 prompt = build_prompt(u, v, profiles)
-                reply = ai_client.get_response([{"role": "user", "content": prompt}])
+                try:
+                    reply = ai_client.get_response([{"role": "user", "content": prompt}])
+                except CircuitOpenError:
+                    logger.warning("provider degraded; deferring remaining pairs")
+                    self.remaining = [(u, v), *todo]
+                    break
+                except Exception as exc:
+                    logger.warning("scoring %s/%s failed: %s", u, v, exc)
+                    metrics.increment("matcher_pair_errors")
+                    failed.append((u, v))
+                    continue
                 score = _parse_score(reply)
                 self.matrix[u][v] = score
                 self.matrix[v][u] = score
-        self._save()
+                metrics.increment("matcher_pairs_scored")
+                if on_score is not None:
+                    on_score(u, v)
+            if failed:
+                self.remaining = failed + (self.remaining or [])
+            self._save()
+            if self.remaining is None:
+                metrics.gauge("matcher_progress_done", total)
+
+    def candidate_pairs(
+        self, users: List[str], targets: Set[str] | None = None
+    ) -> List[Tuple[str, str]]:
+        """Return the pairs of ``users`` to score, optionally only those touching ``targets``."""
+        return [
+            (u, v)
+            for u, v in self._pairs(users)
+            if targets is None or u in targets or v in targets
+        ]
+
+    @staticmethod
+    def _pairs(users: List[str]) -> Iterator[Tuple[str, str]]:
+        for i, u in enumerate(users):
+            for v in users[i + 1 :]:
+                yield u, v
 
     def top_matches(self, user: str, top_n: int = 3) -> List[Tuple[str, float]]:
         """Return the top ``top_n`` matches for ``user``."""
@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+"""Compact in-memory chat history.
+
+:class:`MessageLog` stores each message as a two-slot :class:`Message`
+record with an interned role instead of a dict, and keeps per-role counts
+and the index of the last message per role so linking checks are O(1).
+Records behave as read-only mappings (``msg["content"]``), so code written
+against lists of dicts keeps working.
+
+Prompts are assembled as :class:`MessageView` objects: read-only
+concatenations of existing sequences that are only walked when the API
+client serializes them, so a turn no longer copies the whole history.
+A log created with a ``measure`` function also keeps cumulative message
+sizes, letting prompt budgets size any window of it in O(1).
+
+A log may hold only the first message (the system prompt) and the most
+recent ones: ``omitted`` messages in between stay on disk, but still count
+towards :meth:`MessageLog.count_role`.
+"""
+
+import sys
+from array import array
+from itertools import islice
+from collections.abc import Mapping, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Tuple
+
+_KEYS = ("role", "content")
+
+
+class Message(Mapping):
+    """One chat message; a read-only mapping with ``role`` and ``content``."""
+
+    __slots__ = ("role", "content")
+
+    def __init__(self, role: str, content: str) -> None:
+        self.role = sys.intern(role)
+        self.content = content
+
+    def __getitem__(self, key: str) -> str:
+        if key == "content":
+            return self.content
+        if key == "role":
+            return self.role
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(_KEYS)
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"Message(role={self.role!r}, content={self.content!r})"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {"role": self.role, "content": self.content}
+
+
+def _record(message: Mapping) -> Message:
+    if isinstance(message, Message):
+        return message
+    return Message(message["role"], message["content"])
+
+
+class MessageLog(Sequence):
+    """Append-only list of :class:`Message` records with role statistics."""
+
+    __slots__ = ("_records", "_counts", "_last", "measure", "cumulative", "omitted")
+
+    def __init__(
+        self,
+        messages: Iterable[Mapping] = (),
+        measure: Callable[[str], int] | None = None,
+        omitted: int = 0,
+        omitted_roles: Mapping[str, int] | None = None,
+    ) -> None:
+        self._records: List[Message] = []
+        self._counts: Dict[str, int] = dict(omitted_roles or {})
+        self._last: Dict[str, int] = {}
+        self.measure = measure
+        # cumulative[i] is the measured size of the first i messages.
+        self.cumulative = array("q", [0]) if measure else None
+        # Messages between the first record and the second that are not loaded.
+        self.omitted = omitted
+        self.extend(messages)
+
+    def append(self, message: Mapping) -> None:
+        record = _record(message)
+        if self.cumulative is not None:
+            self.cumulative.append(self.cumulative[-1] + self.measure(record.content))
+        self._records.append(record)
+        self._counts[record.role] = self._counts.get(record.role, 0) + 1
+        self._last[record.role] = len(self._records) - 1
+
+    def extend(self, messages: Iterable[Mapping]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __getitem__(self, index: Any) -> Any:
+        return self._records[index]
+
+    def __iter__(self) -> Iterator[Message]:
+        return iter(self._records)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"MessageLog({len(self)} messages, {self.omitted} omitted)"
+
+    @property
+    def total(self) -> int:
+        """Number of messages including the omitted ones."""
+        return len(self._records) + self.omitted
+
+    def compact(self, drop: int) -> MessageLog:
+        """Return a log that omits ``drop`` more messages after the first.
+
+        Records and measured sizes are reused, so this costs O(kept).
+        """
+        drop = max(0, min(drop, len(self._records) - 1))
+        log = MessageLog.__new__(MessageLog)
+        log._records = self._records[:1] + self._records[1 + drop :]
+        log._counts = dict(self._counts)
+        log._last = {
+            role: (index - drop if index else 0)
+            for role, index in self._last.items()
+            if index == 0 or index > drop
+        }
+        log.measure = self.measure
+        log.cumulative = None
+        if self.cumulative is not None:
+            c = self.cumulative
+            base = c[1 + drop] - c[1]
+            log.cumulative = array("q", [0, c[1]] if len(c) > 1 else [0])
+            log.cumulative.extend(value - base for value in c[2 + drop :])
+        log.omitted = self.omitted + drop
+        return log
+
+    # Role statistics --------------------------------------------------------
+    def count_role(self, role: str) -> int:
+        """Return how many messages have ``role``, including omitted ones."""
+        return self._counts.get(role, 0)
+
+    def last(self, role: str) -> Message | None:
+        """Return the most recent message with ``role``, if any."""
+        index = self._last.get(role)
+        return None if index is None else self._records[index]
+
+    # Views ----------------------------------------------------------------------
+    def view(self, start: int = 0) -> MessageView:
+        """Return the messages from ``start`` onwards without copying."""
+        return MessageView.window(self, start)
+
+    def to_dicts(self, start: int = 0, stop: int | None = None) -> List[Dict[str, str]]:
+        """Return plain dicts, e.g. for JSON serialization."""
+        return [{"role": m.role, "content": m.content} for m in self._records[start:stop]]
+
+
+class MessageView(Sequence):
+    """Read-only concatenation of message sequences.
+
+    Lengths are fixed when the view is created, so messages appended to an
+    underlying log later are not visible through it.
+    """
+
+    __slots__ = ("_parts", "_len")
+
+    def __init__(self, *parts: Sequence) -> None:
+        self._parts: List[Tuple[Sequence, int, int]] = []
+        for part in parts:
+            if isinstance(part, MessageView):
+                self._parts.extend(part._parts)
+            else:
+                self._parts.append((part, 0, len(part)))
+        self._len = sum(stop - start for _, start, stop in self._parts)
+
+    @classmethod
+    def window(cls, seq: Sequence, start: int = 0, stop: int | None = None) -> MessageView:
+        """Return a view of ``seq[start:stop]``."""
+        start, stop, _ = slice(start, stop).indices(len(seq))
+        view = cls()
+        if not isinstance(seq, MessageView):
+            view._parts = [(seq, start, max(start, stop))]
+        else:
+            # Clip each part of the underlying view to the requested window.
+            offset = 0
+            for part, lo, hi in seq._parts:
+                size = hi - lo
+                a, b = max(start - offset, 0), min(stop - offset, size)
+                if a < b:
+                    view._parts.append((part, lo + a, lo + b))
+                offset += size
+        view._len = sum(hi - lo for _, lo, hi in view._parts)
+        return view
+
+    def __len__(self) -> int:
+        return self._len
+
+    def segments(self) -> List[Tuple[Sequence, int, int]]:
+        """Return the ``(sequence, start, stop)`` windows making up the view."""
+        return list(self._parts)
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step == 1:
+                return list(MessageView.window(self, start, stop))
+            return [self[i] for i in range(start, stop, step)]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError("message view index out of range")
+        for seq, start, stop in self._parts:
+            if index < stop - start:
+                return seq[start + index]
+            index -= stop - start
+        raise IndexError(index)  # pragma: no cover - lengths are consistent
+
+    def __iter__(self) -> Iterator[Mapping]:
+        for seq, start, stop in self._parts:
+            yield from islice(seq, start, stop)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Sequence) or isinstance(other, str):
+            return NotImplemented
+        return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self) -> str:
+        return f"MessageView({self._len} messages)"
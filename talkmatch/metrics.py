@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+"""Lightweight timing spans, counters and gauges with pluggable sinks.
+
+Instrumented code calls the module-level helpers (:func:`span`,
+:func:`increment`, :func:`observe`, :func:`gauge`).  They forward to the
+active sink, which defaults to :class:`NullSink`; while that default is
+installed the helpers return before doing any work, so instrumentation
+costs one attribute check per call.  Install :class:`InMemorySink` with
+:func:`set_sink` to collect metrics and export them as JSON or Prometheus
+text.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Deque, Dict, Iterator, Protocol, Tuple
+
+Labels = Tuple[Tuple[str, str], ...]
+
+PREFIX = "talkmatch_"
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class MetricsSink(Protocol):
+    """Receive metric events from instrumented code."""
+
+    enabled: bool
+
+    def increment(self, name: str, value: float, labels: Labels) -> None:
+        """Add ``value`` to a counter."""
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        """Record one sample (usually seconds) in a distribution."""
+
+    def gauge(self, name: str, value: float, labels: Labels) -> None:
+        """Set a gauge to ``value``."""
+
+
+class NullSink:
+    """Discard everything; the default sink."""
+
+    enabled = False
+
+    def increment(self, name: str, value: float, labels: Labels) -> None:
+        pass
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        pass
+
+    def gauge(self, name: str, value: float, labels: Labels) -> None:
+        pass
+
+
+class _Distribution:
+    __slots__ = ("count", "total", "samples")
+
+    def __init__(self, reservoir: int) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.samples: Deque[float] = deque(maxlen=reservoir)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.samples.append(value)
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+class InMemorySink:
+    """Aggregate metrics in memory for snapshots and exporters.
+
+    Distributions keep a count, a sum and the most recent ``reservoir``
+    samples, from which quantiles are computed on export.
+    """
+
+    enabled = True
+
+    def __init__(self, reservoir: int = 1024) -> None:
+        self.reservoir = reservoir
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.distributions: Dict[Tuple[str, Labels], _Distribution] = {}
+        self.started = time.time()
+
+    def increment(self, name: str, value: float, labels: Labels) -> None:
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, labels: Labels) -> None:
+        key = (name, labels)
+        with self._lock:
+            dist = self.distributions.get(key)
+            if dist is None:
+                dist = self.distributions[key] = _Distribution(self.reservoir)
+            dist.add(value)
+
+    def gauge(self, name: str, value: float, labels: Labels) -> None:
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.gauges.clear()
+            self.distributions.clear()
+            self.started = time.time()
+
+    # Export -----------------------------------------------------------------
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON-serializable view of all metrics."""
+
+        def series(name: str, labels: Labels, **values: Any) -> Dict[str, Any]:
+            return {"name": name, "labels": dict(labels), **values}
+
+        with self._lock:
+            return {
+                "uptime": time.time() - self.started,
+                "counters": [
+                    series(n, l, value=v) for (n, l), v in sorted(self.counters.items())
+                ],
+                "gauges": [
+                    series(n, l, value=v) for (n, l), v in sorted(self.gauges.items())
+                ],
+                "distributions": [
+                    series(
+                        n,
+                        l,
+                        count=d.count,
+                        sum=d.total,
+                        **{f"p{int(q * 100)}": d.quantile(q) for q in QUANTILES},
+                    )
+                    for (n, l), d in sorted(self.distributions.items())
+                ],
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """Render metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            gauges = sorted(self.gauges.items())
+            distributions = sorted(self.distributions.items())
+            typed = set()
+            for (name, labels), value in counters:
+                metric = f"{PREFIX}{name}_total"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} counter")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+            for (name, labels), value in gauges:
+                metric = f"{PREFIX}{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} gauge")
+                    typed.add(metric)
+                lines.append(f"{metric}{_labels(labels)} {value:g}")
+            for (name, labels), dist in distributions:
+                metric = f"{PREFIX}{name}"
+                if metric not in typed:
+                    lines.append(f"# TYPE {metric} summary")
+                    typed.add(metric)
+                for q in QUANTILES:
+                    quantile = labels + (("quantile", f"{q:g}"),)
+                    lines.append(f"{metric}{_labels(quantile)} {dist.quantile(q):g}")
+                lines.append(f"{metric}_sum{_labels(labels)} {dist.total:g}")
+                lines.append(f"{metric}_count{_labels(labels)} {dist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+_sink: MetricsSink = NullSink()
+_NOOP = nullcontext()
+
+
+def set_sink(sink: MetricsSink | None) -> MetricsSink:
+    """Install ``sink`` (``None`` disables metrics) and return the previous one."""
+    global _sink
+    previous = _sink
+    _sink = sink if sink is not None else NullSink()
+    return previous
+
+
+def get_sink() -> MetricsSink:
+    return _sink
+
+
+def enabled() -> bool:
+    return _sink.enabled
+
+
+def increment(name: str, value: float = 1.0, **labels: str) -> None:
+    if _sink.enabled:
+        _sink.increment(name, value, tuple(sorted(labels.items())))
+
+
+def observe(name: str, value: float, **labels: str) -> None:
+    if _sink.enabled:
+        _sink.observe(name, value, tuple(sorted(labels.items())))
+
+
+def gauge(name: str, value: float, **labels: str) -> None:
+    if _sink.enabled:
+        _sink.gauge(name, value, tuple(sorted(labels.items())))
+
+
+def span(name: str, **labels: str) -> ContextManager[None]:
+    """Time the enclosed block into the ``name`` distribution (in seconds)."""
+    if not _sink.enabled:
+        return _NOOP
+    return _timed(_sink, name, tuple(sorted(labels.items())))
+
+
+@contextmanager
+def _timed(sink: MetricsSink, name: str, labels: Labels) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink.observe(name, time.perf_counter() - started, labels)
+
+
+def export_prometheus() -> str:
+    """Return Prometheus text for the active sink, or an empty string."""
+    to_prometheus = getattr(_sink, "to_prometheus", None)
+    return to_prometheus() if to_prometheus else ""
+
+
+def export_json() -> str:
+    """Return a JSON snapshot of the active sink, or ``{}``."""
+    to_json = getattr(_sink, "to_json", None)
+    return to_json() if to_json else "{}"
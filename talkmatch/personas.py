@@ -2,8 +2,8 @@ from __future__ import annotations
 
 """Definitions for AI dating personas used in the demo."""
 
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field
+from typing import Dict, List
 
 from .prompts import PERSONA_DESCRIPTIONS
 
@@ -14,6 +14,8 @@ class Persona:
 
     name: str
     description: str
+    # Structured facts such as age or languages, used by simulations.
+    attributes: Dict[str, str] = field(default_factory=dict)
 
     @property
     def system_prompt(self) -> str:
@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+"""Match pools partitioned by hard profile attributes.
+
+:class:`PooledMatcher` splits users into pools keyed on structured
+attributes such as languages, region or age band, and keeps one
+:class:`Matcher` (with its own matrix file) per pool.  Users are only
+scored against members of a pool they share, so the pair count grows with
+the size of the pools rather than the whole population.
+
+Membership rules:
+
+* A multi-valued attribute (``"English, French"``) puts a user in one pool
+  per value; with several keys a user joins every combination.
+* Ages fall into ``age_band``-year bands.  Users within ``age_overlap``
+  years of a band edge also join the neighbouring band.
+* Users missing a key attribute go to the ``fallback`` value for it.
+* A pair sharing several pools is scored once, in the first shared pool
+  in sorted order; lookups merge a user's rows from all of their pools.
+
+:class:`PooledMatcher` offers the :class:`Matcher` interface used by
+``SessionManager`` and the scheduler, so pass ``pools=PoolPolicy(...)`` to
+the manager to use it.
+"""
+
+import itertools
+import logging
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Mapping, Set, Tuple
+
+from . import metrics
+from .ai import AIClient
+from .matcher import Matcher
+from .storage import ProfileStore
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+
+@dataclass
+class PoolPolicy:
+    """Which attributes partition users into match pools."""
+
+    keys: Tuple[str, ...] = ("languages", "region")
+    # Width in years of the bands used when ``"age"`` is a key.
+    age_band: int = 10
+    # Users this many years from a band edge also join the next band.
+    age_overlap: int = 2
+    # Value used for a key the user has no attribute for.
+    fallback: str = "other"
+
+    def values(self, key: str, attributes: Mapping[str, str]) -> List[str]:
+        raw = str(attributes.get(key, "")).strip()
+        if not raw:
+            return [self.fallback]
+        if key == "age":
+            return self._age_bands(raw)
+        values = {part.strip().lower() for part in re.split(r"[,/;]", raw) if part.strip()}
+        return sorted(values) or [self.fallback]
+
+    def _age_bands(self, raw: str) -> List[str]:
+        try:
+            age = int(float(raw))
+        except ValueError:
+            return [self.fallback]
+        band = age // self.age_band
+        bands = {band}
+        if age - band * self.age_band < self.age_overlap:
+            bands.add(band - 1)
+        if (band + 1) * self.age_band - 1 - age < self.age_overlap:
+            bands.add(band + 1)
+        return [f"{b * self.age_band}-{(b + 1) * self.age_band - 1}" for b in sorted(bands)]
+
+    def pools_for(self, attributes: Mapping[str, str]) -> List[str]:
+        """Return the keys of every pool a user with ``attributes`` belongs to."""
+        per_key = [[f"{key}={v}" for v in self.values(key, attributes)] for key in self.keys]
+        return sorted("|".join(combo) for combo in itertools.product(*per_key))
+
+
+def _file_name(pool: str) -> str:
+    return re.sub(r"[^a-z0-9=-]+", "_", pool.lower()) + ".json"
+
+
+class _MergedRows(Mapping):
+    """Read-only ``matrix`` view that merges a user's rows across pools."""
+
+    def __init__(self, matcher: PooledMatcher) -> None:
+        self._matcher = matcher
+
+    def __getitem__(self, user: str) -> Dict[str, float]:
+        if user not in self._matcher.membership:
+            raise KeyError(user)
+        return self._matcher.row(user)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._matcher.users)
+
+    def __len__(self) -> int:
+        return len(self._matcher.users)
+
+
+class PooledMatcher:
+    """One :class:`Matcher` per attribute pool behind the ``Matcher`` interface."""
+
+    def __init__(
+        self,
+        users: List[str],
+        base_dir: Path,
+        attributes: Callable[[str], Mapping[str, str]],
+        policy: PoolPolicy | None = None,
+    ) -> None:
+        self.base_dir = Path(base_dir)
+        self.attributes = attributes
+        self.policy = policy or PoolPolicy()
+        self.users: List[str] = []
+        self.membership: Dict[str, List[str]] = {}
+        self.pools: Dict[str, Matcher] = {}
+        # Official matches declared between users who share no pool.
+        self.declared = Matcher([], path=self.base_dir / "declared.json")
+        grouped: Dict[str, List[str]] = {}
+        for user in users:
+            self.membership[user] = self.policy.pools_for(attributes(user))
+            self.users.append(user)
+            for pool in self.membership[user]:
+                grouped.setdefault(pool, []).append(user)
+        for pool, members in grouped.items():
+            self.pools[pool] = Matcher(members, path=self.base_dir / _file_name(pool))
+        self.matrix = _MergedRows(self)
+        self._report_sizes()
+
+    # Membership -------------------------------------------------------------
+    def _pool(self, key: str) -> Matcher:
+        matcher = self.pools.get(key)
+        if matcher is None:
+            matcher = self.pools[key] = Matcher([], path=self.base_dir / _file_name(key))
+        return matcher
+
+    def shared_pool(self, a: str, b: str) -> str | None:
+        """Return the pool where the pair ``a``/``b`` is scored, if any."""
+        other = set(self.membership.get(b, ()))
+        for pool in self.membership.get(a, ()):
+            if pool in other:
+                return pool
+        return None
+
+    def add_user(self, user: str) -> None:
+        if user in self.membership:
+            return
+        self.membership[user] = self.policy.pools_for(self.attributes(user))
+        self.users.append(user)
+        for pool in self.membership[user]:
+            self._pool(pool).add_user(user)
+        self._report_sizes(self.membership[user])
+
+    def remove_user(self, user: str) -> None:
+        pools = self.membership.pop(user, None)
+        if pools is None:
+            return
+        self.users.remove(user)
+        for pool in pools:
+            self.pools[pool].remove_user(user)
+        for other in self.declared.matrix.pop(user, {}):
+            self.declared.matrix.get(other, {}).pop(user, None)
+        self._report_sizes(pools)
+
+    def pair_count(self) -> int:
+        """Return how many distinct pairs the pools score in a full run."""
+        return len(self.candidate_pairs(self.users))
+
+    def _report_sizes(self, pools: List[str] | None = None) -> None:
+        if metrics.enabled():
+            for pool in self.pools if pools is None else pools:
+                metrics.gauge("match_pool_users", len(self.pools[pool].users), pool=pool)
+
+    # Scores -----------------------------------------------------------------
+    def row(self, user: str) -> Dict[str, float]:
+        """Return ``user``'s scores against everyone they share a pool with."""
+        merged: Dict[str, float] = {}
+        for pool in self.membership.get(user, ()):
+            for other, score in self.pools[pool].matrix.get(user, {}).items():
+                if score > merged.get(other, -1.0):
+                    merged[other] = score
+        merged.update(self.declared.matrix.get(user, {}))
+        return merged
+
+    def top_matches(self, user: str, top_n: int = 3) -> List[Tuple[str, float]]:
+        return sorted(self.row(user).items(), key=lambda item: item[1], reverse=True)[:top_n]
+
+    def declare_official_match(self, a: str, b: str) -> None:
+        pool = self.shared_pool(a, b)
+        if pool is not None:
+            self.pools[pool].declare_official_match(a, b)
+        else:
+            self.declared.declare_official_match(a, b)
+
+    def clear(self) -> None:
+        for matcher in self.pools.values():
+            matcher.clear()
+        self.declared.clear()
+
+    def _save(self) -> None:
+        for matcher in self.pools.values():
+            matcher._save()
+
+    # Scoring ----------------------------------------------------------------
+    def candidate_pairs(self, users: List[str], targets: Set[str] | None = None) -> List[Pair]:
+        """Return each pair of ``users`` that shares a pool, once."""
+        selected = set(users)
+        order = {u: i for i, u in enumerate(users)}
+        pairs: List[Pair] = []
+        for key in sorted(self.pools):
+            members = [u for u in self.pools[key].users if u in selected]
+            members.sort(key=order.__getitem__)
+            for i, u in enumerate(members):
+                for v in members[i + 1 :]:
+                    if targets is not None and u not in targets and v not in targets:
+                        continue
+                    # Only the first shared pool scores the pair.
+                    if self.shared_pool(u, v) == key:
+                        pairs.append((u, v))
+        return pairs
+
+    @property
+    def remaining(self) -> List[Pair] | None:
+        pairs = [p for key in sorted(self.pools) for p in self.pools[key].remaining or []]
+        return pairs or None
+
+    @remaining.setter
+    def remaining(self, pairs: List[Pair] | None) -> None:
+        by_pool = self._split(pairs or [])
+        for key, matcher in self.pools.items():
+            matcher.remaining = by_pool.get(key) or None
+
+    def _split(self, pairs: List[Pair]) -> Dict[str, List[Pair]]:
+        by_pool: Dict[str, List[Pair]] = {}
+        for u, v in pairs:
+            pool = self.shared_pool(u, v)
+            if pool is not None:
+                by_pool.setdefault(pool, []).append((u, v))
+        return by_pool
+
+    def calculate(
+        self,
+        ai_client: AIClient,
+        profile_store: ProfileStore | None = None,
+        users: List[str] | None = None,
+        should_stop: Callable[[], bool] | None = None,
+        resume: bool = False,
+        pairs: List[Pair] | None = None,
+        on_score: Callable[[str, str], None] | None = None,
+    ) -> None:
+        """Score pairs pool by pool; see :meth:`Matcher.calculate`.
+
+        Each pool keeps its own ``remaining`` pairs, so a stopped run resumes
+        every pool where it left off.
+        """
+        target_users = users or self.users
+        if resume and self.remaining is not None:
+            pairs = self.remaining
+        if pairs is None:
+            pairs = self.candidate_pairs(target_users)
+        by_pool = self._split(pairs)
+        stopped = False
+        for key in sorted(self.pools):
+            matcher = self.pools[key]
+            todo = by_pool.get(key)
+            if not todo:
+                matcher.remaining = None
+                continue
+            if stopped:
+                matcher.remaining = todo
+                continue
+            members = set(matcher.users)
+            with metrics.span("match_pool_seconds", pool=key):
+                matcher.calculate(
+                    ai_client,
+                    profile_store=profile_store,
+                    users=[u for u in target_users if u in members],
+                    should_stop=should_stop,
+                    pairs=todo,
+                    on_score=on_score,
+                )
+            stopped = should_stop is not None and matcher.remaining is not None and should_stop()
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+"""Estimate prompt sizes and keep them within per-call-type token budgets.
+
+Token counts come from ``tiktoken`` when it is installed and otherwise
+from a heuristic calibrated against it for English chat text (about four
+UTF-8 bytes per token plus a few tokens of framing per message).  Over
+budget, chat history loses its oldest messages after the system prompt and
+profiles are cut at a word boundary.  Both are deterministic, and history
+is trimmed in whole ``trim_step`` blocks so the cached prompt prefix only
+changes once per block instead of every turn.
+
+The active :class:`PromptBudget` is module-level, like the metrics sink;
+replace it with :func:`set_budget`.
+"""
+
+import logging
+from array import array
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import accumulate
+from typing import Dict, List, Mapping, Sequence, Tuple
+
+from . import metrics
+from .message_log import MessageView
+
+logger = logging.getLogger(__name__)
+
+try:  # Optional exact tokenizer.
+    import tiktoken
+
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # pragma: no cover - depends on the environment
+    _ENCODING = None
+
+# Framing tokens the chat format adds around every message.
+MESSAGE_OVERHEAD = 4
+TRUNCATION_MARK = " [...]"
+
+
+def _count(text: str) -> int:
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return max(1, (len(text.encode("utf-8")) + 3) // 4)
+
+
+@lru_cache(maxsize=4096)
+def estimate_tokens(text: str) -> int:
+    """Return the token count of ``text`` (exact with ``tiktoken``)."""
+    return _count(text)
+
+
+def estimate_messages(messages: Sequence[Mapping[str, str]]) -> int:
+    """Return the token count of a chat prompt including message framing."""
+    return sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+
+@dataclass
+class PromptBudget:
+    """Input token limits per call type."""
+
+    limits: Dict[str, int] = field(
+        default_factory=lambda: {
+            "chat": 8000,
+            "persona": 8000,
+            "profile": 4000,
+            "match": 3000,
+            "readiness": 2000,
+        }
+    )
+    default: int = 8000
+    # Chat history is dropped in blocks of this many messages.
+    trim_step: int = 20
+
+    def limit(self, call_type: str) -> int:
+        return self.limits.get(call_type, self.default)
+
+
+_budget = PromptBudget()
+
+
+def set_budget(budget: PromptBudget) -> PromptBudget:
+    """Install ``budget`` and return the previous one."""
+    global _budget
+    previous, _budget = _budget, budget
+    return previous
+
+
+def get_budget() -> PromptBudget:
+    return _budget
+
+
+def truncate(text: str, max_tokens: int, call_type: str, keep: str = "head") -> str:
+    """Cut ``text`` to ``max_tokens``, keeping its ``head`` or ``tail``."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        cut = ""
+    elif _ENCODING is not None:
+        ids = _ENCODING.encode(text)
+        cut = _ENCODING.decode(ids[:max_tokens] if keep == "head" else ids[-max_tokens:])
+    else:
+        chars = max_tokens * 4
+        cut = text[:chars] if keep == "head" else text[-chars:]
+    # Snap to a word boundary so the cut is stable as the text grows.
+    if keep == "head" and " " in cut:
+        cut = cut.rsplit(" ", 1)[0] + TRUNCATION_MARK
+    elif keep == "tail" and " " in cut:
+        cut = TRUNCATION_MARK.lstrip() + " " + cut.split(" ", 1)[1]
+    metrics.increment("prompt_truncations", call_type=call_type, kind="text")
+    logger.warning(
+        "truncated %s prompt text from %d to about %d tokens", call_type, tokens, max_tokens
+    )
+    return cut
+
+
+def message_tokens(content: str) -> int:
+    """Return the size of one chat message including framing."""
+    # Uncached: each message is measured once when it enters a log.
+    return _count(content) + MESSAGE_OVERHEAD
+
+
+def _segments(messages: Sequence[Mapping[str, str]]) -> List[Tuple[Sequence[int], int, int]]:
+    """Return ``(cumulative sizes, start, stop)`` windows covering ``messages``."""
+    parts = messages.segments() if isinstance(messages, MessageView) else [
+        (messages, 0, len(messages))
+    ]
+    segments = []
+    for seq, start, stop in parts:
+        cumulative = getattr(seq, "cumulative", None)
+        if cumulative is not None and seq.measure is message_tokens:
+            segments.append((cumulative, start, stop))
+        else:
+            sizes = [message_tokens(seq[i]["content"]) for i in range(start, stop)]
+            segments.append((array("q", [0, *accumulate(sizes)]), 0, stop - start))
+    return segments
+
+
+def _prefix(segments: List[Tuple[Sequence[int], int, int]], count: int) -> int:
+    """Return the size of the first ``count`` messages."""
+    total = 0
+    for cumulative, start, stop in segments:
+        if count <= stop - start:
+            return total + cumulative[start + count] - cumulative[start]
+        total += cumulative[stop] - cumulative[start]
+        count -= stop - start
+    return total
+
+
+def fit_messages(
+    messages: Sequence[Mapping[str, str]],
+    call_type: str,
+    budget: PromptBudget | None = None,
+) -> Sequence[Mapping[str, str]]:
+    """Drop the oldest history after the system prompt until ``messages`` fit.
+
+    The first message and the final one (the new turn or mode instruction)
+    are always kept.  Windows of a :class:`MessageLog` measured with
+    :func:`message_tokens` are sized from its running totals.
+    """
+    budget = budget or _budget
+    limit = budget.limit(call_type)
+    segments = _segments(messages)
+    count = len(messages)
+    total = _prefix(segments, count)
+    metrics.observe("prompt_size_tokens", total, call_type=call_type)
+    if total <= limit or count <= 2:
+        return messages
+    # Smallest number of messages after the first whose removal fits the limit.
+    first = _prefix(segments, 1)
+    lo, hi = 1, count - 2
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if total - (_prefix(segments, 1 + mid) - first) <= limit:
+            hi = mid
+        else:
+            lo = mid + 1
+    # Round up to whole blocks so the kept prefix stays stable between trims.
+    step = max(1, budget.trim_step)
+    drop = min(count - 2, -(-lo // step) * step)
+    metrics.increment("prompt_truncations", call_type=call_type, kind="history")
+    logger.info("dropped %d old messages from %s prompt", drop, call_type)
+    return MessageView(MessageView.window(messages, 0, 1), MessageView.window(messages, 1 + drop))
+
+
+def split_budget(call_type: str, parts: int, reserve: int = 400) -> int:
+    """Return the tokens each of ``parts`` variable sections may use."""
+    return max(1, (_budget.limit(call_type) - reserve) // parts)
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+"""Assemble prompts with stable prefixes for provider-side prompt caching.
+
+Providers reuse the longest prompt prefix they have recently seen (OpenAI
+in 128-token steps once a prompt reaches 1024 tokens), so every builder
+here puts static instructions first, byte-identical across calls, and
+appends variable text such as profiles, chat messages and objectives last.
+Chat prompts keep the system prompt and the append-only history in front
+and add the mode-specific instruction as the final message.
+
+:class:`PrefixTracker` estimates how much of each prompt could be served
+from the provider cache by comparing it with the previous prompt sent
+under the same call type and user.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Mapping, Sequence, Tuple
+
+from . import metrics
+from .message_log import MessageView
+from .prompts import COLLECT_INFO_PROMPT
+
+PERSONA_INSTRUCTIONS = (
+    "Act as the person described below. Maintain the current topic and shift "
+    "gradually from the ambassador's tone to their style."
+)
+LINK_INSTRUCTIONS = "Other user recently said: "
+MATCH_INSTRUCTIONS = (
+    "Rate the romantic compatibility of the two people below on a scale from 0 to 1. "
+    "Respond with only the numeric score."
+)
+
+Message = Dict[str, str]
+
+
+def fill(template: str, **values: str) -> str:
+    """Substitute ``{name}`` placeholders in ``template``."""
+    for name, value in values.items():
+        template = template.replace("{" + name + "}", value)
+    return template
+
+
+def static_prefix(template: str) -> str:
+    """Return the part of ``template`` before its first placeholder."""
+    return template.split("{", 1)[0]
+
+
+# Chat ------------------------------------------------------------------------
+def persona_message(name: str, profile: str) -> Message:
+    return {
+        "role": "system",
+        "content": f"{PERSONA_INSTRUCTIONS}\nName: {name}\nProfile: {profile}",
+    }
+
+
+def link_message(context: str) -> Message:
+    return {"role": "system", "content": LINK_INSTRUCTIONS + context}
+
+
+def info_message(outstanding: Sequence[str]) -> Message:
+    return {
+        "role": "system",
+        "content": fill(COLLECT_INFO_PROMPT, objectives=", ".join(outstanding)),
+    }
+
+
+def chat_messages(
+    history: Sequence[Mapping[str, str]], instruction: Message | None
+) -> Sequence[Mapping[str, str]]:
+    """Return a view of ``history`` followed by the mode ``instruction``, if any."""
+    if instruction is None:
+        return MessageView(history)
+    return MessageView(history, [instruction])
+
+
+# Single-shot prompts -----------------------------------------------------------
+def match_prompt(profile_a: str, profile_b: str) -> str:
+    """Instructions first, then Person A, so one matrix row shares a prefix."""
+    return (
+        f"{MATCH_INSTRUCTIONS}\n"
+        f"Person A profile:\n{profile_a}\n"
+        f"Person B profile:\n{profile_b}"
+    )
+
+
+def profile_prompt(template: str, info: str, messages: str) -> str:
+    return fill(template, info=info, messages=messages)
+
+
+def readiness_prompt(template: str, objectives: Sequence[str], profile: str) -> str:
+    return fill(template, objectives="\n".join(objectives), profile=profile)
+
+
+# Cache accounting ----------------------------------------------------------------
+def _serialize(messages: Sequence[Mapping[str, str]]) -> str:
+    return "".join(f"{m['role']}\n{m['content']}\n" for m in messages)
+
+
+def _common_prefix(a: str, b: str) -> int:
+    # Binary search over slice comparisons keeps the scan in C.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+class PrefixTracker:
+    """Estimate cacheable prompt tokens per call type.
+
+    Tokens are approximated as four characters each.  A shared prefix only
+    counts once it reaches ``min_tokens`` and is rounded down to whole
+    ``block_tokens`` blocks, mirroring how OpenAI bills cached input.
+    """
+
+    def __init__(
+        self, min_tokens: int = 1024, block_tokens: int = 128, max_keys: int = 4096
+    ) -> None:
+        self.min_tokens = min_tokens
+        self.block_tokens = block_tokens
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._last: OrderedDict[Tuple[str, str | None], str] = OrderedDict()
+
+    def observe(
+        self, call_type: str, user: str | None, messages: Sequence[Mapping[str, str]]
+    ) -> Tuple[int, int]:
+        """Record a prompt and return ``(prompt_tokens, cacheable_tokens)``."""
+        text = _serialize(messages)
+        key = (call_type, user)
+        with self._lock:
+            previous = self._last.pop(key, None)
+            self._last[key] = text
+            if len(self._last) > self.max_keys:
+                self._last.popitem(last=False)
+        tokens = len(text) // 4
+        shared = _common_prefix(previous, text) // 4 if previous else 0
+        cacheable = 0
+        if shared >= self.min_tokens:
+            cacheable = shared - shared % self.block_tokens
+        metrics.increment("prompt_tokens_estimated", tokens, call_type=call_type)
+        metrics.increment("prompt_cacheable_tokens_estimated", cacheable, call_type=call_type)
+        return tokens, cacheable
+
+    def reset(self) -> None:
+        with self._lock:
+            self._last.clear()
+
+
+TRACKER = PrefixTracker()
@@ -6,7 +6,9 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Sequence
 
-from .ai import AIClient
+from . import prompt_builder
+from .prompt_budget import split_budget, truncate
+from .ai import AIClient, ai_call
 from .profile import ProfileStore
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -30,12 +32,12 @@ class ReadinessEvaluator:
     prompt_template: str = READINESS_PROMPT
 
     def score(self, objectives: Sequence[str], profile: str) -> float:
-        prompt = self.prompt_template.replace("{objectives}", "\n".join(objectives)).replace(
-            "{profile}", profile
-        )
-        response = self.ai_client.get_response([
-            {"role": "user", "content": prompt}
-        ])
+        profile = truncate(profile, split_budget("readiness", 1), "readiness")
+        prompt = prompt_builder.readiness_prompt(self.prompt_template, objectives, profile)
+        with ai_call("readiness"):
+            response = self.ai_client.get_response([
+                {"role": "user", "content": prompt}
+            ])
         try:
             return float(response.strip())
         except ValueError:
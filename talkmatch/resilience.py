@@ -0,0 +1,280 @@
+from __future__ import annotations
+
+"""Timeouts, retries, hedging and circuit breaking around ``AIClient``.
+
+:class:`ResilientAIClient` wraps any object with ``get_response`` and
+shares a :class:`Resilience` state object with its siblings, so every
+client created by one factory sees the same latency history and circuit
+breaker.  Interactive call types (chat and persona replies) may be hedged
+with a duplicate request once they run past a latency percentile and are
+never short-circuited; background call types fail fast while the breaker
+is open so matcher runs and profile rebuilds back off a degraded provider.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, FrozenSet, List
+
+import openai
+
+from . import metrics
+from .ai import current_call
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE: FrozenSet[str] = frozenset({"chat", "persona"})
+RETRYABLE_STATUS: FrozenSet[int] = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class AITimeoutError(TimeoutError):
+    """An AI call exceeded its per-call-type timeout."""
+
+
+class AIWorkersBusyError(AITimeoutError):
+    """Every local AI worker was busy; retried, but not held against the provider."""
+
+
+class CircuitOpenError(RuntimeError):
+    """Background AI work was rejected because the provider looks degraded."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Return True for rate limits, server errors, timeouts and connection errors."""
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(
+        exc, (TimeoutError, ConnectionError, openai.APIConnectionError)
+    )
+
+
+@dataclass
+class RetryPolicy:
+    """Per-call-type timeouts plus retry and hedging settings."""
+
+    timeouts: Dict[str, float] = field(
+        default_factory=lambda: {"chat": 20.0, "persona": 20.0}
+    )
+    default_timeout: float = 60.0
+    max_attempts: int = 3
+    base_delay: float = 0.5
+    max_delay: float = 8.0
+    # Hedge interactive calls that run past this latency percentile; None disables.
+    hedge_percentile: float | None = 95.0
+    hedge_min_samples: int = 20
+
+    def timeout(self, call_type: str) -> float:
+        return self.timeouts.get(call_type, self.default_timeout)
+
+    def backoff(self, attempt: int, rng: random.Random) -> float:
+        """Full-jitter exponential backoff for retry ``attempt`` (1-based)."""
+        return rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+@dataclass
+class CircuitBreaker:
+    """Open after consecutive failures and probe again after ``reset_timeout``.
+
+    While half open a single probe is let through; others are rejected until
+    it succeeds, fails or has been out for another ``reset_timeout``.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    clock: Callable[[], float] = time.monotonic
+    state: str = "closed"
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = 0.0
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = self.clock()
+            if self.state == "open":
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self.state = "half_open"
+            elif now - self._probe_at < self.reset_timeout:
+                return False  # A probe is already out.
+            self._probe_at = now
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == "half_open" or self._failures >= self.failure_threshold:
+                if self.state != "open":
+                    logger.warning("circuit breaker opened after %d failures", self._failures)
+                self.state = "open"
+                self._opened_at = self.clock()
+        metrics.gauge("ai_circuit_open", 1.0 if self.state == "open" else 0.0)
+
+
+class _LatencyTracker:
+    def __init__(self, size: int = 200) -> None:
+        self._lock = threading.Lock()
+        self._samples: Dict[str, Deque[float]] = {}
+        self._size = size
+
+    def add(self, call_type: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(call_type, deque(maxlen=self._size)).append(seconds)
+
+    def percentile(self, call_type: str, pct: float, min_samples: int) -> float | None:
+        with self._lock:
+            samples = sorted(self._samples.get(call_type, ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(pct / 100 * len(samples)))]
+
+
+@dataclass
+class Resilience:
+    """State shared by all resilient clients of one ``SessionManager``.
+
+    At most ``workers`` attempts are in flight, counting ones abandoned after
+    a timeout, so attempts never queue behind them in the executor.
+    """
+
+    policy: RetryPolicy = field(default_factory=RetryPolicy)
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    workers: int = 32
+    sleep: Callable[[float], None] = time.sleep
+    seed: int | None = None
+
+    def __post_init__(self) -> None:
+        self.latency = _LatencyTracker()
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="talkmatch-ai"
+        )
+        self.slots = threading.BoundedSemaphore(self.workers)
+        self.rng = random.Random(self.seed)
+
+
+@dataclass
+class ResilientAIClient:
+    """Drop-in ``AIClient`` replacement adding timeouts, retries and hedging."""
+
+    inner: Any
+    resilience: Resilience = field(default_factory=Resilience)
+
+    @property
+    def ledger(self) -> Any:
+        return getattr(self.inner, "ledger", False)
+
+    @ledger.setter
+    def ledger(self, value: Any) -> None:
+        self.inner.ledger = value
+
+    def get_response(self, messages: List[Dict[str, str]]) -> str:
+        call_type = current_call()[0]
+        interactive = call_type in INTERACTIVE
+        res = self.resilience
+        attempt = 0
+        while True:
+            attempt += 1
+            if not interactive and not res.breaker.allow():
+                metrics.increment("ai_circuit_rejections", call_type=call_type)
+                raise CircuitOpenError(f"provider degraded; {call_type} call rejected")
+            started = time.perf_counter()
+            try:
+                reply = self._attempt(messages, call_type, interactive)
+            except Exception as exc:
+                retryable = is_retryable(exc)
+                if retryable and not isinstance(exc, AIWorkersBusyError):
+                    res.breaker.record_failure()
+                if not retryable or attempt >= res.policy.max_attempts:
+                    raise
+                delay = res.policy.backoff(attempt, res.rng)
+                metrics.increment("ai_retries", call_type=call_type)
+                logger.info(
+                    "retrying %s call after %s (attempt %d, sleeping %.2fs)",
+                    call_type,
+                    exc,
+                    attempt,
+                    delay,
+                )
+                res.sleep(delay)
+                continue
+            res.breaker.record_success()
+            res.latency.add(call_type, time.perf_counter() - started)
+            return reply
+
+    def _submit(self, messages: List[Dict[str, str]]) -> Future | None:
+        """Start an attempt on a free worker; return None if every worker is busy."""
+        res = self.resilience
+        if not res.slots.acquire(blocking=False):
+            return None
+        # Carry the ai_call context into the worker thread for attribution.
+        ctx = contextvars.copy_context()
+        future = res.executor.submit(ctx.run, self.inner.get_response, messages)
+        future.add_done_callback(lambda _: res.slots.release())
+        return future
+
+    def _attempt(
+        self, messages: List[Dict[str, str]], call_type: str, interactive: bool
+    ) -> str:
+        res = self.resilience
+        timeout = res.policy.timeout(call_type)
+        hedge_after = None
+        if interactive and res.policy.hedge_percentile is not None:
+            hedge_after = res.latency.percentile(
+                call_type, res.policy.hedge_percentile, res.policy.hedge_min_samples
+            )
+        primary = self._submit(messages)
+        if primary is None:
+            metrics.increment("ai_workers_saturated", call_type=call_type)
+            raise AIWorkersBusyError(f"{call_type} call found every AI worker busy")
+        if hedge_after is None or hedge_after >= timeout:
+            try:
+                return primary.result(timeout=timeout)
+            except FutureTimeout:
+                raise AITimeoutError(f"{call_type} call exceeded {timeout:.1f}s")
+
+        deadline = time.monotonic() + timeout
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+        pending = {primary}
+        hedge = self._submit(messages)
+        if hedge is not None:
+            metrics.increment("ai_hedged_requests", call_type=call_type)
+            pending.add(hedge)
+        error: BaseException | None = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise AITimeoutError(f"{call_type} call exceeded {timeout:.1f}s")
+
+
+def resilient_factory(
+    factory: Callable[[], Any], resilience: Resilience | None = None
+) -> Callable[[], ResilientAIClient]:
+    """Wrap an ``ai_client_factory`` so all its clients share one :class:`Resilience`."""
+    shared = resilience or Resilience()
+    return lambda: ResilientAIClient(factory(), shared)
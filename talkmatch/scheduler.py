@@ -0,0 +1,303 @@
+from __future__ import annotations
+
+"""Background readiness checks and incremental matching.
+
+:class:`MatchScheduler` watches ``ProfileStore.versions`` from one
+worker thread.  Once profiles have changed, it waits ``debounce``
+seconds so a burst of updates shares one run, then runs the manager's
+filters on the changed users only, then scores the pairs that involve
+newly ready users or ready users whose profiles changed since their
+pairs were scored.  Matching starts as soon as ``min_newly_ready`` users
+became ready; changes to already matched users wait for ``interval``
+seconds so they are batched.
+
+At most one run is in flight, and it holds the manager's match lock, so
+a manual ``calculate()`` or ``clear()`` waits for it (``clear()``
+cancels it first).  Triggers that arrive during a run coalesce into a
+single follow-up run, :meth:`MatchScheduler.cancel` stops a run between
+pairs (unscored pairs are picked up by the next run), and persona
+assignments reach ``update_callback`` while the run is still scoring.
+Filters are expected to judge users independently, as
+:class:`~talkmatch.filters.ReadinessFilter` does.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Set, Tuple
+
+from . import metrics
+
+if TYPE_CHECKING:
+    from .session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+
+@dataclass
+class SchedulePolicy:
+    """When the scheduler checks readiness and scores pairs."""
+
+    # Seconds between checks of the profile versions.
+    poll: float = 1.0
+    # Seconds between the first profile change and the run it triggers.
+    debounce: float = 2.0
+    # Changed profiles needed before a readiness pass.
+    min_changes: int = 1
+    # Newly ready users that start matching right away.
+    min_newly_ready: int = 1
+    # Seconds after which other pending pairs (changed profiles, retries) are scored.
+    interval: float = 300.0
+    # Minimum seconds between match pushes to ``update_callback`` during a run.
+    push_interval: float = 0.5
+
+
+@dataclass
+class MatchProgress:
+    """What the scheduler is doing; read it from any thread."""
+
+    state: str = "idle"  # idle, readiness or matching
+    done: int = 0
+    total: int = 0
+    started: float | None = None
+    runs: int = 0
+    # Triggers merged into a run that was already pending or in flight.
+    coalesced: int = 0
+    cancelled: int = 0
+
+
+class MatchScheduler:
+    """Run readiness and matching for a :class:`SessionManager` in the background."""
+
+    def __init__(self, manager: SessionManager, policy: SchedulePolicy | None = None) -> None:
+        self.manager = manager
+        self.policy = policy or SchedulePolicy()
+        self.progress = MatchProgress()
+        self._cond = threading.Condition()
+        self._forced = False
+        self._stopping = False
+        self._running = False
+        self._cancel = threading.Event()
+        self._thread: threading.Thread | None = None
+        # Profile version each user had at their last readiness check.
+        self._seen: Dict[str, int] = {}
+        self._ready: Set[str] = set()
+        # Ready users whose pairs have been scored.
+        self._matched: Set[str] = set()
+        # Matched users whose profiles changed since.
+        self._stale: Set[str] = set()
+        # Pairs a cancelled, budget-stopped or failing run left unscored.
+        self._leftover: List[Pair] = []
+        self._first_change: float | None = None
+        self._last_match = time.monotonic()
+        self._last_push = 0.0
+
+    # Control ----------------------------------------------------------------
+    def start(self) -> None:
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(
+                target=self._loop, name="talkmatch-scheduler", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Cancel any run and wait for the worker thread to exit."""
+        with self._cond:
+            self._stopping = True
+            thread, self._thread = self._thread, None
+            self._cond.notify()
+        self._cancel.set()
+        if thread is not None:
+            thread.join(timeout)
+
+    def trigger(self) -> None:
+        """Ask for a run now; merged with any pending or running one.
+
+        The run skips the thresholds and scores every pending pair (new,
+        stale or left over), but not pairs that are already up to date; use
+        ``SessionManager.calculate()`` to rescore everything.
+        """
+        with self._cond:
+            if self._forced or self._running:
+                self.progress.coalesced += 1
+                metrics.increment("scheduler_triggers_coalesced")
+            self._forced = True
+            self._cond.notify()
+
+    def cancel(self) -> None:
+        """Stop the current run after the pair being scored."""
+        if self._running:
+            self._cancel.set()
+
+    def record_run(self, users: List[str], ready: Set[str]) -> None:
+        """Note a full matching run made outside the scheduler, e.g. ``calculate()``."""
+        versions = dict(self.manager.profile_store.versions)
+        for user in users:
+            self._seen[user] = versions.get(user, 0)
+        self._ready = set(ready)
+        self._matched = set(ready)
+        self._stale.clear()
+        self._leftover = list(self.manager.matcher.remaining or [])
+        self._last_match = time.monotonic()
+
+    def reset(self) -> None:
+        """Cancel any run and forget which pairs were scored, e.g. after a clear."""
+        self.cancel()
+        self._matched.clear()
+        self._stale.clear()
+        self._leftover = []
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                if not self._forced and not self._stopping:
+                    self._cond.wait(self.policy.poll)
+                if self._stopping:
+                    return
+                force, self._forced = self._forced, False
+            try:
+                if force or self._due():
+                    self.run_once(force=force)
+            except Exception:
+                logger.exception("scheduled match run failed")
+
+    # Triggers ---------------------------------------------------------------
+    def _changed(self, versions: Dict[str, int]) -> List[str]:
+        return [
+            name
+            for name in list(self.manager.sessions)
+            if name not in self._seen or versions.get(name, 0) != self._seen[name]
+        ]
+
+    def _due(self) -> bool:
+        now = time.monotonic()
+        changed = self._changed(self.manager.profile_store.versions)
+        if changed:
+            if self._first_change is None:
+                self._first_change = now
+            if (
+                len(changed) >= self.policy.min_changes
+                and now - self._first_change >= self.policy.debounce
+            ):
+                return True
+        else:
+            self._first_change = None
+        pending = self._leftover or (self._ready - self._matched) or self._stale
+        return bool(pending) and now - self._last_match >= self.policy.interval
+
+    # Running ----------------------------------------------------------------
+    def run_once(self, force: bool = False) -> bool:
+        """Check readiness and score due pairs; return True if matching ran.
+
+        ``force`` scores every pending pair regardless of the thresholds.
+        """
+        manager = self.manager
+        with self._cond:
+            if self._running:
+                return False
+            self._running = True
+        self._cancel.clear()
+        self._first_change = None
+        progress = self.progress
+        progress.state, progress.done, progress.total = "readiness", 0, 0
+        progress.started = time.time()
+        try:
+            # Waits for a manual calculate() or clear() to finish.
+            with manager._match_lock:
+                return self._run(force)
+        finally:
+            progress.state = "idle"
+            with self._cond:
+                self._running = False
+
+    def _run(self, force: bool) -> bool:
+        manager = self.manager
+        if self._cancel.is_set():  # Cancelled, e.g. by clear(), while waiting.
+            return False
+        users = list(manager.sessions)
+        versions = dict(manager.profile_store.versions)
+        changed = self._changed(versions)
+        ready_now = changed
+        for user_filter in manager.filters:
+            ready_now = user_filter.filter(ready_now)
+        for user in changed:
+            self._seen[user] = versions.get(user, 0)
+        self._ready = ((self._ready - set(changed)) | set(ready_now)) & set(users)
+        self._stale |= set(changed) & self._matched
+        self._matched &= self._ready
+        self._stale &= self._matched
+
+        newly = self._ready - self._matched
+        waited = time.monotonic() - self._last_match >= self.policy.interval
+        if not (force or len(newly) >= self.policy.min_newly_ready or waited):
+            return False
+        targets = newly | self._stale
+        ready = [u for u in users if u in self._ready]
+        pairs = self._pairs(ready, targets)
+        if pairs:
+            self._match(ready, pairs)
+        self._matched |= targets
+        self._stale -= targets
+        self._last_match = time.monotonic()
+        return bool(pairs)
+
+    def _pairs(self, ready: List[str], targets: Set[str]) -> List[Pair]:
+        members = set(ready)
+        seen: Set[Pair] = set()
+        pairs: List[Pair] = []
+        for u, v in self._leftover:
+            if u in members and v in members and (u, v) not in seen:
+                seen.add((u, v))
+                pairs.append((u, v))
+        for pair in self.manager.matcher.candidate_pairs(ready, targets):
+            if pair not in seen:
+                seen.add(pair)
+                pairs.append(pair)
+        return pairs
+
+    def _match(self, ready: List[str], pairs: List[Pair]) -> None:
+        manager = self.manager
+        progress = self.progress
+        progress.state, progress.total = "matching", len(pairs)
+        progress.runs += 1
+        metrics.increment("scheduler_runs")
+        budget_stop = manager._budget_stop()
+        ready_set = set(ready)
+
+        def should_stop() -> bool:
+            return self._cancel.is_set() or budget_stop()
+
+        def on_score(u: str, v: str) -> None:
+            progress.done += 1
+            manager._assign([u, v], ready_set)
+            now = time.monotonic()
+            if now - self._last_push >= self.policy.push_interval:
+                self._last_push = now
+                manager.refresh_matches()
+
+        with metrics.span("scheduler_run_seconds"):
+            manager.matcher.calculate(
+                manager._new_client(),
+                profile_store=manager.profile_store,
+                users=ready,
+                should_stop=should_stop,
+                pairs=pairs,
+                on_score=on_score,
+            )
+        self._leftover = list(manager.matcher.remaining or [])
+        if self._cancel.is_set():
+            progress.cancelled += 1
+            logger.info("match run cancelled with %d pairs left", len(self._leftover))
+        manager._assign(list(manager.sessions), ready_set)
+        manager.snapshot()
+        manager.refresh_matches()
@@ -0,0 +1,405 @@
+from __future__ import annotations
+
+"""Headless asyncio HTTP/WebSocket front-end for :class:`SessionManager`.
+
+The server only depends on the standard library so it can be load-tested
+on a single machine.  Every blocking ``SessionManager`` call runs on a
+thread pool while the event loop keeps serving connections, and turns for
+the same user are serialized with a per-user lock.
+
+HTTP routes::
+
+    POST /users/<name>/messages   {"text": "..."} -> {"reply", "status"}
+    GET  /users/<name>            -> {"status", "messages"}
+    GET  /matches                 -> {"matches"}
+    GET  /metrics                 -> Prometheus text from the metrics sink
+    POST /calculate               -> {"matches"}
+    POST /matches                 {"a": "...", "b": "..."} -> {"ok": true}
+
+The ``/ws`` endpoint accepts JSON frames with a ``type`` of ``message``,
+``calculate``, ``declare_match`` or ``subscribe``.  Subscribers receive a
+``{"type": "matches"}`` frame whenever match data is refreshed.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Set, Tuple
+from urllib.parse import unquote
+
+from . import metrics
+from .ai import AIClient
+from .fake_openai import FakeOpenAI
+from .session_manager import SessionManager
+
+logger = logging.getLogger(__name__)
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_MAX_BODY = 1 << 20
+
+_STATUS_TEXT = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+}
+
+
+class HTTPError(Exception):
+    """Error carrying the HTTP status to return to the client."""
+
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class ChatServer:
+    """Expose a :class:`SessionManager` over HTTP and WebSocket."""
+
+    manager: SessionManager
+    host: str = "127.0.0.1"
+    port: int = 8080
+    workers: int = 64
+    executor: ThreadPoolExecutor = field(init=False)
+    subscribers: Set[asyncio.Queue] = field(init=False, default_factory=set)
+    _user_locks: Dict[str, asyncio.Lock] = field(init=False, default_factory=dict)
+    _calc_lock: asyncio.Lock = field(init=False)
+    _loop: asyncio.AbstractEventLoop | None = field(init=False, default=None)
+    _server: asyncio.AbstractServer | None = field(init=False, default=None)
+
+    def __post_init__(self) -> None:
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="talkmatch"
+        )
+        self._calc_lock = asyncio.Lock()
+        self.manager.update_callback = self._on_matches
+
+    # Lifecycle ------------------------------------------------------------
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port, limit=_MAX_BODY
+        )
+        sock = self._server.sockets[0].getsockname()
+        self.port = sock[1]
+        logger.info("listening on http://%s:%d", self.host, self.port)
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.manager.flush()
+
+    # SessionManager operations ---------------------------------------------
+    async def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def send_message(self, name: str, text: str) -> Dict[str, Any]:
+        lock = self._user_locks.setdefault(name, asyncio.Lock())
+        async with lock:
+            if name not in self.manager.sessions:
+                await self._run(self.manager.add_user, name)
+            reply = await self._run(self.manager.send_message, name, text)
+            status = await self._run(self.manager.status, name)
+        return {"reply": reply, "status": status}
+
+    async def calculate(self) -> Dict[str, Any]:
+        async with self._calc_lock:
+            await self._run(self.manager.calculate)
+        return {"matches": self.matches()}
+
+    async def declare_match(self, a: str, b: str) -> Dict[str, Any]:
+        for name in (a, b):
+            if name not in self.manager.sessions:
+                raise HTTPError(404, f"unknown user {name!r}")
+        await self._run(self.manager.declare_match, a, b)
+        return {"ok": True}
+
+    def matches(self) -> Dict[str, List[Tuple[str, float]]]:
+        """Return current top matches without notifying subscribers."""
+        matcher = self.manager.matcher
+        return {name: matcher.top_matches(name) for name in list(self.manager.sessions)}
+
+    async def user_state(self, name: str) -> Dict[str, Any]:
+        if name not in self.manager.sessions:
+            raise HTTPError(404, f"unknown user {name!r}")
+        return {
+            "status": await self._run(self.manager.status, name),
+            "messages": await self._run(self.manager.history, name),
+        }
+
+    def _on_matches(self, matches: Dict[str, List[Tuple[str, float]]]) -> None:
+        """Forward match updates from worker threads to WebSocket subscribers."""
+        if self._loop is None or not self.subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._broadcast, matches)
+
+    def _broadcast(self, matches: Dict[str, List[Tuple[str, float]]]) -> None:
+        for queue in list(self.subscribers):
+            # Slow consumers skip snapshots; a later refresh supersedes them.
+            if not queue.full():
+                queue.put_nowait({"type": "matches", "matches": matches})
+
+    # Connection handling ----------------------------------------------------
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self._websocket(reader, writer, headers)
+                    break
+                keep_alive = headers.get("connection", "").lower() != "close"
+                if path.split("?", 1)[0] == "/metrics" and method == "GET":
+                    text = metrics.export_prometheus().encode("utf-8")
+                    self._write_response(
+                        writer, 200, text, keep_alive, "text/plain; version=0.0.4"
+                    )
+                else:
+                    status, payload = await self._dispatch(method, path, body)
+                    self._write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except HTTPError as exc:
+            self._write_response(writer, exc.status, {"error": str(exc)}, False)
+        finally:
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Tuple[str, str, Dict[str, str], bytes] | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "headers too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "malformed request line")
+        headers: Dict[str, str] = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", "0") or 0)
+        except ValueError:
+            raise HTTPError(400, "malformed Content-Length")
+        if length < 0:
+            raise HTTPError(400, "malformed Content-Length")
+        if length > _MAX_BODY:
+            raise HTTPError(413, "body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), path, headers, body
+
+    async def _dispatch(
+        self, method: str, path: str, body: bytes
+    ) -> Tuple[int, Dict[str, Any]]:
+        try:
+            data = json.loads(body) if body else {}
+            parts = [unquote(p) for p in path.split("?", 1)[0].split("/") if p]
+            if parts == ["matches"] and method == "GET":
+                return 200, {"matches": self.matches()}
+            if parts == ["matches"] and method == "POST":
+                return 200, await self.declare_match(data["a"], data["b"])
+            if parts == ["calculate"] and method == "POST":
+                return 200, await self.calculate()
+            if len(parts) == 2 and parts[0] == "users" and method == "GET":
+                return 200, await self.user_state(parts[1])
+            if len(parts) == 3 and parts[0] == "users" and parts[2] == "messages":
+                if method != "POST":
+                    raise HTTPError(405, "use POST")
+                return 200, await self.send_message(parts[1], str(data["text"]))
+            raise HTTPError(404, f"no route for {method} {path}")
+        except HTTPError as exc:
+            return exc.status, {"error": str(exc)}
+        except (KeyError, ValueError, TypeError) as exc:
+            return 400, {"error": f"bad request: {exc}"}
+        except Exception as exc:  # pragma: no cover - defensive
+            logger.exception("request failed: %s %s", method, path)
+            return 500, {"error": str(exc)}
+
+    def _write_response(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict[str, Any] | bytes,
+        keep_alive: bool,
+        content_type: str = "application/json",
+    ) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {_STATUS_TEXT.get(status, 'Error')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+
+    # WebSocket ----------------------------------------------------------------
+    async def _websocket(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        headers: Dict[str, str],
+    ) -> None:
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise HTTPError(400, "missing Sec-WebSocket-Key")
+        accept = base64.b64encode(
+            hashlib.sha1((key + _WS_GUID).encode("latin-1")).digest()
+        ).decode("latin-1")
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\n"
+                "Upgrade: websocket\r\n"
+                "Connection: Upgrade\r\n"
+                f"Sec-WebSocket-Accept: {accept}\r\n\r\n"
+            ).encode("latin-1")
+        )
+        await writer.drain()
+
+        outbox: asyncio.Queue = asyncio.Queue(maxsize=16)
+        sender = asyncio.create_task(self._ws_sender(writer, outbox))
+        try:
+            while True:
+                opcode, payload = await _read_frame(reader)
+                if opcode == 0x8:
+                    break
+                if opcode == 0x9:
+                    writer.write(_encode_frame(payload, opcode=0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                asyncio.create_task(self._ws_command(payload, outbox))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.subscribers.discard(outbox)
+            sender.cancel()
+            try:
+                writer.write(_encode_frame(b"", opcode=0x8))
+                await writer.drain()
+            except ConnectionError:
+                pass
+
+    async def _ws_sender(self, writer: asyncio.StreamWriter, outbox: asyncio.Queue) -> None:
+        while True:
+            message = await outbox.get()
+            writer.write(_encode_frame(json.dumps(message).encode("utf-8")))
+            await writer.drain()
+
+    async def _ws_command(self, payload: bytes, outbox: asyncio.Queue) -> None:
+        try:
+            data = json.loads(payload)
+            kind = data.get("type")
+            if kind == "subscribe":
+                self.subscribers.add(outbox)
+                result: Dict[str, Any] = {"matches": self.matches()}
+            elif kind == "message":
+                result = await self.send_message(data["user"], str(data["text"]))
+            elif kind == "calculate":
+                result = await self.calculate()
+            elif kind == "declare_match":
+                result = await self.declare_match(data["a"], data["b"])
+            else:
+                raise HTTPError(400, f"unknown type {kind!r}")
+            response = {"type": kind, "id": data.get("id"), **result}
+        except HTTPError as exc:
+            response = {"type": "error", "error": str(exc)}
+        except (KeyError, ValueError, TypeError, AttributeError) as exc:
+            response = {"type": "error", "error": f"bad request: {exc}"}
+        await outbox.put(response)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+    """Read one (possibly fragmented) client frame and return opcode and data."""
+    opcode = 0
+    chunks: List[bytes] = []
+    while True:
+        b1, b2 = await reader.readexactly(2)
+        fin = b1 & 0x80
+        if b1 & 0x0F:
+            opcode = b1 & 0x0F
+        length = b2 & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await reader.readexactly(8))
+        if length > _MAX_BODY:
+            raise ConnectionError("frame too large")
+        mask = await reader.readexactly(4) if b2 & 0x80 else b""
+        data = await reader.readexactly(length)
+        if mask and length:
+            key = (mask * (length // 4 + 1))[:length]
+            data = (
+                int.from_bytes(data, "big") ^ int.from_bytes(key, "big")
+            ).to_bytes(length, "big")
+        chunks.append(data)
+        if fin:
+            return opcode, b"".join(chunks)
+
+
+def _encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    """Encode an unmasked server frame."""
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 1 << 16:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def stub_client_factory(backend: FakeOpenAI | None = None) -> Callable[[], AIClient]:
+    """Return an ``ai_client_factory`` sharing one offline fake backend."""
+    shared = backend or FakeOpenAI()
+    return lambda: AIClient(openai_client=shared)
+
+
+def run_server(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    manager: SessionManager | None = None,
+    workers: int = 64,
+) -> None:
+    """Run the chat server until interrupted."""
+
+    async def main() -> None:
+        server = ChatServer(manager or SessionManager(), host, port, workers)
+        try:
+            await server.serve_forever()
+        finally:
+            await server.stop()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -3,20 +3,49 @@ from __future__ import annotations
 """Manage chat sessions and matches."""
 
 from pathlib import Path
-from typing import Callable, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import logging
+import threading
+import time
 
+from . import metrics
 from .ai import AIClient
 from .chat import ChatSession
 from .matcher import Matcher
 from .personas import PERSONAS, Persona
-from .storage import ChatStore, ProfileStore, BASE_DIR
+from .pools import PoolPolicy, PooledMatcher
+from .storage import (
+    BASE_DIR,
+    ChatStore,
+    ProfileStore,
+    SnapshotStore,
+    UsageStore,
+    flush_all,
+)
 from .filters import UserFilter, ReadinessFilter
+from .linking import LinkTracker
+from .scheduler import MatchScheduler, SchedulePolicy
+from .usage import Budget, UsageLedger
 
 logger = logging.getLogger(__name__)
 
 
+def choose_persona(matcher: Matcher, name: str, ready: Set[str]) -> Optional[str]:
+    """Return the persona ``name``'s ambassador should act as after a run."""
+    scores = matcher.matrix.get(name, {})
+    if name not in ready or any(score >= 1.0 for score in scores.values()):
+        return None
+    top = [
+        m
+        for m in matcher.top_matches(name, 1)
+        if m[0] in ready and scores.get(m[0], 0.0) < 1.0
+    ]
+    if top and top[0][1] > 0.5:
+        return top[0][0]
+    return None
+
+
 class SessionManager:
     """Handle persona sessions and matchmaking independent of the GUI."""
 
@@ -27,163 +56,354 @@ class SessionManager:
         ai_client_factory: Callable[[], AIClient] = AIClient,
         filters: Optional[List[UserFilter]] = None,
         link_threshold: int = 2,
+        budget: Optional[Budget] = None,
+        snapshot_interval: float = 30.0,
+        schedule: Optional[SchedulePolicy] = None,
+        pools: Optional[PoolPolicy] = None,
     ) -> None:
-        self.personas = personas
+        self.personas = list(personas)
         self.base_dir = base_dir
         self.ai_client_factory = ai_client_factory
+        self.budget = budget or Budget()
+        self.usage = UsageLedger(store=UsageStore(base_dir / "usage.json"))
+        # True when a calculate() run was deferred or stopped by the budget.
+        self.deferred_calculate = False
         self.profile_store = ProfileStore(base_dir=base_dir / "profiles")
         if filters is None:
-            readiness = ReadinessFilter(self.ai_client_factory(), self.profile_store)
+            readiness = ReadinessFilter(self._new_client(), self.profile_store)
             self.filters = [readiness]
         else:
             self.filters = filters
         self.sessions: Dict[str, ChatSession] = {}
+        self._lock = threading.Lock()
+        # Held by calculate(), clear() and scheduler runs so only one of them
+        # touches the matcher at a time.
+        self._match_lock = threading.RLock()
         self.link_threshold = link_threshold
-        self.matcher = Matcher(
-            [p.name for p in personas], path=base_dir / "match_matrix.json"
-        )
+        self.links = LinkTracker(threshold=link_threshold)
+        self.attributes: Dict[str, Dict[str, str]] = {p.name: p.attributes for p in personas}
+        self.matcher: Matcher | PooledMatcher
+        if pools is None:
+            self.matcher = Matcher(
+                [p.name for p in personas], path=base_dir / "match_matrix.json"
+            )
+        else:
+            # Score users only within pools of compatible hard attributes.
+            self.matcher = PooledMatcher(
+                [p.name for p in personas],
+                base_dir / "pools",
+                lambda name: self.attributes.get(name, {}),
+                pools,
+            )
         self.update_callback: Optional[
             Callable[[Dict[str, List[Tuple[str, float]]]], None]
         ] = None
-        for persona in personas:
-            history = ChatStore(path=base_dir / "chats" / f"{persona.name}.json")
-            session = ChatSession(
-                ai_client=self.ai_client_factory(),
+        for persona in self.personas:
+            self.sessions[persona.name] = self._create_session(persona)
+        self.snapshot_store = SnapshotStore(base_dir / "snapshot.json")
+        self.snapshot_interval = snapshot_interval
+        self._last_snapshot = time.monotonic()
+        self.restore()
+        # Background matching; start it with ``manager.scheduler.start()``.
+        self.scheduler = MatchScheduler(self, schedule)
+
+    def _create_session(self, persona: Persona) -> ChatSession:
+        history = ChatStore(path=self.base_dir / "chats" / f"{persona.name}.json")
+        session = ChatSession(
+            ai_client=self._new_client(),
+            profile_store=self.profile_store,
+            chat_store=history,
+        )
+        session.update_callback = self.refresh_matches
+        session.allow_profile_update = self._within_user_budget
+        return session
+
+    def _new_client(self) -> AIClient:
+        """Create an AI client that reports token usage to the ledger."""
+        client = self.ai_client_factory()
+        if getattr(client, "ledger", False) is None:
+            client.ledger = self.usage
+        return client
+
+    # Budgets ------------------------------------------------------------
+    def _within_global_budget(self) -> bool:
+        limit = self.budget.global_hour
+        return limit is None or self.usage.global_hour() < limit
+
+    def _within_user_budget(self, name: str) -> bool:
+        """Return True if background work for ``name`` may call the AI now."""
+        limit = self.budget.per_user_hour
+        if limit is not None and self.usage.user_hour(name) >= limit:
+            logger.info("deferring background work for %s: hourly budget used", name)
+            return False
+        return self._within_global_budget()
+
+    # Public API ---------------------------------------------------------
+    def add_user(
+        self,
+        name: str,
+        description: str = "",
+        attributes: Optional[Dict[str, str]] = None,
+    ) -> ChatSession:
+        """Return the session for ``name``, creating it on first use."""
+        with self._lock:
+            session = self.sessions.get(name)
+            if session is None:
+                persona = Persona(name, description, dict(attributes or {}))
+                session = self._create_session(persona)
+                self.personas.append(persona)
+                self.attributes[name] = persona.attributes
+                self.matcher.add_user(name)
+                self.sessions[name] = session
+            return session
+
+    def remove_user(self, name: str) -> None:
+        """Drop ``name``'s session, profile, chat history and match scores."""
+        with self._lock:
+            session = self.sessions.pop(name, None)
+            if session is None:
+                return
+            self.personas = [p for p in self.personas if p.name != name]
+            self.links.unwatch(name)
+            self.matcher.remove_user(name)
+            self.attributes.pop(name, None)
+            store = self.profile_store
+            store.pending.pop(name, None)
+            store.versions.pop(name, None)
+            store.coverage.remove(name)
+            if store.profiles.pop(name, None) is not None:
+                store.save(store.profiles)
+            if session.chat_store is not None:
+                session.chat_store.delete()
+
+    def status(self, name: str) -> str:
+        """Return the ambassador label shown next to ``name``'s chat."""
+        return self.sessions[name].ambassador_label()
+
+    def history(self, name: str) -> List[Dict[str, str]]:
+        """Return ``name``'s chat messages after the system prompt."""
+        return self.sessions[name].history()
+
+    def calculate(self, resume: bool = False) -> None:
+        """Compute matches and assign personas to sessions.
+
+        When the global budget is exhausted the run is deferred; when the
+        per-run budget runs out the remaining pairs are deferred.  Either
+        way :attr:`deferred_calculate` is set and :meth:`run_deferred`
+        picks the work up later.
+        """
+        if not self._within_global_budget():
+            logger.info("deferring calculate: global hourly budget used")
+            self.deferred_calculate = True
+            return
+        with self._match_lock:
+            personas = list(self.personas)
+            users = [p.name for p in personas]
+            for user_filter in self.filters:
+                users = user_filter.filter(users)
+            self.matcher.calculate(
+                self._new_client(),
                 profile_store=self.profile_store,
-                chat_store=history,
+                users=users,
+                should_stop=self._budget_stop(),
+                resume=resume,
             )
-            session.update_callback = self.refresh_matches
-            self.sessions[persona.name] = session
+            self.deferred_calculate = self.matcher.remaining is not None
+            if self.deferred_calculate:
+                logger.info(
+                    "calculate stopped by budget with %d pairs left",
+                    len(self.matcher.remaining),
+                )
+            self._assign([p.name for p in personas], set(users), force=True)
+            self.scheduler.record_run([p.name for p in personas], set(users))
+            self.snapshot()
+            self.refresh_matches()
 
-    # Public API ---------------------------------------------------------
-    def calculate(self) -> None:
-        """Compute matches and assign personas to sessions."""
-        users = [p.name for p in self.personas]
-        for user_filter in self.filters:
-            users = user_filter.filter(users)
-        ai = self.ai_client_factory()
-        self.matcher.calculate(ai, profile_store=self.profile_store, users=users)
-        for persona in self.personas:
-            session = self.sessions[persona.name]
-            if persona.name not in users or self._has_official_match(persona.name):
-                session.set_persona(None)
+    def _budget_stop(self) -> Callable[[], bool]:
+        """Return a ``should_stop`` check for one matching run."""
+        start = self.usage.tokens("match")
+
+        def should_stop() -> bool:
+            limit = self.budget.per_calculate
+            if limit is not None and self.usage.tokens("match") - start >= limit:
+                return True
+            return not self._within_global_budget()
+
+        return should_stop
+
+    def _assign(self, names: List[str], ready: Set[str], force: bool = False) -> None:
+        """Point each ambassador in ``names`` at its best ready match.
+
+        Without ``force`` only ambassadors whose persona changes are reset,
+        so running links are left alone.
+        """
+        for name in names:
+            session = self.sessions.get(name)
+            if session is None:
                 continue
-            top = [
-                m
-                for m in self.matcher.top_matches(persona.name, 1)
-                if m[0] in users and self.matcher.matrix[persona.name].get(m[0], 0.0) < 1.0
-            ]
-            if top and top[0][1] > 0.5:
-                session.set_persona(top[0][0])
-            else:
-                session.set_persona(None)
-        self.refresh_matches()
+            persona = choose_persona(self.matcher, name, ready)
+            if force or persona != session.ambassador.persona:
+                session.set_persona(persona)
+        for name in names:
+            if name in self.sessions:
+                self._sync_link(name)
+
+    def run_deferred(self) -> None:
+        """Retry background work that was deferred while over budget."""
+        for name in list(self.profile_store.pending):
+            session = self.sessions.get(name)
+            if session is not None and self._within_user_budget(name):
+                self.profile_store.flush_pending(session.ai_client, name)
+        if self.deferred_calculate and self._within_global_budget():
+            self.calculate(resume=True)
+
+    def close(self) -> None:
+        """Stop background matching and persist state."""
+        self.scheduler.stop()
+        self.flush()
+
+    def flush(self) -> None:
+        """Persist in-memory state such as token usage and deferred writes."""
+        self.usage.flush()
+        self.snapshot()
+        flush_all()
+
+    # Snapshots ------------------------------------------------------------
+    def snapshot(self) -> None:
+        """Write ambassador, linking and deferred-work state to one file.
+
+        Chats, profiles and the match matrix persist in their own stores;
+        together with this snapshot they restore a running manager without
+        re-running readiness checks or ``calculate()``.
+        """
+        self._last_snapshot = time.monotonic()
+        ambassadors = {}
+        for name, session in list(self.sessions.items()):
+            amb = session.ambassador
+            if amb.state != "collecting_info":
+                ambassadors[name] = [amb.state, amb.persona, amb.link_target, amb.link_context]
+        remaining = self.matcher.remaining
+        self.snapshot_store.save(
+            {
+                "version": 1,
+                "saved_at": time.time(),
+                "users": [
+                    [p.name, p.description, p.attributes] for p in list(self.personas)
+                ],
+                "ambassadors": ambassadors,
+                "profile_versions": dict(self.profile_store.versions),
+                "pending": {k: list(v) for k, v in list(self.profile_store.pending.items())},
+                "remaining": None if remaining is None else [list(p) for p in remaining],
+                "deferred_calculate": self.deferred_calculate,
+            }
+        )
+
+    def restore(self) -> bool:
+        """Load the last snapshot, if any; return True when state was restored."""
+        data: Dict[str, Any] = self.snapshot_store.load()
+        if data.get("version") != 1:
+            return False
+        started = time.perf_counter()
+        for name, description, attributes in data.get("users", []):
+            if name not in self.sessions:
+                self.add_user(name, description, attributes)
+        for name, (state, persona, target, context) in data.get("ambassadors", {}).items():
+            session = self.sessions.get(name)
+            if session is None:
+                continue
+            amb = session.ambassador
+            amb.state, amb.persona, amb.link_target, amb.link_context = (
+                state,
+                persona,
+                target,
+                context,
+            )
+        self.profile_store.versions.update(data.get("profile_versions", {}))
+        for name, texts in data.get("pending", {}).items():
+            self.profile_store.pending.setdefault(name, []).extend(texts)
+        remaining = data.get("remaining")
+        if remaining is not None:
+            self.matcher.remaining = [(a, b) for a, b in remaining]
+        self.deferred_calculate = bool(data.get("deferred_calculate"))
+        for name in list(self.sessions):
+            self._sync_link(name)
+        logger.info(
+            "restored snapshot with %d ambassadors in %.3fs",
+            len(data.get("ambassadors", {})),
+            time.perf_counter() - started,
+        )
+        return True
+
+    def _maybe_snapshot(self) -> None:
+        if time.monotonic() - self._last_snapshot >= self.snapshot_interval:
+            self.snapshot()
 
     def clear(self) -> None:
-        """Reset matches."""
-        self.matcher.clear()
-        for session in self.sessions.values():
-            session.set_persona(None)
-        self.refresh_matches()
+        """Reset matches, after stopping any scheduler run in flight.
+
+        Waits for the run's current AI call to return, so GUI callers run
+        it on a worker thread.
+        """
+        self.scheduler.cancel()
+        with self._match_lock:
+            self.scheduler.reset()
+            self.matcher.clear()
+            for name, session in list(self.sessions.items()):
+                session.set_persona(None)
+                self.links.unwatch(name)
+            self.snapshot()
+            self.refresh_matches()
 
     def refresh_matches(
         self,
     ) -> Dict[str, List[Tuple[str, float]]]:
         """Return match data and invoke any registered callback."""
-        matches = {name: self.matcher.top_matches(name) for name in self.sessions}
+        with metrics.span("refresh_matches_seconds"):
+            matches = {
+                name: self.matcher.top_matches(name) for name in list(self.sessions)
+            }
         if self.update_callback:
             self.update_callback(matches)
         return matches
 
     # Linking and matching ------------------------------------------------
-    def _user_messages(self, session: ChatSession) -> List[str]:
-        return [m["content"] for m in session.messages if m["role"] == "user"]
-
-    def _last_user_message(self, session: ChatSession) -> str:
-        for msg in reversed(session.messages):
-            if msg["role"] == "user":
-                return msg["content"]
-        return ""
-
-    def _maybe_link(self, name: str) -> None:
+    def _sync_link(self, name: str) -> None:
+        """Watch ``name``'s pair if both ambassadors act as each other."""
         session = self.sessions[name]
         persona = session.ambassador.persona
-        if not persona:
-            logger.debug(
-                "_maybe_link: %s state=%s no persona", name, session.ambassador.state
-            )
+        other = self.sessions.get(persona) if persona else None
+        if other is None or other.ambassador.persona != name:
+            self.links.unwatch(name)
             return
-        other = self.sessions.get(persona)
-        if not other or other.ambassador.persona != name:
-            logger.debug(
-                "_maybe_link: %s persona=%s not reciprocated", name, persona
-            )
+        if self.links.partner(name) == persona:
             return
-        msgs = len(self._user_messages(session))
-        other_msgs = len(self._user_messages(other))
-        logger.debug(
-            "_maybe_link: %s<->%s msgs=%d other_msgs=%d threshold=%d",
+
+        def last(s: ChatSession) -> str:
+            message = s.messages.last("user")
+            return message.content if message else ""
+
+        self.links.watch(
             name,
+            session.ambassador,
+            session.messages.count_role("user"),
+            last(session),
             persona,
-            msgs,
-            other_msgs,
-            self.link_threshold,
+            other.ambassador,
+            other.messages.count_role("user"),
+            last(other),
         )
-        if msgs >= self.link_threshold and other_msgs >= self.link_threshold:
-            context_a = self._last_user_message(other)
-            context_b = self._last_user_message(session)
-            logger.debug(
-                "_maybe_link: linking %s<->%s with contexts %r | %r",
-                name,
-                persona,
-                context_b,
-                context_a,
-            )
-            session.ambassador.begin_link(persona, context_a)
-            other.ambassador.begin_link(name, context_b)
-            self._maybe_finalize_link(name)
-
-    def _maybe_finalize_link(self, name: str) -> None:
-        session = self.sessions[name]
-        if session.ambassador.state != "linking":
-            logger.debug(
-                "_maybe_finalize_link: %s state=%s not linking",
-                name,
-                session.ambassador.state,
-            )
-            return
-        other_name = session.ambassador.link_target
-        if not other_name:
-            logger.debug("_maybe_finalize_link: %s has no link_target", name)
-            return
-        other = self.sessions[other_name]
-        if other.ambassador.state != "linking" or other.ambassador.link_target != name:
-            logger.debug(
-                "_maybe_finalize_link: %s and %s not mutually linking",
-                name,
-                other_name,
-            )
-            return
-        last_a = self._last_user_message(session)
-        last_b = self._last_user_message(other)
-        logger.debug(
-            "_maybe_finalize_link: last messages %r | %r", last_a, last_b
-        )
-        if last_a.lower() == last_b.lower():
-            logger.debug("finalizing link %s<->%s", name, other_name)
-            session.ambassador.finalize_link()
-            other.ambassador.finalize_link()
 
     def send_message(self, name: str, text: str) -> str:
         reply = self.sessions[name].send_client_message(name, text)
-        self._maybe_link(name)
-        self._maybe_finalize_link(name)
+        with metrics.span("link_check_seconds"):
+            self.links.on_message(name, text)
+        self._maybe_snapshot()
         return reply
 
     def declare_match(self, a: str, b: str) -> None:
+        self.links.unwatch(a)
+        self.links.unwatch(b)
         self.sessions[a].ambassador.declare_match(b)
         self.sessions[b].ambassador.declare_match(a)
         self.matcher.declare_official_match(a, b)
-
-    def _has_official_match(self, user: str) -> bool:
-        return any(score >= 1.0 for score in self.matcher.matrix.get(user, {}).values())
+        self.snapshot()
@@ -0,0 +1,673 @@
+from __future__ import annotations
+
+"""Partition users across worker processes by consistent hashing.
+
+:class:`ShardRouter` stands in for :class:`SessionManager` in front of the
+server.  It owns no chat sessions itself: each user is assigned to a worker
+process by a :class:`HashRing` over the user name, and every worker runs an
+ordinary ``SessionManager`` in its own data directory
+(``<base_dir>/shards/<n>``), so JSON serialization, prompt assembly and
+profile rebuilds for different users no longer share one GIL.
+
+Work that touches two users goes through the router:
+
+* linking: the router mirrors every ambassador and runs the
+  :class:`LinkTracker`; state changes are pushed to the owning workers.
+* ``declare_match``: both owners are updated and the official match is
+  recorded in the router's global match matrix.
+* ``calculate``: readiness filters and profiles are gathered from every
+  worker, pairs are scored into the global matrix and persona assignments
+  go back in one batch per worker.
+
+:meth:`ShardRouter.resize` changes the number of workers and moves only the
+users whose ring owner changed, together with their chat, profile and
+ambassador state.  Workers use the default ``multiprocessing`` start method
+unless ``mp_context`` says otherwise; under ``spawn`` or ``forkserver`` the
+AI client factory and manager options must be picklable.
+"""
+
+import bisect
+import hashlib
+import itertools
+import logging
+import multiprocessing
+import shutil
+import signal
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import metrics, prompt_budget
+from .ai import AIClient
+from .ambassador import Ambassador
+from .linking import LinkTracker
+from .matcher import Matcher
+from .message_log import MessageLog
+from .personas import PERSONAS, Persona
+from .session_manager import SessionManager, choose_persona
+from .storage import BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+# ``(state, persona, link_target, link_context)`` of one ambassador.
+AmbassadorState = Tuple[str, Optional[str], Optional[str], Optional[str]]
+
+
+class ShardError(RuntimeError):
+    """A worker process failed a request or exited."""
+
+
+def _hash(key: str) -> int:
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+class HashRing:
+    """Consistent hash ring mapping user names to shard numbers.
+
+    Each shard owns ``replicas`` points on the ring, so adding or removing
+    one shard only moves the keys between its points and their neighbours.
+    """
+
+    def __init__(self, shards: Iterable[int], replicas: int = 64) -> None:
+        self.shards = sorted(set(shards))
+        points = sorted(
+            (_hash(f"shard-{shard}-{replica}"), shard)
+            for shard in self.shards
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [shard for _, shard in points]
+
+    def node_for(self, key: str) -> int:
+        """Return the shard that owns ``key``."""
+        if not self._points:
+            raise LookupError("hash ring has no shards")
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+def _state(ambassador: Ambassador) -> AmbassadorState:
+    return (
+        ambassador.state,
+        ambassador.persona,
+        ambassador.link_target,
+        ambassador.link_context,
+    )
+
+
+def _apply(ambassador: Ambassador, state: AmbassadorState) -> None:
+    (
+        ambassador.state,
+        ambassador.persona,
+        ambassador.link_target,
+        ambassador.link_context,
+    ) = state
+
+
+# Worker side ---------------------------------------------------------------
+class ShardWorker:
+    """Requests a worker process serves from its own ``SessionManager``."""
+
+    def __init__(self, manager: SessionManager) -> None:
+        self.manager = manager
+
+    def users(self) -> List[str]:
+        return list(self.manager.sessions)
+
+    def add_user(
+        self, name: str, description: str, attributes: Optional[Dict[str, str]]
+    ) -> None:
+        self.manager.add_user(name, description, attributes)
+
+    def send(self, name: str, text: str) -> str:
+        # The router runs linking across shards, so skip the local tracker.
+        reply = self.manager.sessions[name].send_client_message(name, text)
+        self.manager._maybe_snapshot()
+        return reply
+
+    def status(self, name: str) -> str:
+        return self.manager.status(name)
+
+    def history(self, name: str) -> List[Dict[str, str]]:
+        return self.manager.history(name)
+
+    def ready(self, names: List[str]) -> List[str]:
+        """Return the ``names`` that pass this worker's user filters."""
+        for user_filter in self.manager.filters:
+            names = user_filter.filter(names)
+        return names
+
+    def profiles(self, names: List[str]) -> Dict[str, str]:
+        return {name: self.manager.profile_store.read(name) for name in names}
+
+    def link_state(self) -> Dict[str, Tuple[AmbassadorState, int, str]]:
+        """Return every user's ambassador, message count and last message."""
+        result = {}
+        for name, session in list(self.manager.sessions.items()):
+            last = session.messages.last("user")
+            result[name] = (
+                _state(session.ambassador),
+                session.messages.count_role("user"),
+                last.content if last else "",
+            )
+        return result
+
+    def set_ambassadors(self, states: Dict[str, AmbassadorState]) -> None:
+        for name, state in states.items():
+            _apply(self.manager.sessions[name].ambassador, state)
+
+    def assign(self, personas: Dict[str, Optional[str]]) -> None:
+        for name, persona in personas.items():
+            self.manager.sessions[name].set_persona(persona)
+        self.manager.snapshot()
+
+    def declare(self, name: str, other: str) -> None:
+        self.manager.sessions[name].ambassador.declare_match(other)
+        self.manager.snapshot()
+
+    def clear(self) -> None:
+        for session in list(self.manager.sessions.values()):
+            session.set_persona(None)
+        self.manager.snapshot()
+
+    def export_users(self, names: List[str]) -> List[Dict[str, Any]]:
+        """Return everything needed to recreate ``names`` on another worker."""
+        store = self.manager.profile_store
+        personas = {p.name: p for p in self.manager.personas}
+        records = []
+        for name in names:
+            session = self.manager.sessions[name]
+            records.append(
+                {
+                    "name": name,
+                    "description": personas[name].description,
+                    "attributes": personas[name].attributes,
+                    "messages": session.history(0),
+                    "profile": store.profiles.get(name),
+                    "version": store.versions.get(name),
+                    "pending": store.pending.get(name, []),
+                    "ambassador": _state(session.ambassador),
+                }
+            )
+        return records
+
+    def import_users(self, records: List[Dict[str, Any]]) -> None:
+        store = self.manager.profile_store
+        for record in records:
+            name = record["name"]
+            session = self.manager.add_user(
+                name, record["description"], record["attributes"]
+            )
+            session.messages = MessageLog(
+                record["messages"], measure=prompt_budget.message_tokens
+            )
+            session.save_history()
+            if record["profile"] is not None:
+                store.profiles[name] = record["profile"]
+            if record["version"] is not None:
+                store.versions[name] = record["version"]
+            if record["pending"]:
+                store.pending[name] = list(record["pending"])
+            _apply(session.ambassador, record["ambassador"])
+        store.save(store.profiles)
+        self.manager.snapshot()
+
+    def remove_users(self, names: List[str]) -> None:
+        for name in names:
+            self.manager.remove_user(name)
+        self.manager.snapshot()
+
+    def flush(self) -> None:
+        self.manager.flush()
+
+
+def _serve(
+    conn: Any,
+    base_dir: Path,
+    ai_client_factory: Callable[[], AIClient],
+    threads: int,
+    options: Dict[str, Any],
+) -> None:
+    """Worker process main loop: answer ``(id, op, args)`` requests from ``conn``."""
+    # Ctrl+C reaches the whole process group; the router decides when to stop.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    manager = SessionManager(
+        personas=[], base_dir=base_dir, ai_client_factory=ai_client_factory, **options
+    )
+    worker = ShardWorker(manager)
+    send_lock = threading.Lock()
+
+    def run(req_id: int, op: str, args: Tuple[Any, ...]) -> None:
+        try:
+            reply = (req_id, True, getattr(worker, op)(*args))
+        except Exception as exc:
+            logger.warning("shard request %s failed: %s", op, exc)
+            reply = (req_id, False, f"{type(exc).__name__}: {exc}")
+        with send_lock:
+            conn.send(reply)
+
+    pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="talkmatch-shard")
+    try:
+        while True:
+            try:
+                request = conn.recv()
+            except EOFError:
+                break
+            if request is None:
+                break
+            pool.submit(run, *request)
+    finally:
+        pool.shutdown(wait=True)
+        manager.flush()
+        conn.close()
+
+
+# Router side ---------------------------------------------------------------
+class _Shard:
+    """Router-side handle on one worker process."""
+
+    def __init__(
+        self,
+        index: int,
+        context: Any,
+        base_dir: Path,
+        ai_client_factory: Callable[[], AIClient],
+        threads: int,
+        options: Dict[str, Any],
+    ) -> None:
+        self.index = index
+        self.conn, child = context.Pipe()
+        self.process = context.Process(
+            target=_serve,
+            args=(child, base_dir, ai_client_factory, threads, options),
+            name=f"talkmatch-shard-{index}",
+            daemon=True,
+        )
+        self.process.start()
+        child.close()
+        self._ids = itertools.count()
+        self._pending: Dict[int, Future] = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(
+            target=self._read, name=f"talkmatch-shard-{index}-reader", daemon=True
+        )
+        self._reader.start()
+
+    def submit(self, op: str, *args: Any) -> Future:
+        future: Future = Future()
+        with self._lock:
+            req_id = next(self._ids)
+            self._pending[req_id] = future
+            self.conn.send((req_id, op, args))
+        return future
+
+    def call(self, op: str, *args: Any) -> Any:
+        return self.submit(op, *args).result()
+
+    def _read(self) -> None:
+        while True:
+            try:
+                req_id, ok, result = self.conn.recv()
+            except (EOFError, OSError):
+                break
+            with self._lock:
+                future = self._pending.pop(req_id)
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(ShardError(f"shard {self.index}: {result}"))
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ShardError(f"shard {self.index} exited"))
+
+    def close(self, timeout: float = 10.0) -> None:
+        try:
+            with self._lock:
+                self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning("shard %d did not stop; terminating", self.index)
+            self.process.terminate()
+        self._reader.join(timeout)
+        self.conn.close()
+
+
+class _Gate:
+    """Let routed calls run concurrently but exclusively of :meth:`resize`."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._active = 0
+        self._closed = False
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        with self._cond:
+            while self._closed:
+                self._cond.wait()
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._active -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        with self._cond:
+            while self._closed:
+                self._cond.wait()
+            self._closed = True
+            while self._active:
+                self._cond.wait()
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._closed = False
+                self._cond.notify_all()
+
+
+class _Profiles(dict):
+    """Profiles gathered from the workers, readable like a ``ProfileStore``."""
+
+    def read(self, user: str) -> str:
+        return self.get(user, "")
+
+
+class ShardRouter:
+    """Spread sessions over worker processes behind the ``SessionManager`` API.
+
+    ``options`` are passed to each worker's ``SessionManager`` (for example
+    ``filters`` or ``budget``).  Token budgets apply per worker; the
+    router's own ``calculate`` always scores every ready pair.
+    """
+
+    def __init__(
+        self,
+        shards: int = 4,
+        personas: List[Persona] = PERSONAS,
+        base_dir: Path = BASE_DIR,
+        ai_client_factory: Callable[[], AIClient] = AIClient,
+        link_threshold: int = 2,
+        threads: int = 16,
+        replicas: int = 64,
+        mp_context: str | None = None,
+        **options: Any,
+    ) -> None:
+        self.base_dir = base_dir
+        self.ai_client_factory = ai_client_factory
+        self.replicas = replicas
+        self._context = multiprocessing.get_context(mp_context)
+        self._threads = threads
+        self._options = options
+        self._shards: Dict[int, _Shard] = {}
+        self._lock = threading.RLock()
+        self._gate = _Gate()
+        # User name -> shard number.
+        self.sessions: Dict[str, int] = {}
+        self.links = LinkTracker(threshold=link_threshold)
+        self._mirrors: Dict[str, Ambassador] = {}
+        self._pushed: Dict[str, AmbassadorState] = {}
+        self.update_callback: Optional[
+            Callable[[Dict[str, List[Tuple[str, float]]]], None]
+        ] = None
+        # Start a worker for every shard directory on disk so users left on
+        # shards beyond ``shards`` are moved before those workers stop.
+        on_disk = [
+            int(path.name)
+            for path in (base_dir / "shards").glob("*")
+            if path.name.isdigit()
+        ]
+        count = max([shards, *(index + 1 for index in on_disk)])
+        self.ring = HashRing(range(count), replicas)
+        for index in range(count):
+            self._start(index)
+        for index, names in self._gather("users").items():
+            for name in names:
+                self.sessions[name] = index
+        self.matcher = Matcher(list(self.sessions), path=base_dir / "match_matrix.json")
+        self.resize(shards)
+        for persona in personas:
+            self.add_user(persona.name, persona.description, persona.attributes)
+        self._sync_links()
+
+    # Workers -----------------------------------------------------------------
+    def _shard_dir(self, index: int) -> Path:
+        return self.base_dir / "shards" / str(index)
+
+    def _start(self, index: int) -> None:
+        self._shards[index] = _Shard(
+            index,
+            self._context,
+            self._shard_dir(index),
+            self.ai_client_factory,
+            self._threads,
+            self._options,
+        )
+
+    def _gather(
+        self, op: str, args: Dict[int, Tuple[Any, ...]] | None = None
+    ) -> Dict[int, Any]:
+        """Run ``op`` on several shards concurrently and return their results."""
+        targets = self._shards if args is None else args
+        futures = {
+            index: self._shards[index].submit(op, *(args[index] if args else ()))
+            for index in targets
+        }
+        return {index: future.result() for index, future in futures.items()}
+
+    def _by_shard(self, names: Iterable[str]) -> Dict[int, List[str]]:
+        groups: Dict[int, List[str]] = {}
+        for name in names:
+            groups.setdefault(self.sessions[name], []).append(name)
+        return groups
+
+    def _owner(self, name: str) -> _Shard:
+        return self._shards[self.sessions[name]]
+
+    def resize(self, shards: int) -> Dict[str, Tuple[int, int]]:
+        """Run ``shards`` workers, moving users whose ring owner changed.
+
+        Returns ``{user: (old shard, new shard)}`` for every moved user.
+        Routed calls wait while users are being moved.
+        """
+        if shards < 1:
+            raise ValueError("at least one shard is required")
+        with self._lock, self._gate.exclusive():
+            ring = HashRing(range(shards), self.replicas)
+            for index in range(shards):
+                if index not in self._shards:
+                    self._start(index)
+            moves = {}
+            for name, src in self.sessions.items():
+                dst = ring.node_for(name)
+                if dst != src:
+                    moves[name] = (src, dst)
+            if moves:
+                sources: Dict[int, List[str]] = {}
+                for name, (src, _) in moves.items():
+                    sources.setdefault(src, []).append(name)
+                exported = self._gather(
+                    "export_users", {src: (names,) for src, names in sources.items()}
+                )
+                targets: Dict[int, List[Dict[str, Any]]] = {}
+                for records in exported.values():
+                    for record in records:
+                        targets.setdefault(moves[record["name"]][1], []).append(record)
+                # Copy before removing so a failed import loses nothing.
+                self._gather(
+                    "import_users", {dst: (records,) for dst, records in targets.items()}
+                )
+                self._gather(
+                    "remove_users", {src: (names,) for src, names in sources.items()}
+                )
+                for name, (_, dst) in moves.items():
+                    self.sessions[name] = dst
+            self.ring = ring
+            for index in sorted(self._shards):
+                if index >= shards:
+                    self._shards.pop(index).close()
+                    shutil.rmtree(self._shard_dir(index), ignore_errors=True)
+        if moves:
+            metrics.increment("shard_users_moved", len(moves))
+            logger.info(
+                "moved %d of %d users to %d shards", len(moves), len(self.sessions), shards
+            )
+        return moves
+
+    def close(self) -> None:
+        """Flush and stop every worker process."""
+        with self._lock:
+            for shard in self._shards.values():
+                shard.close()
+            self._shards.clear()
+
+    # SessionManager API ---------------------------------------------------------
+    def add_user(
+        self,
+        name: str,
+        description: str = "",
+        attributes: Optional[Dict[str, str]] = None,
+    ) -> None:
+        """Create ``name`` on the shard that owns it, if not known yet."""
+        with self._lock:
+            if name in self.sessions:
+                return
+            index = self.ring.node_for(name)
+            self._shards[index].call("add_user", name, description, attributes)
+            self.sessions[name] = index
+            self.matcher.add_user(name)
+
+    def send_message(self, name: str, text: str) -> str:
+        with self._gate.shared():
+            reply = self._owner(name).call("send", name, text)
+            with metrics.span("link_check_seconds"):
+                partner = self.links.partner(name)
+                if partner is not None:
+                    self.links.on_message(name, text)
+                    self._push([name, partner])
+        return reply
+
+    def status(self, name: str) -> str:
+        with self._gate.shared():
+            return self._owner(name).call("status", name)
+
+    def history(self, name: str) -> List[Dict[str, str]]:
+        with self._gate.shared():
+            return self._owner(name).call("history", name)
+
+    def calculate(self, resume: bool = False) -> None:
+        """Score ready users against the global matrix and assign personas."""
+        with self._lock:
+            users = list(self.sessions)
+            groups = self._by_shard(users)
+            batches = {index: (names,) for index, names in groups.items()}
+            passed = set()
+            for names in self._gather("ready", batches).values():
+                passed.update(names)
+            ready = [name for name in users if name in passed]
+            profiles = _Profiles()
+            for part in self._gather("profiles", batches).values():
+                profiles.update(part)
+            self.matcher.calculate(
+                self.ai_client_factory(),
+                profile_store=profiles,  # type: ignore[arg-type]
+                users=ready,
+                resume=resume,
+            )
+            self._gather(
+                "assign",
+                {
+                    index: ({name: choose_persona(self.matcher, name, passed) for name in names},)
+                    for index, names in groups.items()
+                },
+            )
+            self._sync_links()
+        self.refresh_matches()
+
+    def declare_match(self, a: str, b: str) -> None:
+        with self._gate.shared():
+            self.links.unwatch(a)
+            self.links.unwatch(b)
+            futures = [
+                self._owner(a).submit("declare", a, b),
+                self._owner(b).submit("declare", b, a),
+            ]
+            for future in futures:
+                future.result()
+            for name, other in ((a, b), (b, a)):
+                mirror = self._mirrors.setdefault(name, Ambassador())
+                mirror.declare_match(other)
+                self._pushed[name] = _state(mirror)
+            self.matcher.declare_official_match(a, b)
+
+    def clear(self) -> None:
+        """Reset matches."""
+        with self._lock:
+            self.matcher.clear()
+            for name in list(self.sessions):
+                self.links.unwatch(name)
+            self._gather("clear")
+            self._sync_links()
+        self.refresh_matches()
+
+    def refresh_matches(self) -> Dict[str, List[Tuple[str, float]]]:
+        """Return match data and invoke any registered callback."""
+        with metrics.span("refresh_matches_seconds"):
+            matches = {
+                name: self.matcher.top_matches(name) for name in list(self.sessions)
+            }
+        if self.update_callback:
+            self.update_callback(matches)
+        return matches
+
+    def flush(self) -> None:
+        """Ask every worker to persist its in-memory state."""
+        self._gather("flush")
+
+    # Cross-shard linking -----------------------------------------------------------
+    def _sync_links(self) -> None:
+        """Refresh ambassador mirrors and watch every reciprocated pair."""
+        counts: Dict[str, int] = {}
+        last: Dict[str, str] = {}
+        for states in self._gather("link_state").values():
+            for name, (state, count, text) in states.items():
+                mirror = self._mirrors.setdefault(name, Ambassador())
+                _apply(mirror, state)
+                self._pushed[name] = state
+                counts[name], last[name] = count, text
+        for name in counts:
+            persona = self._mirrors[name].persona
+            other = self._mirrors.get(persona) if persona else None
+            if other is None or other.persona != name:
+                self.links.unwatch(name)
+            elif self.links.partner(name) != persona and name < persona:
+                self.links.watch(
+                    name,
+                    self._mirrors[name],
+                    counts[name],
+                    last[name],
+                    persona,
+                    other,
+                    counts[persona],
+                    last[persona],
+                )
+
+    def _push(self, names: List[str]) -> None:
+        """Send changed mirror states for ``names`` to their owning shards."""
+        changed: Dict[int, Dict[str, AmbassadorState]] = {}
+        for name in names:
+            state = _state(self._mirrors[name])
+            if self._pushed.get(name) != state:
+                self._pushed[name] = state
+                changed.setdefault(self.sessions[name], {})[name] = state
+        if changed:
+            self._gather("set_ambassadors", {i: (s,) for i, s in changed.items()})
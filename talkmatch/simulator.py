@@ -0,0 +1,355 @@
+from __future__ import annotations
+
+"""Synthetic population generator and end-to-end load simulator.
+
+``generate_personas`` builds reproducible personas with structured
+attributes.  :class:`Simulation` registers them with a ``SessionManager``
+backed by :class:`~talkmatch.fake_openai.FakeOpenAI`, drives concurrent
+conversations through ``send_message`` using ``Persona.system_prompt``
+agents, triggers ``calculate()`` periodically and reports throughput, turn
+latency percentiles, API calls per message and storage bytes written.
+
+Run ``python -m talkmatch.simulator --users 1000 --turns 5``.
+"""
+
+import argparse
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+from . import metrics
+from .ai import AIClient, ai_call
+from .chat import ChatSession
+from .fake_openai import FakeOpenAI, LatencyModel
+from .message_log import MessageView
+from .personas import Persona
+from .pools import PoolPolicy
+from .prompt_budget import fit_messages
+from .resilience import resilient_factory
+from .session_manager import SessionManager
+from .speculation import Speculator
+from .storage import WritePolicy, set_write_policy
+from .storage.json_store import write_stats
+
+FIRST_NAMES = [
+    "Ava", "Ben", "Chloe", "Diego", "Elena", "Farid", "Grace", "Hugo", "Isla",
+    "Jonas", "Kira", "Liam", "Maya", "Noah", "Olga", "Priya", "Quinn", "Rosa",
+    "Sami", "Tara", "Uma", "Victor", "Wen", "Yara", "Zane",
+]
+JOBS = [
+    "nurse", "software engineer", "teacher", "chef", "architect", "barista",
+    "lawyer", "photographer", "carpenter", "researcher", "musician", "accountant",
+]
+REGIONS = ["Lisbon", "Berlin", "Toronto", "Austin", "Melbourne", "Seoul", "Nairobi"]
+LANGUAGES = ["English", "Spanish", "French", "German", "Portuguese", "Korean", "Swahili"]
+KIDS = ["wants kids", "does not want kids", "has kids", "is unsure about kids"]
+STYLES = ["monogamous", "open to non-monogamy", "casual", "looking for something serious"]
+VALUES = ["honesty", "adventure", "family", "ambition", "kindness", "humor", "faith"]
+HOBBIES = ["hiking", "board games", "cooking", "climbing", "reading", "gaming", "dancing"]
+
+
+def generate_personas(count: int, seed: int = 0) -> List[Persona]:
+    """Return ``count`` reproducible personas with structured attributes."""
+    return list(iter_personas(count, seed))
+
+
+def iter_personas(count: int, seed: int = 0) -> Iterator[Persona]:
+    """Yield synthetic personas one at a time to keep large populations cheap."""
+    rng = random.Random(seed)
+    width = len(str(max(count - 1, 0)))
+    for index in range(count):
+        age = rng.randint(18, 70)
+        languages = rng.sample(LANGUAGES, rng.choice((1, 1, 2, 3)))
+        attributes = {
+            "age": str(age),
+            "desired age range": f"{max(18, age - rng.randint(2, 8))}-{age + rng.randint(2, 8)}",
+            "region": rng.choice(REGIONS),
+            "languages": ", ".join(languages),
+            "job": rng.choice(JOBS),
+            "kids": rng.choice(KIDS),
+            "relationship style": rng.choice(STYLES),
+            "values": ", ".join(rng.sample(VALUES, 2)),
+            "hobby": rng.choice(HOBBIES),
+        }
+        name = f"{rng.choice(FIRST_NAMES)}{index:0{width}d}"
+        description = (
+            f"You are {attributes['age']}, a {attributes['job']} in "
+            f"{attributes['region']} who speaks {attributes['languages']}. "
+            f"You {attributes['kids']}, are {attributes['relationship style']}, "
+            f"value {attributes['values']} and love {attributes['hobby']}. "
+            f"You'd date someone aged {attributes['desired age range']}."
+        )
+        yield Persona(name=name, description=description, attributes=attributes)
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Return the nearest-rank ``pct`` percentile of ``values``."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+@dataclass
+class PersonaAgent:
+    """Generate the next message a persona would send in its session."""
+
+    persona: Persona
+    ai_client: AIClient
+    # Pre-generates the next message as soon as the ambassador replies.
+    speculator: Speculator[str] | None = None
+
+    def next_message(self, manager: SessionManager) -> str:
+        session = manager.sessions[self.persona.name]
+        if self.speculator is not None:
+            text = self.speculator.take(session.messages.total)
+            if text is not None:
+                return text
+        return self._compose(session)
+
+    def speculate(self, session: ChatSession) -> None:
+        if self.speculator is not None:
+            self.speculator.start(session.messages.total, lambda: self._compose(session))
+
+    def _compose(self, session: ChatSession) -> str:
+        system = {"role": "system", "content": self.persona.system_prompt}
+        context = fit_messages(MessageView([system], session.messages.view(1)), "persona")
+        with ai_call("persona", self.persona.name):
+            return self.ai_client.get_response(context) or "..."
+
+
+@dataclass
+class SimulationReport:
+    """Aggregate results of a simulation run."""
+
+    users: int
+    messages: int
+    elapsed: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    api_calls: int
+    api_calls_per_message: float
+    calls_by_type: Dict[str, int]
+    prompt_tokens: int
+    cached_tokens: int
+    calculate_runs: int
+    calculate_seconds: float
+    bytes_written: int
+    store_writes: int
+    errors: int
+    # Share of persona turns served by a speculative message, if enabled.
+    speculation_hit_rate: float | None = None
+
+    def format(self) -> str:
+        speculation = (
+            ""
+            if self.speculation_hit_rate is None
+            else f"\nspeculation hit rate={self.speculation_hit_rate:.0%}"
+        )
+        return (
+            f"users={self.users} messages={self.messages} elapsed={self.elapsed:.2f}s "
+            f"throughput={self.throughput:.1f} msg/s\n"
+            f"turn latency p50={self.p50 * 1000:.1f}ms p95={self.p95 * 1000:.1f}ms "
+            f"p99={self.p99 * 1000:.1f}ms\n"
+            f"api calls={self.api_calls} ({self.api_calls_per_message:.2f}/msg) "
+            f"by type={self.calls_by_type}\n"
+            f"prompt tokens={self.prompt_tokens} cached={self.cached_tokens} "
+            f"({self.cached_tokens / max(1, self.prompt_tokens):.0%})\n"
+            f"calculate runs={self.calculate_runs} total={self.calculate_seconds:.2f}s\n"
+            f"storage writes={self.store_writes} bytes={self.bytes_written} "
+            f"errors={self.errors}"
+            f"{speculation}"
+        )
+
+
+@dataclass
+class Simulation:
+    """Drive synthetic users through a ``SessionManager`` concurrently.
+
+    ``active`` limits how many of the ``users`` generated personas are
+    registered and chat; the matcher keeps a dense n x n matrix so very
+    large populations are usually simulated as an active subset.
+    """
+
+    users: int = 1000
+    active: int | None = None
+    turns: int = 5
+    concurrency: int = 32
+    calculate_interval: float = 5.0
+    latency: LatencyModel = field(default_factory=LatencyModel)
+    # Fraction of engine calls failing with 429 or 500, split evenly.
+    error_rate: float = 0.0
+    seed: int = 0
+    base_dir: Path | None = None
+    # Partition matching by these persona attributes (see talkmatch.pools).
+    pool_keys: Tuple[str, ...] = ()
+    # Pre-generate each persona's next message while the reply is saved.
+    speculate: bool = False
+
+    def run(self) -> SimulationReport:
+        population = generate_personas(self.users, self.seed)
+        personas = population[: self.active or self.users]
+        base_dir = self.base_dir or Path(tempfile.mkdtemp(prefix="talkmatch-sim-"))
+        engine = FakeOpenAI(
+            latency=self.latency,
+            error_rate_429=self.error_rate / 2,
+            error_rate_500=self.error_rate / 2,
+            seed=self.seed,
+        )
+        agents_backend = FakeOpenAI(latency=self.latency, seed=self.seed + 1)
+        manager = SessionManager(
+            personas=personas,
+            base_dir=base_dir,
+            ai_client_factory=resilient_factory(lambda: AIClient(openai_client=engine)),
+            pools=PoolPolicy(self.pool_keys) if self.pool_keys else None,
+        )
+        agent_ai = AIClient(openai_client=agents_backend)
+        agents = [PersonaAgent(p, agent_ai) for p in personas]
+        speculators: List[Speculator[str]] = []
+        speculation_pool = None
+        if self.speculate:
+            speculation_pool = ThreadPoolExecutor(
+                max_workers=self.concurrency, thread_name_prefix="talkmatch-speculate"
+            )
+            for agent in agents:
+                session = manager.sessions[agent.persona.name]
+                agent.speculator = Speculator("persona", speculation_pool)
+                speculators.append(agent.speculator)
+                session.reply_callback = lambda reply, a=agent, s=session: a.speculate(s)
+                agent.speculate(session)  # Personas open the conversation.
+
+        latencies: List[float] = []
+        errors = [0]
+        calc_times: List[float] = []
+        lock = threading.Lock()
+        done = threading.Event()
+        writes_before = write_stats()
+
+        def converse(agent: PersonaAgent) -> None:
+            for _ in range(self.turns):
+                try:
+                    text = agent.next_message(manager)
+                    started = time.perf_counter()
+                    manager.send_message(agent.persona.name, text)
+                    elapsed = time.perf_counter() - started
+                except Exception:
+                    with lock:
+                        errors[0] += 1
+                    continue
+                with lock:
+                    latencies.append(elapsed)
+
+        def calculate_loop() -> None:
+            while not done.wait(self.calculate_interval):
+                started = time.perf_counter()
+                try:
+                    manager.calculate()
+                except Exception:
+                    with lock:
+                        errors[0] += 1
+                calc_times.append(time.perf_counter() - started)
+
+        calculator = threading.Thread(target=calculate_loop, daemon=True)
+        if self.calculate_interval > 0:
+            calculator.start()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(converse, agents))
+        elapsed = time.perf_counter() - started
+        done.set()
+        if calculator.is_alive():
+            calculator.join()
+        hit_rate = None
+        if speculation_pool is not None:
+            for speculator in speculators:
+                speculator.close()
+            speculation_pool.shutdown(cancel_futures=True)
+            hits = sum(sp.hits for sp in speculators)
+            hit_rate = hits / max(1, hits + sum(sp.misses for sp in speculators))
+
+        manager.flush()
+        writes_after = write_stats()
+        messages = len(latencies)
+        api_calls = engine.calls.total()
+        return SimulationReport(
+            users=len(personas),
+            messages=messages,
+            elapsed=elapsed,
+            throughput=messages / elapsed if elapsed else 0.0,
+            p50=percentile(latencies, 50),
+            p95=percentile(latencies, 95),
+            p99=percentile(latencies, 99),
+            api_calls=api_calls,
+            api_calls_per_message=api_calls / messages if messages else 0.0,
+            calls_by_type=dict(engine.calls),
+            prompt_tokens=engine.prompt_tokens,
+            cached_tokens=engine.cached_tokens,
+            calculate_runs=len(calc_times),
+            calculate_seconds=sum(calc_times),
+            bytes_written=writes_after["bytes"] - writes_before["bytes"],
+            store_writes=writes_after["writes"] - writes_before["writes"],
+            errors=errors[0],
+            speculation_hit_rate=hit_rate,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="TalkMatch load simulator")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--active", type=int, default=None)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--calculate-interval", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.0, help="mean seconds")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", type=Path, default=None)
+    parser.add_argument(
+        "--write-delay", type=float, default=0.0, help="coalesce store writes (seconds)"
+    )
+    parser.add_argument(
+        "--pools", default="", help="comma-separated attributes to partition matching by"
+    )
+    parser.add_argument(
+        "--speculate", action="store_true", help="pre-generate persona messages"
+    )
+    parser.add_argument("--json", action="store_true", help="print a JSON report")
+    parser.add_argument(
+        "--metrics", action="store_true", help="also print per-stage metrics"
+    )
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.set_sink(metrics.InMemorySink())
+    if args.write_delay > 0:
+        set_write_policy(WritePolicy(delay=args.write_delay))
+    report = Simulation(
+        users=args.users,
+        active=args.active,
+        turns=args.turns,
+        concurrency=args.concurrency,
+        calculate_interval=args.calculate_interval,
+        latency=LatencyModel("lognormal", args.latency, args.jitter),
+        error_rate=args.error_rate,
+        seed=args.seed,
+        base_dir=args.data_dir,
+        pool_keys=tuple(key.strip() for key in args.pools.split(",") if key.strip()),
+        speculate=args.speculate,
+    ).run()
+    print(json.dumps(asdict(report)) if args.json else report.format())
+    if args.metrics:
+        print(metrics.export_prometheus())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+"""Speculative precomputation of the next message.
+
+A :class:`Speculator` starts computing a value in the background before
+anyone asks for it, tagged with a key that describes the state it was
+computed from (for a chat, the number of messages).  :meth:`Speculator.take`
+returns the value only while the key still matches; a different key, a
+failed computation or an explicit :meth:`Speculator.invalidate` (the user
+typed something else) is a miss and the caller computes the value itself.
+
+Takes count as ``speculation_hits`` or ``speculation_misses`` and the
+``speculation_hit_rate`` gauge follows their ratio, all labelled by
+``kind``.  A hit may still wait for a computation that is in flight, which
+is never slower than starting it on demand.
+"""
+
+import logging
+import threading
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Speculator(Generic[T]):
+    """Hold at most one speculative result, keyed by the state it assumes."""
+
+    def __init__(self, kind: str, executor: ThreadPoolExecutor | None = None) -> None:
+        self.kind = kind
+        self._own_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"talkmatch-speculate-{kind}"
+        )
+        self._lock = threading.Lock()
+        self._key: Hashable | None = None
+        self._future: Future[T] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self) -> float | None:
+        taken = self.hits + self.misses
+        return self.hits / taken if taken else None
+
+    def start(self, key: Hashable, compute: Callable[[], T]) -> None:
+        """Compute ``compute()`` in the background for state ``key``.
+
+        Replaces any earlier speculation.
+        """
+        with self._lock:
+            self._discard()
+            self._key = key
+            self._future = self._executor.submit(compute)
+
+    def invalidate(self) -> None:
+        """Drop the current speculation, e.g. because the user typed."""
+        with self._lock:
+            self._discard()
+
+    def take(self, key: Hashable) -> Optional[T]:
+        """Return the result speculated for ``key``, or None on a miss."""
+        with self._lock:
+            if self._key == key:
+                future, self._future, self._key = self._future, None, None
+            else:
+                future = None
+                self._discard()
+        result = None
+        if future is not None:
+            try:
+                result = future.result()
+            except CancelledError:
+                pass
+            except Exception as exc:
+                logger.warning("speculative %s failed: %s", self.kind, exc)
+        self._count(result is not None)
+        return result
+
+    def close(self) -> None:
+        self.invalidate()
+        if self._own_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _discard(self) -> None:
+        future, self._future, self._key = self._future, None, None
+        if future is not None:
+            future.cancel()
+            metrics.increment("speculation_invalidated", kind=self.kind)
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+            metrics.increment("speculation_hits", kind=self.kind)
+        else:
+            self.misses += 1
+            metrics.increment("speculation_misses", kind=self.kind)
+        metrics.gauge("speculation_hit_rate", self.hit_rate or 0.0, kind=self.kind)
@@ -7,15 +7,34 @@ from pathlib import Path
 BASE_DIR = Path("data")
 BASE_DIR.mkdir(parents=True, exist_ok=True)
 
-from .json_store import JsonStore  # noqa: E402
+from .json_store import (  # noqa: E402
+    JsonStore,
+    WritePolicy,
+    flush_all,
+    get_write_policy,
+    set_write_policy,
+)
+from .codecs import available_codecs, set_codec  # noqa: E402
 from .profiles import ProfileStore  # noqa: E402
 from .chats import ChatStore  # noqa: E402
 from .match_matrix import MatchMatrixStore  # noqa: E402
+from .usage import UsageStore  # noqa: E402
+from .snapshot import SnapshotStore  # noqa: E402
+from .checkpoint import MatchCheckpointStore  # noqa: E402
 
 __all__ = [
     "BASE_DIR",
     "JsonStore",
+    "WritePolicy",
+    "flush_all",
+    "get_write_policy",
+    "set_write_policy",
+    "available_codecs",
+    "set_codec",
     "ProfileStore",
     "ChatStore",
     "MatchMatrixStore",
+    "UsageStore",
+    "SnapshotStore",
+    "MatchCheckpointStore",
 ]
@@ -1,19 +1,252 @@
 from __future__ import annotations
 
-"""Chat history persistence."""
+"""Chat history persistence in fixed-size segments.
 
-from dataclasses import dataclass
+``<name>.json`` holds a small index (the system prompt, one entry per
+archived segment with its message range, byte range and role counts) plus
+the open tail of at most ``segment_size`` messages.  Once the tail fills
+up, its oldest ``segment_size`` messages are compressed and appended to
+``<name>.archive``, so each save rewrites at most one segment's worth of
+messages.  Archived segments are read through ``mmap`` only when older
+messages are paged in.  Histories saved as a single JSON list still load
+and are split into segments on their next save.
+"""
+
+import bisect
+import mmap
+import os
+import threading
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List
+from typing import Any, Dict, List, Mapping, Sequence
 
 from . import BASE_DIR
-from .json_store import JsonStore
+from .codecs import available_codecs, decode, get_codec
+from .json_store import JsonStore, get_write_policy
+
+ARCHIVE_CODEC = "orjson+gzip" if "orjson+gzip" in available_codecs() else "json+gzip"
+
+
+def _plain(message: Mapping[str, str]) -> Dict[str, str]:
+    return {"role": message["role"], "content": message["content"]}
+
+
+@dataclass
+class RecentHistory:
+    """The system prompt plus the newest messages of a history."""
+
+    messages: List[Dict[str, str]]
+    # Messages between the system prompt and ``messages[1]`` left on disk.
+    omitted: int = 0
+    omitted_roles: Dict[str, int] = field(default_factory=dict)
 
 
 @dataclass
-class ChatStore(JsonStore[List[Dict[str, str]]]):
+class ChatStore(JsonStore[Dict[str, Any]]):
+    """Persist one chat history as an index, a tail and archived segments."""
+
+    segment_size: int = 200
+    archive_codec: str = ARCHIVE_CODEC
+    # Decoded archive segments kept in memory for paging.
+    cached_segments: int = 4
+
     def default_path(self) -> Path:
         return BASE_DIR / "chats" / "history.json"
 
-    def default(self) -> List[Dict[str, str]]:
-        return []
+    def default(self) -> Dict[str, Any]:
+        return {"version": 2, "head": None, "segments": [], "tail": []}
+
+    def __post_init__(self) -> None:
+        super().__post_init__()
+        self.archive_path = self.path.with_suffix(".archive")
+        self._archive_lock = threading.Lock()
+        self._map: mmap.mmap | None = None
+        self._map_size = 0
+        self._cache: OrderedDict[int, List[Dict[str, str]]] = OrderedDict()
+        self._read_index()
+
+    def serialize(self, data: Dict[str, Any]) -> Any:
+        return {**data, "tail": [_plain(m) for m in data["tail"]]}
+
+    def deserialize(self, raw: Any) -> Dict[str, Any]:
+        if isinstance(raw, list):  # Single-document history from older versions.
+            return {
+                "version": 2,
+                "head": raw[0] if raw else None,
+                "segments": [],
+                "tail": raw[1:],
+            }
+        return raw
+
+    def _read_index(self) -> None:
+        index = super().load()
+        self.head: Dict[str, str] | None = index["head"]
+        self.segments: List[Dict[str, Any]] = index["segments"]
+        self._starts = [segment["start"] for segment in self.segments]
+        self._tail: List[Mapping[str, str]] = index["tail"]
+        self.archived = sum(segment["count"] for segment in self.segments)
+        self._cache.clear()
+
+    # Reading ------------------------------------------------------------------
+    @property
+    def length(self) -> int:
+        """Number of stored messages, including the system prompt."""
+        if self.head is None:
+            return 0
+        return max(self.archived, 1) + len(self._tail)
+
+    def load(self) -> List[Dict[str, str]]:  # type: ignore[override]
+        """Return the whole history; prefer :meth:`load_recent` or :meth:`page`."""
+        self._read_index()
+        return self.page(0)
+
+    def load_recent(self, count: int) -> RecentHistory:
+        """Return the system prompt and at least the last ``count`` messages.
+
+        The cut snaps to a segment boundary, so the omitted messages are
+        whole archived segments whose role counts come from the index.
+        """
+        total = self.length
+        if total == 0:
+            return RecentHistory([])
+        start = max(1, total - count)
+        roles: Counter[str] = Counter()
+        if start < self.archived:
+            i = bisect.bisect_right(self._starts, start) - 1
+            start = max(1, self._starts[i])
+            for segment in self.segments[:i]:
+                roles.update(segment["roles"])
+            if i > 0:
+                roles[self.head["role"]] -= 1
+        else:
+            # Never omit tail messages: the next save() rewrites the tail
+            # from the messages held in memory.
+            start = min(start, max(self.archived, 1))
+            for segment in self.segments:
+                roles.update(segment["roles"])
+            if self.archived:
+                roles[self.head["role"]] -= 1
+        return RecentHistory(
+            [dict(self.head), *self.page(start, total)],
+            start - 1,
+            {role: n for role, n in roles.items() if n},
+        )
+
+    def page(self, start: int, stop: int | None = None) -> List[Dict[str, str]]:
+        """Return messages ``start`` to ``stop`` (exclusive) of the history."""
+        start, stop, _ = slice(start, stop).indices(self.length)
+        result: List[Dict[str, str]] = []
+        index = start
+        while index < min(stop, self.archived):
+            i = bisect.bisect_right(self._starts, index) - 1
+            first = self._starts[i]
+            messages = self._segment(i)
+            end = min(stop, first + len(messages))
+            result.extend(messages[index - first : end - first])
+            index = end
+        if index < stop:
+            if index == 0:
+                result.append(dict(self.head))
+                index = 1
+            offset = max(self.archived, 1)
+            result.extend(_plain(m) for m in self._tail[index - offset : stop - offset])
+        return result
+
+    def _segment(self, i: int) -> List[Dict[str, str]]:
+        cached = self._cache.get(i)
+        if cached is not None:
+            self._cache.move_to_end(i)
+            return cached
+        segment = self.segments[i]
+        with self._archive_lock:
+            size = self.archive_path.stat().st_size
+            if self._map is None or size != self._map_size:
+                if self._map is not None:
+                    self._map.close()
+                with open(self.archive_path, "rb") as fh:
+                    self._map = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                self._map_size = size
+            raw = self._map[segment["offset"] : segment["offset"] + segment["length"]]
+        messages = decode(raw)
+        self._cache[i] = messages
+        if len(self._cache) > self.cached_segments:
+            self._cache.popitem(last=False)
+        return messages
+
+    # Writing ----------------------------------------------------------------------
+    def save(self, data: Sequence[Mapping[str, str]]) -> None:  # type: ignore[override]
+        """Persist ``data``, archiving full segments and rewriting only the tail.
+
+        ``data`` may be a :class:`MessageLog` that omits already archived
+        messages (see its ``omitted`` attribute).
+        """
+        omitted = getattr(data, "omitted", 0)
+        total = omitted + len(data) if len(data) else 0
+
+        def message(index: int) -> Mapping[str, str]:
+            if index == 0:
+                return data[0]
+            if index <= omitted:
+                raise ValueError(
+                    f"message {index} of {self.path.name} is omitted from memory "
+                    f"but not archived ({self.archived} archived)"
+                )
+            return data[index - omitted]
+
+        with self._archive_lock:
+            if total < self.archived or (
+                self.head is not None and total and data[0]["content"] != self.head["content"]
+            ):
+                self._reset_archive()
+            while total - self.archived > self.segment_size:
+                start = self.archived
+                records = [message(i) for i in range(start, start + self.segment_size)]
+                self._append_segment(start, records)
+            self.head = _plain(data[0]) if total else None
+            self._tail = [message(i) for i in range(max(self.archived, 1), total)]
+            index = {
+                "version": 2,
+                "segment_size": self.segment_size,
+                "head": self.head,
+                "segments": list(self.segments),
+                "tail": self._tail,
+            }
+        super().save(index)
+
+    def _append_segment(self, start: int, records: List[Mapping[str, str]]) -> None:
+        encoded = get_codec(self.archive_codec).encode([_plain(m) for m in records])
+        with open(self.archive_path, "ab") as fh:
+            offset = fh.seek(0, os.SEEK_END)
+            fh.write(encoded)
+            if get_write_policy().fsync == "always":
+                fh.flush()
+                os.fsync(fh.fileno())
+        roles = Counter(m["role"] for m in records)
+        self.segments.append(
+            {
+                "start": start,
+                "count": len(records),
+                "offset": offset,
+                "length": len(encoded),
+                "roles": dict(roles),
+            }
+        )
+        self._starts.append(start)
+        self.archived += len(records)
+
+    def _reset_archive(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self.archive_path.unlink(missing_ok=True)
+        self.segments, self._starts, self.archived = [], [], 0
+        self._cache.clear()
+
+    def delete(self) -> None:
+        """Drop pending writes and remove the index and archive files."""
+        self.discard()
+        with self._archive_lock:
+            self._reset_archive()
+            self.head, self._tail = None, []
+        self.path.unlink(missing_ok=True)
@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+"""Serialization codecs for JSON-backed stores.
+
+A codec spec names a format and an optional compression, e.g. ``"json"``,
+``"orjson"``, ``"msgpack"`` or ``"msgpack+zstd"``.  ``orjson``,
+``msgpack`` and ``zstandard`` are optional; ``gzip`` ships with Python.
+``orjson`` writes the same JSON as the standard library, only faster, and
+is the default whenever it is installed.
+
+Files keep their names whatever the codec: :func:`decode` recognizes
+gzip and zstd by their magic bytes and tells JSON from msgpack by the
+first byte, so stores switch codecs without migrating existing files.
+
+Choose codecs with :func:`set_codec`, globally or per store class::
+
+    set_codec("msgpack+zstd", store="ChatStore")
+"""
+
+import gzip
+import json
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+try:  # Optional fast JSON.
+    import orjson
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+
+try:  # Optional binary format.
+    import msgpack
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+
+try:  # Optional compression.
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+# First bytes a JSON document can start with (after whitespace).
+_JSON_START = frozenset(b'{["-0123456789tfn')
+
+
+@dataclass(frozen=True)
+class Codec:
+    """Encode store data to bytes and back."""
+
+    name: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+def _json_encode(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def _json_decode(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _format(name: str) -> Codec:
+    if name == "json":
+        return Codec("json", _json_encode, _json_decode)
+    if name == "orjson":
+        if orjson is None:
+            raise ValueError("the orjson codec needs the orjson package")
+        return Codec("orjson", orjson.dumps, orjson.loads)
+    if name == "msgpack":
+        if msgpack is None:
+            raise ValueError("the msgpack codec needs the msgpack package")
+        return Codec(
+            "msgpack",
+            lambda data: msgpack.packb(data, use_bin_type=True),
+            lambda raw: msgpack.unpackb(raw, raw=False),
+        )
+    raise ValueError(f"unknown codec {name!r}")
+
+
+def _compression(name: str) -> tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if name == "gzip":
+        return (lambda raw: gzip.compress(raw, compresslevel=1, mtime=0), gzip.decompress)
+    if name == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd compression needs the zstandard package")
+        return (
+            zstandard.ZstdCompressor(level=3).compress,
+            zstandard.ZstdDecompressor().decompress,
+        )
+    raise ValueError(f"unknown compression {name!r}")
+
+
+def get_codec(spec: str) -> Codec:
+    """Return the codec for ``spec`` (``format`` or ``format+compression``)."""
+    name, _, compression = spec.partition("+")
+    codec = _format(name)
+    if not compression:
+        return codec
+    compress, decompress = _compression(compression)
+    return Codec(
+        spec,
+        lambda data: compress(codec.encode(data)),
+        lambda raw: codec.decode(decompress(raw)),
+    )
+
+
+def available_codecs() -> List[str]:
+    """Return the codec specs usable with the installed packages."""
+    specs = []
+    for name in ("json", "orjson", "msgpack"):
+        for compression in ("", "gzip", "zstd"):
+            spec = f"{name}+{compression}" if compression else name
+            try:
+                get_codec(spec)
+            except ValueError:
+                continue
+            specs.append(spec)
+    return specs
+
+
+def decode(raw: bytes) -> Any:
+    """Decode bytes written by any codec, detecting the format."""
+    if raw.startswith(_GZIP_MAGIC):
+        raw = gzip.decompress(raw)
+    elif raw.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise ValueError("file is zstd-compressed but zstandard is not installed")
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    head = raw.lstrip()[:1]
+    if not head or head[0] in _JSON_START:
+        return _json_decode(raw)
+    if msgpack is None:
+        raise ValueError("file looks like msgpack but msgpack is not installed")
+    return msgpack.unpackb(raw, raw=False)
+
+
+_default = "orjson" if orjson is not None else "json"
+_overrides: Dict[str, str] = {}
+_cache: Dict[str, Codec] = {}
+
+
+def set_codec(spec: str | None, store: str | None = None) -> str | None:
+    """Use ``spec`` for all stores, or only for the store class named ``store``.
+
+    Returns the previous spec; ``None`` removes a per-store override.
+    """
+    global _default
+    if spec is not None:
+        get_codec(spec)  # Fail early on unknown or unavailable codecs.
+    if store is None:
+        if spec is None:
+            raise ValueError("the default codec cannot be None")
+        previous, _default = _default, spec
+        return previous
+    previous = _overrides.pop(store, None)
+    if spec is not None:
+        _overrides[store] = spec
+    return previous
+
+
+def codec_for(store: str) -> Codec:
+    """Return the codec new writes of the store class ``store`` use."""
+    spec = _overrides.get(store, _default)
+    codec = _cache.get(spec)
+    if codec is None:
+        codec = _cache[spec] = get_codec(spec)
+    return codec
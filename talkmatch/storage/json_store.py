@@ -1,14 +1,144 @@
 from __future__ import annotations
 
-"""Base class for JSON-backed storage helpers."""
+"""Base class for JSON-backed storage helpers.
+
+Every write goes to a temporary file next to the target and is renamed
+over it, so a crash mid-write leaves the previous version intact.  With a
+:class:`WritePolicy` ``delay`` above zero, :meth:`JsonStore.save` encodes
+the data at once (the bytes are a snapshot taken on the caller's thread)
+and a background writer coalesces repeated saves into one disk write once
+the delay has passed or ``max_pending`` saves have piled up.
+:func:`flush_all` writes everything still pending; it runs at interpreter
+exit and from ``SessionManager.flush()``.
+
+The active policy is module-level, like the metrics sink; replace it with
+:func:`set_write_policy`.  The default writes synchronously.  The on-disk
+format comes from :mod:`.codecs` and is detected again on load.
+"""
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Generic, TypeVar
-import json
+from typing import Any, Dict, Generic, List, Tuple, TypeVar
+import atexit
+import logging
+import os
+import threading
+import time
+
+from .. import metrics
+from .codecs import codec_for, decode
+
+logger = logging.getLogger(__name__)
 
 T = TypeVar("T")
 
+_stats_lock = threading.Lock()
+_write_stats = {"writes": 0, "bytes": 0}
+
+
+def write_stats() -> Dict[str, int]:
+    """Return the number of store writes and bytes written by this process."""
+    with _stats_lock:
+        return dict(_write_stats)
+
+
+@dataclass
+class WritePolicy:
+    """When and how durably stores write to disk."""
+
+    # Seconds a dirty store waits before it is written; 0 writes on save().
+    delay: float = 0.0
+    # Write early once this many saves have been coalesced.
+    max_pending: int = 50
+    # "always" fsyncs every write, "flush" only writes made by flush(),
+    # "never" leaves it to the operating system.
+    fsync: str = "flush"
+
+
+_policy = WritePolicy()
+
+
+def set_write_policy(policy: WritePolicy) -> WritePolicy:
+    """Install ``policy`` and return the previous one."""
+    global _policy
+    if policy.fsync not in ("always", "flush", "never"):
+        raise ValueError(f"unknown fsync policy {policy.fsync!r}")
+    previous, _policy = _policy, policy
+    return previous
+
+
+def get_write_policy() -> WritePolicy:
+    return _policy
+
+
+class _WriteBehind:
+    """Background thread writing dirty stores once they are due."""
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        # Also runs in forked children, which inherit no writer thread.
+        self._cond = threading.Condition()
+        self._due: Dict[int, Tuple[JsonStore, float]] = {}
+        self._thread: threading.Thread | None = None
+
+    def schedule(self, store: JsonStore, due: float) -> None:
+        with self._cond:
+            current = self._due.get(id(store))
+            if current is None or due < current[1]:
+                self._due[id(store)] = (store, due)
+            metrics.gauge("store_writes_pending", len(self._due))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="talkmatch-write-behind", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self, store: JsonStore) -> None:
+        with self._cond:
+            self._due.pop(id(store), None)
+
+    def take_all(self) -> List[JsonStore]:
+        with self._cond:
+            stores = [store for store, _ in self._due.values()]
+            self._due.clear()
+        return stores
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due:
+                    self._cond.wait()
+                now = time.monotonic()
+                ready = [store for store, due in self._due.values() if due <= now]
+                if not ready:
+                    self._cond.wait(min(due for _, due in self._due.values()) - now)
+                    continue
+                for store in ready:
+                    del self._due[id(store)]
+                metrics.gauge("store_writes_pending", len(self._due))
+            for store in ready:
+                try:
+                    store._write_pending(fsync=_policy.fsync == "always")
+                except Exception as exc:
+                    logger.warning("write-behind for %s failed: %s", store.path, exc)
+
+
+_writer = _WriteBehind()
+
+
+def flush_all() -> None:
+    """Write every store with a pending save now."""
+    for store in _writer.take_all():
+        store._write_pending(fsync=_policy.fsync != "never")
+
+
+atexit.register(flush_all)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_writer.reset)
+
 
 @dataclass
 class JsonStore(Generic[T]):
@@ -20,6 +150,11 @@ class JsonStore(Generic[T]):
         if self.path is None:
             self.path = self.default_path()
         self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # Held while writing so flush() waits for an in-progress write.
+        self._io_lock = threading.Lock()
+        self._pending: Any = None
+        self._pending_saves = 0
 
     # Methods for subclasses to customize ---------------------------------
     def default_path(self) -> Path:  # pragma: no cover - abstract
@@ -36,13 +171,79 @@ class JsonStore(Generic[T]):
 
     # Public API -----------------------------------------------------------
     def load(self) -> T:
-        if self.path.exists():
-            try:
-                raw = json.loads(self.path.read_text(encoding="utf-8"))
-                return self.deserialize(raw)
-            except Exception:
-                pass
-        return self.default()
+        if self._pending_saves:
+            self.flush()
+        with metrics.span("store_load_seconds", store=type(self).__name__):
+            if self.path.exists():
+                try:
+                    return self.deserialize(decode(self.path.read_bytes()))
+                except Exception as exc:
+                    logger.warning("ignoring unreadable %s: %s", self.path, exc)
+                    metrics.increment("store_load_errors", store=type(self).__name__)
+            return self.default()
 
     def save(self, data: T) -> None:
-        self.path.write_text(json.dumps(self.serialize(data)), encoding="utf-8")
+        policy = _policy
+        if policy.delay <= 0:
+            with self._io_lock:
+                with self._lock:
+                    self._pending, self._pending_saves = None, 0
+                self._write(data, fsync=policy.fsync == "always")
+            return
+        # Encode now: the writer thread must not read objects still in use.
+        encoded = self._encode(data)
+        with self._lock:
+            self._pending = encoded
+            self._pending_saves += 1
+            saves = self._pending_saves
+        if saves > 1:
+            metrics.increment("store_saves_coalesced", store=type(self).__name__)
+        due = time.monotonic() + (0.0 if saves >= policy.max_pending else policy.delay)
+        _writer.schedule(self, due)
+
+    def flush(self) -> None:
+        """Write a pending save now instead of waiting for the writer."""
+        _writer.cancel(self)
+        self._write_pending(fsync=_policy.fsync != "never")
+
+    def discard(self) -> None:
+        """Drop a pending save, e.g. before deleting the file."""
+        _writer.cancel(self)
+        with self._lock:
+            self._pending, self._pending_saves = None, 0
+
+    # Writing ----------------------------------------------------------------
+    def _write_pending(self, fsync: bool) -> None:
+        with self._io_lock:
+            with self._lock:
+                if not self._pending_saves:
+                    return
+                encoded, self._pending, self._pending_saves = self._pending, None, 0
+            self._write_bytes(encoded, fsync)
+
+    def _encode(self, data: T) -> bytes:
+        return codec_for(type(self).__name__).encode(self.serialize(data))
+
+    def _write(self, data: T, fsync: bool) -> None:
+        self._write_bytes(self._encode(data), fsync)
+
+    def _write_bytes(self, encoded: bytes, fsync: bool) -> None:
+        store = type(self).__name__
+        with metrics.span("store_save_seconds", store=store):
+            tmp = self.path.with_name(f".{self.path.name}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as fh:
+                fh.write(encoded)
+                if fsync:
+                    fh.flush()
+                    os.fsync(fh.fileno())
+            os.replace(tmp, self.path)
+            if fsync and hasattr(os, "O_DIRECTORY"):
+                fd = os.open(self.path.parent, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        metrics.increment("store_bytes_written", len(encoded), store=store)
+        with _stats_lock:
+            _write_stats["writes"] += 1
+            _write_stats["bytes"] += len(encoded)
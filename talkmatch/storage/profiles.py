@@ -4,9 +4,12 @@ from __future__ import annotations
 
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, Tuple
 
-from ..ai import AIClient
+from ..ai import AIClient, ai_call
+from ..coverage import ObjectiveCoverage
+from ..prompt_budget import split_budget, truncate
+from ..prompt_builder import profile_prompt
 from ..prompts import BUILD_PROFILE_PROMPT
 from . import BASE_DIR
 from .json_store import JsonStore
@@ -19,6 +22,12 @@ class ProfileStore(JsonStore[Dict[str, str]]):
     base_dir: Path = BASE_DIR / "profiles"
     prompt_template: str = BUILD_PROFILE_PROMPT
     profiles: Dict[str, str] = field(init=False)
+    # Chat text waiting for a deferred profile rebuild, per user.
+    pending: Dict[str, List[str]] = field(init=False, default_factory=dict)
+    # Number of rebuilds per user, bumped on every successful update.
+    versions: Dict[str, int] = field(init=False, default_factory=dict)
+    # Which profile objectives each user's profile mentions.
+    coverage: ObjectiveCoverage = field(init=False, default_factory=ObjectiveCoverage)
 
     def default_path(self) -> Path:
         return self.base_dir / "profiles.json"
@@ -29,15 +38,52 @@ class ProfileStore(JsonStore[Dict[str, str]]):
     def __post_init__(self) -> None:
         super().__post_init__()
         self.profiles = self.load()
+        for user, profile in self.profiles.items():
+            self.coverage.update(user, profile)
 
     def update(self, ai_client: AIClient, user: str, text: str) -> None:
-        """Send new chat text to the AI and persist the updated profile."""
+        """Send new chat text to the AI and persist the updated profile.
 
+        Text deferred for ``user`` is sent along and dropped from
+        :attr:`pending` only once the AI call succeeds.
+        """
+        deferred = list(self.pending.get(user, []))
+        self._rebuild(ai_client, user, "\n".join([*deferred, text]), len(deferred))
+
+    def _rebuild(self, ai_client: AIClient, user: str, text: str, deferred: int) -> None:
         existing = self.profiles.get(user, "")
-        prompt = self.prompt_template.replace("{info}", existing).replace("{messages}", text)
-        response = ai_client.get_response([{"role": "user", "content": prompt}])
+        # Keep the start of the profile and the most recent messages.
+        share = split_budget("profile", 2)
+        existing = truncate(existing, share, "profile")
+        text = truncate(text, share, "profile", keep="tail")
+        prompt = profile_prompt(self.prompt_template, existing, text)
+        with ai_call("profile", user):
+            response = ai_client.get_response([{"role": "user", "content": prompt}])
+        # Text deferred while the AI call ran stays queued.
+        queued = self.pending.get(user)
+        if queued is not None:
+            del queued[:deferred]
+            if not queued:
+                self.pending.pop(user, None)
         self.profiles[user] = response
+        self.versions[user] = self.versions.get(user, 0) + 1
+        self.coverage.update(user, response)
         self.save(self.profiles)
 
+    def defer(self, user: str, text: str) -> None:
+        """Queue ``text`` for the next profile rebuild instead of calling the AI."""
+        self.pending.setdefault(user, []).append(text)
+
+    def flush_pending(self, ai_client: AIClient, user: str) -> None:
+        """Rebuild ``user``'s profile from all deferred text, if any."""
+        deferred = list(self.pending.get(user, []))
+        if deferred:
+            self._rebuild(ai_client, user, "\n".join(deferred), len(deferred))
+
     def read(self, user: str) -> str:
         return self.profiles.get(user, "")
+
+    def missing_objectives(self, user: str) -> Tuple[str, ...]:
+        """Return the profile objectives ``user``'s profile does not mention."""
+        self.coverage.sync(user, self.read(user))
+        return self.coverage.missing(user)
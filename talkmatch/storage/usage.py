@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+"""Token usage persistence."""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict
+
+from . import BASE_DIR
+from .json_store import JsonStore
+
+
+@dataclass
+class UsageStore(JsonStore[Dict[str, Any]]):
+    def default_path(self) -> Path:
+        return BASE_DIR / "usage.json"
+
+    def default(self) -> Dict[str, Any]:
+        return {}
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+"""Token and cost accounting with simple budgets.
+
+:class:`UsageLedger` aggregates ``completion.usage`` per call type, per
+user and per hour.  It is attached to ``AIClient`` instances (see
+``SessionManager``) and persisted periodically through
+:class:`~talkmatch.storage.UsageStore`.  :class:`Budget` describes token
+limits that ``SessionManager`` uses to defer background work.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+from .storage import UsageStore
+
+# USD per million tokens (prompt, completion) for gpt-4o-mini.
+PRICES: Dict[str, Tuple[float, float]] = {"gpt-4o-mini": (0.15, 0.60)}
+# Fraction of the prompt price charged for provider-cached prompt tokens.
+CACHED_DISCOUNT = 0.5
+# Hourly buckets older than this many hours are dropped.
+RETAIN_HOURS = 48
+
+
+def _hour(timestamp: float) -> int:
+    return int(timestamp // 3600)
+
+
+@dataclass
+class Budget:
+    """Token limits; ``None`` means unlimited."""
+
+    per_user_hour: Optional[int] = None
+    per_calculate: Optional[int] = None
+    global_hour: Optional[int] = None
+
+
+@dataclass
+class UsageLedger:
+    """Aggregate token usage in memory and persist it periodically."""
+
+    store: UsageStore | None = None
+    persist_interval: float = 30.0
+    model: str = "gpt-4o-mini"
+    clock: Callable[[], float] = time.time
+    by_type: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    by_user: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    # ``"<user>|<hour>"`` and ``"*|<hour>"`` -> total tokens in that hour.
+    hourly: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_persist = time.monotonic()
+        if self.store is not None:
+            data = self.store.load()
+            self.by_type.update(data.get("by_type", {}))
+            self.by_user.update(data.get("by_user", {}))
+            self.hourly.update(data.get("hourly", {}))
+
+    def record(
+        self,
+        call_type: str,
+        user: str | None,
+        prompt_tokens: int,
+        completion_tokens: int,
+        cached_tokens: int = 0,
+    ) -> None:
+        """Attribute one completion's usage to ``call_type`` and ``user``."""
+        total = prompt_tokens + completion_tokens
+        hour = _hour(self.clock())
+        with self._lock:
+            for bucket in (
+                self.by_type.setdefault(call_type, {}),
+                self.by_user.setdefault(user or "*", {}),
+            ):
+                bucket["calls"] = bucket.get("calls", 0) + 1
+                bucket["prompt"] = bucket.get("prompt", 0) + prompt_tokens
+                bucket["completion"] = bucket.get("completion", 0) + completion_tokens
+                bucket["cached"] = bucket.get("cached", 0) + cached_tokens
+            self.hourly[f"*|{hour}"] = self.hourly.get(f"*|{hour}", 0) + total
+            if user:
+                key = f"{user}|{hour}"
+                self.hourly[key] = self.hourly.get(key, 0) + total
+            due = time.monotonic() - self._last_persist >= self.persist_interval
+        if due:
+            self.flush()
+
+    # Queries ------------------------------------------------------------------
+    def tokens(self, call_type: str | None = None) -> int:
+        """Return all tokens used, optionally for one call type."""
+        with self._lock:
+            buckets = (
+                [self.by_type.get(call_type, {})] if call_type else self.by_type.values()
+            )
+            return sum(b.get("prompt", 0) + b.get("completion", 0) for b in buckets)
+
+    def user_hour(self, user: str) -> int:
+        """Return tokens attributed to ``user`` in the current hour."""
+        return self.hourly.get(f"{user}|{_hour(self.clock())}", 0)
+
+    def global_hour(self) -> int:
+        """Return tokens used by everyone in the current hour."""
+        return self.hourly.get(f"*|{_hour(self.clock())}", 0)
+
+    def cost(self, call_type: str | None = None) -> float:
+        """Return the estimated USD cost, optionally for one call type."""
+        prompt_price, completion_price = PRICES.get(self.model, (0.0, 0.0))
+        with self._lock:
+            buckets = (
+                [self.by_type.get(call_type, {})] if call_type else self.by_type.values()
+            )
+            return sum(
+                (b.get("prompt", 0) - b.get("cached", 0) * CACHED_DISCOUNT)
+                * prompt_price
+                / 1e6
+                + b.get("completion", 0) * completion_price / 1e6
+                for b in buckets
+            )
+
+    def savings(self, call_type: str | None = None) -> float:
+        """Return the estimated USD saved by provider prompt caching."""
+        prompt_price = PRICES.get(self.model, (0.0, 0.0))[0]
+        with self._lock:
+            buckets = (
+                [self.by_type.get(call_type, {})] if call_type else self.by_type.values()
+            )
+            cached = sum(b.get("cached", 0) for b in buckets)
+        return cached * CACHED_DISCOUNT * prompt_price / 1e6
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Return calls, tokens, cache-hit rate, cost and savings per call type."""
+        return {
+            call_type: {
+                **counts,
+                "cache_hit_rate": (
+                    counts.get("cached", 0) / counts["prompt"] if counts.get("prompt") else 0.0
+                ),
+                "cost": self.cost(call_type),
+                "savings": self.savings(call_type),
+            }
+            for call_type, counts in list(self.by_type.items())
+        }
+
+    # Persistence --------------------------------------------------------------
+    def flush(self) -> None:
+        """Persist aggregates now, dropping hourly buckets past retention."""
+        if self.store is None:
+            return
+        oldest = _hour(self.clock()) - RETAIN_HOURS
+        with self._lock:
+            self.hourly = {
+                k: v for k, v in self.hourly.items() if int(k.rsplit("|", 1)[1]) >= oldest
+            }
+            data = {
+                "by_type": {k: dict(v) for k, v in self.by_type.items()},
+                "by_user": {k: dict(v) for k, v in self.by_user.items()},
+                "hourly": dict(self.hourly),
+            }
+            self._last_persist = time.monotonic()
+        self.store.save(data)
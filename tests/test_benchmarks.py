@@ -0,0 +1,14 @@
+from benchmarks.suite import compare, run
+
+
+def test_suite_produces_machine_readable_results():
+    results = run("top_matches[n=100]", rounds=2, min_time=0.0)
+    stats = results["benchmarks"]["matcher.top_matches[n=100]"]
+    assert stats["rounds"] == 2
+    assert stats["min"] <= stats["median"]
+
+
+def test_compare_flags_regressions():
+    results = {"benchmarks": {"a": {"median": 3.0}, "b": {"median": 1.0}}}
+    baseline = {"benchmarks": {"a": {"median": 1.0}, "b": {"median": 1.0}}}
+    assert compare(results, baseline, threshold=1.5) == ["a"]
@@ -0,0 +1,62 @@
+import pytest
+
+from talkmatch.ai import AIClient
+from talkmatch.cassette import CassetteMiss, ReplayClient, read_trace
+from talkmatch.fake_openai import FakeOpenAI
+
+
+def test_record_then_replay_serves_same_replies(tmp_path):
+    trace = tmp_path / "trace.jsonl.gz"
+    recorder = AIClient(openai_client=FakeOpenAI(), record_path=trace)
+    first = recorder.get_response([{"role": "user", "content": "hello"}])
+    second = recorder.get_response([{"role": "user", "content": "bye"}])
+    recorder.client.close()
+
+    entries = list(read_trace(trace))
+    assert [e["reply"] for e in entries] == [first, second]
+    assert entries[0]["usage"]["total_tokens"] > 0
+
+    replay = ReplayClient(trace)
+    client = AIClient(openai_client=replay)
+    assert client.get_response([{"role": "user", "content": "bye"}]) == second
+    assert client.get_response([{"role": "user", "content": "hello"}]) == first
+    assert replay.report()["matched"] == 2
+
+
+def test_replay_reports_unmatched_requests(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    recorder = AIClient(openai_client=FakeOpenAI(), record_path=trace)
+    recorder.get_response([{"role": "user", "content": "known"}])
+    recorder.client.close()
+
+    replay = ReplayClient(trace)
+    client = AIClient(openai_client=replay)
+    with pytest.raises(CassetteMiss):
+        client.get_response([{"role": "user", "content": "unknown"}])
+    report = replay.report()
+    assert report["unmatched"] == 1
+    assert report["unused"] == 1
+    assert report["unmatched_requests"][0]["last"] == "unknown"
+
+    fallback = ReplayClient(trace, fallback=FakeOpenAI())
+    assert AIClient(openai_client=fallback).get_response(
+        [{"role": "user", "content": "unknown"}]
+    )
+
+
+def test_recorders_share_the_trace_but_keep_their_backend(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    first, second = FakeOpenAI(), FakeOpenAI()
+    one = AIClient(openai_client=first, record_path=trace)
+    two = AIClient(openai_client=second, record_path=trace)
+    one.get_response([{"role": "user", "content": "one"}])
+    two.get_response([{"role": "user", "content": "two"}])
+    assert (first.calls.total(), second.calls.total()) == (1, 1)
+    one.client.close()
+    two.get_response([{"role": "user", "content": "three"}])  # Still open.
+    two.client.close()
+    assert len(list(read_trace(trace))) == 3
+
+    AIClient(replay_path=trace)
+    with pytest.raises(ValueError):
+        AIClient(replay_path=trace, replay_latency=True)
@@ -0,0 +1,112 @@
+import json
+
+from talkmatch.chat import ChatSession
+from talkmatch.storage import ChatStore, ProfileStore
+
+
+def _history(n):
+    messages = [{"role": "system", "content": "sys"}]
+    for i in range(1, n):
+        role = "user" if i % 2 else "assistant"
+        messages.append({"role": role, "content": f"m{i}"})
+    return messages
+
+
+class DummyAI:
+    def get_response(self, messages):
+        return "reply"
+
+
+def test_store_archives_full_segments_and_pages_them(tmp_path):
+    path = tmp_path / "chat.json"
+    store = ChatStore(path, segment_size=10)
+    history = _history(35)
+    for n in range(2, 36):
+        store.save(history[:n])
+    index = json.loads(path.read_text())
+    assert [s["start"] for s in index["segments"]] == [0, 10, 20]
+    assert len(index["tail"]) == 5
+    assert store.archive_path.exists()
+
+    reopened = ChatStore(path, segment_size=10)
+    assert reopened.length == 35
+    assert reopened.page(0) == history
+    assert reopened.page(8, 23) == history[8:23]
+    assert reopened.load() == history
+
+
+def test_load_recent_snaps_to_segments_and_counts_roles(tmp_path):
+    store = ChatStore(tmp_path / "chat.json", segment_size=10)
+    history = _history(35)
+    store.save(history)
+    recent = store.load_recent(12)
+    assert recent.messages[0] == history[0]
+    assert recent.messages[1:] == history[20:]
+    assert recent.omitted == 19
+    assert recent.omitted_roles == {"user": 10, "assistant": 9}
+
+
+def test_old_single_document_files_still_load(tmp_path):
+    path = tmp_path / "chat.json"
+    history = _history(5)
+    path.write_text(json.dumps(history))
+    store = ChatStore(path, segment_size=2)
+    assert store.load() == history
+    store.save(history + [{"role": "user", "content": "new"}])
+    assert ChatStore(path, segment_size=2).load()[-1]["content"] == "new"
+
+
+def test_session_keeps_recent_window_and_pages_history(tmp_path):
+    path = tmp_path / "chat.json"
+    session = ChatSession(
+        ai_client=DummyAI(),
+        profile_store=ProfileStore(base_dir=tmp_path),
+        chat_store=ChatStore(path, segment_size=4),
+        recent_messages=4,
+    )
+    for i in range(10):
+        session.send_client_message("A", f"hi {i}")
+    assert session.messages.omitted > 0
+    assert len(session.messages) <= 9
+    assert session.messages.count_role("user") == 10
+    full = session.history(0)
+    assert len(full) == 21
+    assert [m["content"] for m in full if m["role"] == "user"] == [
+        f"hi {i}" for i in range(10)
+    ]
+
+    restored = ChatSession(
+        ai_client=DummyAI(),
+        profile_store=ProfileStore(base_dir=tmp_path),
+        chat_store=ChatStore(path, segment_size=4),
+        recent_messages=4,
+    )
+    assert restored.messages.count_role("user") == 10
+    assert restored.messages.total == 21
+    assert restored.history() == full[1:]
+    assert restored.messages[-1]["content"] == "reply"
+
+
+def test_restarts_with_window_smaller_than_segment_keep_history(tmp_path):
+    path = tmp_path / "chat.json"
+    expected = None
+    count = 0
+    for _ in range(4):
+        session = ChatSession(
+            ai_client=DummyAI(),
+            profile_store=ProfileStore(base_dir=tmp_path),
+            chat_store=ChatStore(path, segment_size=7),
+            recent_messages=5,
+        )
+        if expected is None:
+            expected = [dict(session.history(0)[0])]
+        for _ in range(37):
+            count += 1
+            session.send_client_message("A", f"u{count}")
+            expected += [
+                {"role": "user", "content": f"u{count}"},
+                {"role": "assistant", "content": "reply"},
+            ]
+        assert session.history(0) == expected
+    reopened = ChatStore(path, segment_size=7)
+    assert reopened.load() == expected
@@ -89,3 +89,30 @@ def test_collect_info_prompt_added(tmp_path):
     assert len(system_contents) >= 2
     assert "kids" in system_contents[0]
     assert "kids" in system_contents[-1]
+
+
+class ProfileDownAI:
+    """Fail every profile prompt, answer chat prompts normally."""
+
+    def __init__(self):
+        self.prompts = []
+
+    def get_response(self, messages):
+        if "<CHAT_MESSAGES>" in messages[-1]["content"]:
+            self.prompts.append(messages[-1]["content"])
+            raise RuntimeError("profile model down")
+        return "reply"
+
+
+def test_failed_profile_updates_keep_all_deferred_text(tmp_path):
+    store = ProfileStore(base_dir=tmp_path)
+    ai = ProfileDownAI()
+    session = ChatSession(
+        ai_client=ai,
+        profile_store=store,
+        chat_store=ChatStore(path=tmp_path / "history.json"),
+    )
+    session.send_client_message("A", "first")
+    session.send_client_message("A", "second")
+    assert store.pending == {"A": ["first", "second"]}
+    assert "first\nsecond" in ai.prompts[-1]
@@ -0,0 +1,102 @@
+from talkmatch.gui.chat_view import VirtualChatView
+
+
+class FakeText:
+    """Just enough of ``tk.Text`` to check what the view renders."""
+
+    def __init__(self):
+        self.content = ""
+        self.inserts = 0
+        self.idle = []
+
+    def _offset(self, index):
+        if index == "end":
+            return len(self.content)
+        line = int(index.split(".")[0])
+        offset = 0
+        for _ in range(line - 1):
+            offset = self.content.index("\n", offset) + 1
+        return offset
+
+    def insert(self, index, *chunks):
+        self.inserts += 1
+        text = "".join(chunks[::2])
+        at = self._offset(index)
+        self.content = self.content[:at] + text + self.content[at:]
+
+    def delete(self, start, stop):
+        self.content = self.content[: self._offset(start)] + self.content[self._offset(stop) :]
+
+    def index(self, index):
+        return "1.0"
+
+    def configure(self, **options):
+        pass
+
+    def tag_config(self, *args, **options):
+        pass
+
+    def yview(self, *args):
+        pass
+
+    def after_idle(self, callback):
+        self.idle.append(callback)
+
+
+def _view(history, **options):
+    text = FakeText()
+    view = VirtualChatView(
+        text,
+        page=lambda start, stop: history[start:stop],
+        length=lambda: len(history),
+        label=lambda m: m["role"],
+        **options,
+    )
+    return text, view
+
+
+def _shown(text):
+    return [line.split(": ", 1)[1] for line in text.content.split("\n") if ": " in line]
+
+
+HISTORY = [{"role": "user", "content": f"m{i}"} for i in range(1000)]
+
+
+def test_open_renders_only_the_newest_page_in_one_insert():
+    text, view = _view(HISTORY, page_size=20, max_messages=40)
+    view.open()
+    assert text.inserts == 1
+    assert _shown(text) == [f"m{i}" for i in range(980, 1000)]
+    assert view.first == 980
+
+
+def test_scrolling_pages_older_and_caps_rendered_messages():
+    text, view = _view(HISTORY, page_size=20, max_messages=40)
+    view.open()
+    view._on_scroll("0.0", "0.5")
+    view._on_scroll("0.0", "0.5")  # Only one load is scheduled at a time.
+    assert len(text.idle) == 1
+    text.idle.pop()()
+    assert _shown(text) == [f"m{i}" for i in range(960, 1000)]
+    view.load_older()
+    assert view.rendered == 40
+    assert _shown(text) == [f"m{i}" for i in range(940, 980)]
+
+    view.append("user", "live")  # Held back while older messages are shown.
+    assert "live" not in _shown(text)
+    view._on_scroll("0.5", "1.0")
+    text.idle.pop()()
+    assert _shown(text) == [f"m{i}" for i in range(960, 1000)]
+    view.load_newer()
+    assert _shown(text)[-1] == "live"
+    assert view.rendered == 40
+    assert view.first == 961
+
+
+def test_append_trims_the_top():
+    text, view = _view(HISTORY[:3], page_size=2, max_messages=3)
+    view.open()
+    for i in range(5):
+        view.append("assistant", f"new{i}\nsecond line")
+    assert view.rendered == 3
+    assert _shown(text) == ["new2", "new3", "new4"]
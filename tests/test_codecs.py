@@ -0,0 +1,35 @@
+import json
+
+import pytest
+
+from talkmatch.storage import ChatStore, MatchMatrixStore, available_codecs, set_codec
+from talkmatch.storage.codecs import decode, get_codec
+
+DATA = {"A": {"B": 0.25, "C": 1.0}, "B": {"A": 0.25}, "name": "Zoë"}
+
+
+@pytest.mark.parametrize("spec", available_codecs())
+def test_every_available_codec_round_trips(spec):
+    assert decode(get_codec(spec).encode(DATA)) == DATA
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        set_codec("yaml")
+
+
+def test_store_switches_codec_and_still_reads_old_files(tmp_path):
+    path = tmp_path / "matrix.json"
+    path.write_text(json.dumps(DATA, indent=2), encoding="utf-8")
+    store = MatchMatrixStore(path)
+    assert store.load([]) == DATA
+
+    previous = set_codec("json+gzip", store="MatchMatrixStore")
+    try:
+        store.save(DATA)
+        assert path.read_bytes()[:2] == b"\x1f\x8b"
+        assert MatchMatrixStore(path).load([]) == DATA
+        ChatStore(tmp_path / "chat.json").save([{"role": "user", "content": "hi"}])
+        assert (tmp_path / "chat.json").read_bytes().startswith(b"{")
+    finally:
+        set_codec(previous, store="MatchMatrixStore")
@@ -0,0 +1,81 @@
+import threading
+
+from talkmatch import filters
+from talkmatch.coverage import ObjectiveCoverage
+from talkmatch.filters import ReadinessFilter
+from talkmatch.storage import ProfileStore
+
+OBJECTIVES = ["kids", "job", "age", "languages"]
+
+
+class ScoreAI:
+    def __init__(self, reply="90"):
+        self.reply = reply
+        self.calls = 0
+
+    def get_response(self, messages):
+        self.calls += 1
+        return self.reply
+
+
+def test_queries_follow_incremental_updates():
+    coverage = ObjectiveCoverage(OBJECTIVES)
+    coverage.update("A", "Wants KIDS, works a desk job")
+    coverage.update("B", "")
+    coverage.update("C", "kids, job, age 30, speaks two languages")
+    assert coverage.missing("A") == ("age", "languages")
+    assert coverage.missing("unknown") == tuple(OBJECTIVES)
+    assert coverage.coverage("C") == 1.0
+    assert coverage.users_above(0.5) == ["A", "C"]
+    assert coverage.users_missing("job") == ["B"]
+    assert coverage.histogram() == [1, 0, 1, 0, 1]
+
+    coverage.update("A", "age 40")
+    coverage.remove("C")
+    coverage.update("D", "job")  # Reuses C's slot.
+    assert coverage.users_above(0.25) == ["A", "D"]
+    assert coverage.histogram() == [1, 2, 0, 0, 0]
+    assert len(coverage) == 3 and "C" not in coverage
+
+
+def test_profile_store_tracks_coverage(tmp_path):
+    store = ProfileStore(base_dir=tmp_path)
+    store.profiles["A"] = "wants kids"  # Direct writes are picked up lazily.
+    assert "kids" not in store.missing_objectives("A")
+    assert "job" in store.missing_objectives("A")
+    store.update(ScoreAI("has a job"), "A", "text")  # The reply is the new profile.
+    assert store.missing_objectives("A") == tuple(o for o in store.coverage.objectives if o != "job")
+    reloaded = ProfileStore(base_dir=tmp_path)
+    assert reloaded.missing_objectives("A") == store.missing_objectives("A")
+
+
+def test_readiness_filter_skips_low_coverage_without_ai(tmp_path, monkeypatch):
+    monkeypatch.setattr(filters, "PROFILE_OBJECTIVES", OBJECTIVES)
+    store = ProfileStore(base_dir=tmp_path)
+    store.profiles.update({"A": "kids job age languages", "B": "likes movies"})
+    ai = ScoreAI()
+    readiness = ReadinessFilter(ai, store)  # The prefilter is opt-in.
+    assert readiness.filter(["A", "B"]) == ["A", "B"]
+    assert ai.calls == 2
+    readiness.min_coverage = 0.25
+    assert readiness.filter(["A", "B"]) == ["A"]
+    assert ai.calls == 3
+
+
+def test_concurrent_updates_keep_each_user_in_one_level():
+    coverage = ObjectiveCoverage(OBJECTIVES)
+    profiles = ["", "kids", "kids job", "kids job age", "kids job age languages"]
+
+    def churn(user):
+        for i in range(300):
+            coverage.update(user, profiles[i % len(profiles)])
+            if i % 7 == 0:
+                coverage.remove(user)
+
+    threads = [threading.Thread(target=churn, args=(f"U{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sum(coverage.histogram()) == len(coverage) == 8
+    assert sorted(coverage.users_above(0)) == sorted(f"U{i}" for i in range(8))
@@ -0,0 +1,61 @@
+import pytest
+
+from talkmatch import metrics
+from talkmatch.gui.dashboard import DashboardModel
+from talkmatch.matcher import Matcher
+
+
+@pytest.fixture
+def sink():
+    sink = metrics.InMemorySink()
+    previous = metrics.set_sink(sink)
+    yield sink
+    metrics.set_sink(previous)
+
+
+def test_rates_come_from_snapshot_differences(sink):
+    model = DashboardModel()
+    metrics.gauge("ai_in_flight", 3)
+    metrics.gauge("ui_queue_depth", 2, queue="a")
+    metrics.gauge("ui_queue_depth", 1, queue="b")
+    metrics.observe("ai_request_seconds", 0.2, call_type="chat")
+    metrics.increment("ai_prompt_tokens", 100, call_type="chat")
+    first = sink.snapshot()
+    state = model.update(first)
+    assert state.in_flight == 3
+    assert state.queue_depth == 3
+    assert state.latency == {"chat": (0.2, 0.2)}
+    assert state.tokens_per_minute == 0.0  # No earlier snapshot yet.
+
+    metrics.increment("ai_prompt_tokens", 400, call_type="chat")
+    metrics.increment("ai_cached_prompt_tokens", 250, call_type="chat")
+    metrics.increment("ai_completion_tokens", 100, call_type="chat")
+    metrics.increment("store_bytes_written", 2048, store="ChatStore")
+    metrics.observe("store_save_seconds", 0.001, store="ChatStore")
+    second = sink.snapshot()
+    second["uptime"] = first["uptime"] + 30
+    state = model.update(second)
+    assert state.tokens_per_minute == pytest.approx(1000)
+    assert state.cache_hit_rate == pytest.approx(0.5)
+    assert state.writes_per_second == pytest.approx(1 / 30)
+    assert state.bytes_per_second == pytest.approx(2048 / 30)
+    assert any(line.startswith("chat: p50 200ms") for line in state.lines())
+
+
+def test_calculate_progress_and_eta(sink, tmp_path):
+    class DummyAI:
+        def get_response(self, messages):
+            return "0.5"
+
+    matcher = Matcher(["a", "b", "c"], path=tmp_path / "matrix.json")
+    matcher.calculate(DummyAI(), users=["a", "b", "c"])
+    state = DashboardModel().update(sink.snapshot())
+    assert state.progress == (3, 3)
+    assert state.eta is None
+
+    metrics.gauge("matcher_progress_started", 100.0)
+    metrics.gauge("matcher_progress_total", 10)
+    metrics.gauge("matcher_progress_done", 4)
+    state = DashboardModel().update(sink.snapshot(), now=108.0)
+    assert state.eta == pytest.approx(12.0)
+    assert state.lines()[-1] == "Matching: 4/10 pairs, ETA 12s"
@@ -0,0 +1,78 @@
+import json
+import threading
+import urllib.request
+
+import pytest
+
+from talkmatch.ai import AIClient
+from talkmatch.fake_openai import FakeAPIError, FakeOpenAI, LatencyModel, serve
+from talkmatch.matcher import build_prompt
+from talkmatch.readiness import ReadinessEvaluator
+
+
+def test_replies_are_deterministic_per_prompt_type():
+    client = AIClient(openai_client=FakeOpenAI())
+    prompt = build_prompt("A", "B", {"A": "hiking", "B": "books"})
+    score = client.get_response([{"role": "user", "content": prompt}])
+    assert 0.0 <= float(score) <= 1.0
+    assert client.get_response([{"role": "user", "content": prompt}]) == score
+
+    readiness = ReadinessEvaluator(client).score(["kids"], "wants kids")
+    assert 40 <= readiness <= 100
+
+    chat = [{"role": "system", "content": "hi"}, {"role": "user", "content": "hey"}]
+    assert client.get_response(chat)
+    assert client.client.calls == {"match": 2, "readiness": 1, "chat": 1}
+
+
+def test_latency_and_throughput_are_simulated():
+    slept = []
+    fake = FakeOpenAI(
+        latency=LatencyModel("constant", 0.25, tokens_per_second=100),
+        sleep=slept.append,
+    )
+    completion = fake.chat.completions.create(
+        messages=[{"role": "user", "content": "hello"}]
+    )
+    tokens = completion.usage.completion_tokens
+    assert slept == [pytest.approx(0.25 + tokens / 100)]
+
+
+def test_error_injection_and_rate_limit():
+    always_500 = FakeOpenAI(error_rate_500=1.0)
+    with pytest.raises(FakeAPIError) as exc:
+        always_500.chat.completions.create(messages=[{"role": "user", "content": "x"}])
+    assert exc.value.status_code == 500
+
+    limited = FakeOpenAI(rate_limit_rpm=1)
+    limited.chat.completions.create(messages=[{"role": "user", "content": "x"}])
+    with pytest.raises(FakeAPIError) as exc:
+        limited.chat.completions.create(messages=[{"role": "user", "content": "x"}])
+    assert exc.value.status_code == 429
+
+
+def test_streaming_reassembles_reply():
+    fake = FakeOpenAI()
+    messages = [{"role": "user", "content": "hey there"}]
+    chunks = fake.chat.completions.create(messages=messages, stream=True)
+    text = "".join(c.choices[0].delta.content or "" for c in chunks)
+    assert text == fake.reply_for(messages)
+
+
+def test_http_endpoint_serves_completions():
+    server = serve(FakeOpenAI(), port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        body = json.dumps({"model": "m", "messages": [{"role": "user", "content": "hi"}]})
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{server.server_port}/v1/chat/completions",
+            data=body.encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        with urllib.request.urlopen(request) as response:
+            payload = json.loads(response.read())
+    finally:
+        server.shutdown()
+    assert payload["choices"][0]["message"]["content"]
+    assert payload["usage"]["total_tokens"] > 0
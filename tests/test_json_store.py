@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from talkmatch.storage import (
+    ChatStore,
+    ProfileStore,
+    WritePolicy,
+    flush_all,
+    set_write_policy,
+)
+from talkmatch.storage.json_store import write_stats
+
+
+@pytest.fixture
+def write_behind():
+    previous = set_write_policy(WritePolicy(delay=60.0, max_pending=3))
+    yield
+    flush_all()
+    set_write_policy(previous)
+
+
+def test_save_replaces_file_atomically(tmp_path):
+    store = ChatStore(tmp_path / "chat.json")
+    store.save([{"role": "user", "content": "hi"}])
+    assert store.load() == [{"role": "user", "content": "hi"}]
+    assert [p.name for p in tmp_path.iterdir()] == ["chat.json"]
+
+
+def test_unreadable_file_falls_back_to_default(tmp_path):
+    (tmp_path / "chat.json").write_text('[{"role": "us')
+    assert ChatStore(tmp_path / "chat.json").load() == []
+
+
+def test_write_behind_coalesces_saves_until_flush(tmp_path, write_behind):
+    store = ChatStore(tmp_path / "chat.json")
+    before = write_stats()["writes"]
+    store.save([{"role": "user", "content": "a"}])
+    store.save([{"role": "user", "content": "b"}])
+    assert not store.path.exists()
+    assert store.load() == [{"role": "user", "content": "b"}]
+    assert write_stats()["writes"] == before + 1
+
+
+def test_write_behind_writes_early_after_max_pending(tmp_path, write_behind):
+    store = ChatStore(tmp_path / "chat.json")
+    for text in "abc":
+        store.save([{"role": "user", "content": text}])
+    deadline = time.monotonic() + 2.0
+    while not store.path.exists() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert ChatStore(tmp_path / "chat.json").load()[0]["content"] == "c"
+
+
+def test_discard_drops_pending_save(tmp_path, write_behind):
+    store = ChatStore(tmp_path / "chat.json")
+    store.save([{"role": "user", "content": "gone"}])
+    store.discard()
+    flush_all()
+    assert not store.path.exists()
+
+
+def test_write_behind_persists_the_data_as_of_save(tmp_path, write_behind):
+    store = ProfileStore(base_dir=tmp_path)
+    store.profiles["A"] = "first"
+    store.save(store.profiles)
+    store.profiles["A"] = "changed after save"
+    store.profiles["B"] = "new"
+    flush_all()
+    assert ProfileStore(base_dir=tmp_path).profiles == {"A": "first"}
@@ -0,0 +1,61 @@
+from talkmatch.ambassador import Ambassador
+from talkmatch.linking import LinkTracker
+from talkmatch.personas import Persona
+from talkmatch.session_manager import SessionManager
+
+
+def _pair(tracker, count_a=0, count_b=0):
+    a, b = Ambassador(), Ambassador()
+    a.set_persona("B")
+    b.set_persona("A")
+    tracker.watch("A", a, count_a, "", "B", b, count_b, "")
+    return a, b
+
+
+def test_tracker_links_pair_from_message_events():
+    tracker = LinkTracker(threshold=2)
+    events = []
+    tracker.subscribe(lambda event, x, y: events.append((event, x, y)))
+    a, b = _pair(tracker, count_a=1)
+    tracker.on_message("C", "unrelated")
+    tracker.on_message("A", "hi")
+    assert a.state == "acting"
+    tracker.on_message("B", "hello")
+    tracker.on_message("B", "coffee?")
+    assert a.state == b.state == "linking"
+    assert a.link_context == "coffee?" and b.link_context == "hi"
+    tracker.on_message("A", "tea")
+    assert b.link_context == "tea"
+    tracker.on_message("B", "Tea")
+    assert a.state == b.state == "linked"
+    tracker.on_message("A", "something else")
+    assert a.state == "linked"
+    assert events == [("linking", "A", "B"), ("linked", "A", "B")]
+
+
+def test_unwatched_pairs_are_ignored():
+    tracker = LinkTracker(threshold=1)
+    a, b = _pair(tracker)
+    tracker.unwatch("B")
+    assert tracker.partner("A") is None
+    tracker.on_message("A", "hi")
+    tracker.on_message("B", "hi")
+    assert a.state == b.state == "acting"
+
+
+def test_manager_watches_reciprocated_personas(tmp_path):
+    class AI:
+        def get_response(self, messages):
+            return "0.9"
+
+    manager = SessionManager(
+        personas=[Persona("A", "a"), Persona("B", "b")],
+        base_dir=tmp_path,
+        ai_client_factory=AI,
+        filters=[],
+        link_threshold=1,
+    )
+    manager.calculate()
+    assert manager.links.partner("A") == "B"
+    manager.declare_match("A", "B")
+    assert manager.links.partner("A") is None
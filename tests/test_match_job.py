@@ -0,0 +1,71 @@
+import threading
+
+from talkmatch.match_job import (
+    MatchJob,
+    ProcessTileExecutor,
+    ThreadTileExecutor,
+    WorkStealingQueue,
+    make_tiles,
+)
+from talkmatch.matcher import Matcher
+from talkmatch.storage import MatchCheckpointStore, ProfileStore
+
+
+class CountingAI:
+    calls = 0
+    lock = threading.Lock()
+
+    def get_response(self, messages):
+        with CountingAI.lock:
+            CountingAI.calls += 1
+        return "0.7"
+
+
+def test_tiles_cover_each_pair_once():
+    users = [f"u{i}" for i in range(10)]
+    pairs = [p for tile in make_tiles(users, 3) for p in tile.pairs()]
+    assert len(pairs) == len(set(pairs)) == 45
+    assert all(users.index(u) < users.index(v) for u, v in pairs)
+
+
+def test_idle_slot_steals_from_busiest():
+    tiles = make_tiles([f"u{i}" for i in range(8)], 2)
+    queue = WorkStealingQueue(tiles, 2)
+    first = [queue.take(0) for _ in range(5)]
+    assert first == tiles[:5]
+    assert queue.take(0) == tiles[-1]
+    assert queue.steals == 1
+
+
+def _job(tmp_path, users, executor):
+    matcher = Matcher(list(users), path=tmp_path / "matrix.json")
+    checkpoint = MatchCheckpointStore(tmp_path / "job.json")
+    return MatchJob(matcher, executor, checkpoint, tile_size=2, save_interval=0.0)
+
+
+def test_interrupted_job_resumes_from_completed_tiles(tmp_path):
+    users = [f"u{i}" for i in range(6)]
+    profiles = ProfileStore(base_dir=tmp_path)
+    CountingAI.calls = 0
+    job = _job(tmp_path, users, ThreadTileExecutor(CountingAI, workers=1))
+    job.matcher.declare_official_match("u0", "u1")
+    seen = []
+    assert not job.run(profiles, should_stop=lambda: seen.append(1) or len(seen) >= 2)
+    assert (tmp_path / "job.json").exists()
+    first = CountingAI.calls
+
+    resumed = _job(tmp_path, users, ThreadTileExecutor(CountingAI, workers=2))
+    assert resumed.run(profiles)
+    # Tiles (0,0) and (0,1) were saved; the other four hold 10 pairs.
+    assert CountingAI.calls - first == 10
+    assert resumed.matcher.matrix["u0"]["u1"] == 1.0
+    assert resumed.matcher.matrix["u2"]["u5"] == 0.7
+    assert not (tmp_path / "job.json").exists()
+
+
+def test_process_pool_scores_all_pairs(tmp_path):
+    users = [f"u{i}" for i in range(5)]
+    job = _job(tmp_path, users, ProcessTileExecutor(CountingAI, workers=2))
+    assert job.run(ProfileStore(base_dir=tmp_path))
+    assert all(job.matcher.matrix[u][v] == 0.7 for u in users for v in users if u != v)
+    assert Matcher(list(users), path=tmp_path / "matrix.json").matrix["u0"]["u4"] == 0.7
@@ -0,0 +1,63 @@
+import json
+import sys
+
+from talkmatch.chat import ChatSession
+from talkmatch.message_log import Message, MessageLog, MessageView
+from talkmatch.storage import ChatStore, ProfileStore
+
+
+def test_log_tracks_roles_and_behaves_like_a_list():
+    log = MessageLog([{"role": "system", "content": "s"}])
+    log.append({"role": "user", "content": "hi"})
+    log.append(Message("assistant", "hello"))
+    log.append({"role": "user", "content": "bye"})
+    assert log.count_role("user") == 2
+    assert log.last("user").content == "bye"
+    assert log.last("tool") is None
+    assert log[1]["content"] == "hi" and log[-1]["role"] == "user"
+    assert log[1:3] == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "hello"},
+    ]
+    assert log.to_dicts(3) == [{"role": "user", "content": "bye"}]
+    assert log[1].role is sys.intern("user")
+    assert sys.getsizeof(log[1]) < sys.getsizeof({"role": "user", "content": "hi"})
+
+
+def test_view_concatenates_without_copying():
+    log = MessageLog([{"role": "system", "content": "s"}, {"role": "user", "content": "a"}])
+    view = MessageView(log.view(1), [{"role": "system", "content": "mode"}])
+    log.append({"role": "assistant", "content": "later"})
+    assert len(view) == 2
+    assert [m["content"] for m in view] == ["a", "mode"]
+    assert view[-1]["content"] == "mode" and view[0:1] == [{"role": "user", "content": "a"}]
+    assert json.dumps([dict(m) for m in view])
+
+
+def test_session_persists_plain_dicts(tmp_path):
+    class DummyAI:
+        def get_response(self, messages):
+            return "reply"
+
+    path = tmp_path / "history.json"
+    session = ChatSession(
+        ai_client=DummyAI(),
+        profile_store=ProfileStore(base_dir=tmp_path),
+        chat_store=ChatStore(path=path),
+    )
+    session.send_client_message("A", "hi")
+    saved = json.loads(path.read_text())
+    assert saved["tail"][-2:] == [
+        {"role": "user", "content": "hi"},
+        {"role": "assistant", "content": "reply"},
+    ]
+    assert isinstance(session.messages, MessageLog)
+
+
+def test_view_windows_compose():
+    log = MessageLog({"role": "user", "content": str(i)} for i in range(6))
+    view = MessageView([{"role": "system", "content": "s"}], log.view(2))
+    window = MessageView.window(view, 2, 4)
+    assert [m["content"] for m in window] == ["3", "4"]
+    assert [m["content"] for m in view[1:3]] == ["2", "3"]
+    assert [m["content"] for m in view[::2]] == ["s", "3", "5"]
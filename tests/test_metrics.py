@@ -0,0 +1,60 @@
+import pytest
+
+from talkmatch import metrics
+from talkmatch.ai import AIClient
+from talkmatch.chat import ChatSession
+from talkmatch.fake_openai import FakeOpenAI
+from talkmatch.profile import ProfileStore
+from talkmatch.storage import ChatStore
+
+
+@pytest.fixture
+def sink():
+    sink = metrics.InMemorySink()
+    previous = metrics.set_sink(sink)
+    yield sink
+    metrics.set_sink(previous)
+
+
+def test_null_sink_is_default_and_noop():
+    assert not metrics.enabled()
+    with metrics.span("anything"):
+        pass
+    metrics.increment("anything")
+    assert metrics.export_prometheus() == ""
+
+
+def test_chat_turn_records_stage_spans_and_ai_counters(sink, tmp_path):
+    session = ChatSession(
+        ai_client=AIClient(openai_client=FakeOpenAI()),
+        profile_store=ProfileStore(base_dir=tmp_path),
+        chat_store=ChatStore(path=tmp_path / "history.json"),
+    )
+    session.send_client_message("Alice", "Hello")
+
+    snapshot = sink.snapshot()
+    stages = {
+        d["labels"]["stage"]
+        for d in snapshot["distributions"]
+        if d["name"] == "chat_stage_seconds"
+    }
+    assert stages == {"profile_update", "prompt_assembly", "llm_call", "history_save"}
+    requests = {
+        c["labels"]["call_type"]: c["value"]
+        for c in snapshot["counters"]
+        if c["name"] == "ai_requests"
+    }
+    assert requests == {"profile": 1, "chat": 1}
+    assert any(c["name"] == "store_bytes_written" for c in snapshot["counters"])
+
+
+def test_prometheus_export_format(sink):
+    metrics.increment("ai_requests", call_type="chat")
+    metrics.observe("ai_request_seconds", 0.5, call_type="chat")
+    metrics.gauge("ai_in_flight", 2)
+    text = metrics.export_prometheus()
+    assert '# TYPE talkmatch_ai_requests_total counter' in text
+    assert 'talkmatch_ai_requests_total{call_type="chat"} 1' in text
+    assert 'talkmatch_ai_request_seconds{call_type="chat",quantile="0.5"} 0.5' in text
+    assert 'talkmatch_ai_request_seconds_count{call_type="chat"} 1' in text
+    assert "talkmatch_ai_in_flight 2" in text
@@ -0,0 +1,84 @@
+from talkmatch.personas import Persona
+from talkmatch.pools import PooledMatcher, PoolPolicy
+from talkmatch.session_manager import SessionManager
+
+ATTRIBUTES = {
+    "A": {"languages": "English, French", "age": "29"},
+    "B": {"languages": "French", "age": "31"},
+    "C": {"languages": "English", "age": "45"},
+    "D": {"languages": "english", "age": "44"},
+    "E": {"age": "35"},
+}
+
+
+class PairAI:
+    def __init__(self):
+        self.pairs = []
+
+    def get_response(self, messages):
+        self.pairs.append(messages[0]["content"])
+        return "0.7"
+
+
+def test_pool_membership_rules():
+    policy = PoolPolicy(keys=("languages", "age"), age_band=10, age_overlap=2)
+    assert policy.pools_for(ATTRIBUTES["A"]) == [
+        "languages=english|age=20-29",
+        "languages=english|age=30-39",
+        "languages=french|age=20-29",
+        "languages=french|age=30-39",
+    ]
+    assert policy.pools_for(ATTRIBUTES["E"]) == ["languages=other|age=30-39"]
+
+
+def test_pairs_are_scored_once_and_only_within_pools(tmp_path):
+    matcher = PooledMatcher(
+        list(ATTRIBUTES), tmp_path, ATTRIBUTES.__getitem__, PoolPolicy(("languages", "age"))
+    )
+    assert sorted(matcher.candidate_pairs(matcher.users)) == [("A", "B"), ("C", "D")]
+    ai = PairAI()
+    matcher.calculate(ai)
+    assert len(ai.pairs) == 2
+    assert matcher.top_matches("A") == [("B", 0.7)]
+    assert "C" not in matcher.matrix["A"]
+
+    matcher.declare_official_match("A", "C")  # No shared pool.
+    assert matcher.matrix["C"]["A"] == 1.0
+    reloaded = PooledMatcher(
+        list(ATTRIBUTES), tmp_path, ATTRIBUTES.__getitem__, PoolPolicy(("languages", "age"))
+    )
+    assert reloaded.matrix["B"]["A"] == 0.7
+    assert reloaded.matrix["A"]["C"] == 1.0
+
+
+def test_stopped_runs_resume_per_pool(tmp_path):
+    matcher = PooledMatcher(
+        list(ATTRIBUTES), tmp_path, ATTRIBUTES.__getitem__, PoolPolicy(("languages", "age"))
+    )
+    ai = PairAI()
+    matcher.calculate(ai, should_stop=lambda: len(ai.pairs) >= 1)
+    assert len(matcher.remaining) == 1
+    matcher.calculate(ai, resume=True)
+    assert matcher.remaining is None
+    assert len(ai.pairs) == 2
+
+
+def test_session_manager_uses_pools(tmp_path):
+    personas = [Persona(name, name, attrs) for name, attrs in ATTRIBUTES.items()]
+    ai = PairAI()
+    manager = SessionManager(
+        personas=personas,
+        base_dir=tmp_path,
+        ai_client_factory=lambda: ai,
+        filters=[],
+        pools=PoolPolicy(("languages", "age")),
+    )
+    manager.calculate()
+    assert len(ai.pairs) == 2
+    assert manager.sessions["A"].ambassador.persona == "B"
+    assert manager.sessions["E"].ambassador.persona is None
+    manager.add_user("F", "f", {"languages": "French", "age": "33"})
+    assert manager.scheduler.run_once(force=True)
+    assert len(ai.pairs) == 4  # F is scored against A and B only.
+    manager.remove_user("A")
+    assert "A" not in manager.matcher.matrix["B"]
@@ -0,0 +1,71 @@
+from talkmatch import metrics, prompt_budget
+from talkmatch.chat import ChatSession
+from talkmatch.matcher import build_prompt
+from talkmatch.prompt_budget import PromptBudget, estimate_tokens, fit_messages, truncate
+from talkmatch.storage import ProfileStore
+
+
+def _history(count, size=400):
+    messages = [{"role": "system", "content": "system"}]
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": f"{i} " + "word " * (size // 5)})
+    return messages
+
+
+def test_fit_messages_drops_oldest_in_stable_blocks():
+    budget = PromptBudget(limits={"chat": 2000}, trim_step=4)
+    messages = _history(40)
+    fitted = fit_messages(messages, "chat", budget)
+    assert fitted[0] == messages[0]
+    assert fitted[-1] == messages[-1]
+    assert prompt_budget.estimate_messages(fitted) <= 2000
+    assert (len(messages) - len(fitted)) % 4 == 0
+    # One more turn keeps the same first kept message until the next block.
+    longer = fit_messages(messages + _history(1)[1:], "chat", budget)
+    assert longer[1] == fitted[1] or len(longer) < len(fitted)
+    assert fit_messages(_history(2), "chat", budget) == _history(2)
+
+
+def test_truncate_is_deterministic_and_counted():
+    previous = metrics.set_sink(metrics.InMemorySink())
+    try:
+        text = "alpha beta gamma " * 200
+        head = truncate(text, 50, "match")
+        tail = truncate(text, 50, "profile", keep="tail")
+        assert head == truncate(text, 50, "match")
+        assert estimate_tokens(head) <= 52 and head.endswith("[...]")
+        assert tail.startswith("[...]") and text.endswith(tail.split(" ", 1)[1])
+        counters = metrics.get_sink().snapshot()["counters"]
+        assert sum(c["value"] for c in counters if c["name"] == "prompt_truncations") >= 3
+    finally:
+        metrics.set_sink(previous)
+
+
+def test_call_sites_respect_budgets(tmp_path):
+    previous = prompt_budget.set_budget(
+        PromptBudget(limits={"chat": 1500, "match": 1000, "profile": 1000}, trim_step=2)
+    )
+    try:
+        huge = "detail " * 5000
+        prompt = build_prompt("A", "B", {"A": huge, "B": huge})
+        assert estimate_tokens(prompt) <= 1000
+
+        class CaptureAI:
+            def __init__(self):
+                self.calls = []
+
+            def get_response(self, messages):
+                self.calls.append(messages)
+                return "ok " * 100
+
+        ai = CaptureAI()
+        store = ProfileStore(base_dir=tmp_path)
+        store.profiles["Alice"] = huge
+        session = ChatSession(ai_client=ai, profile_store=store)
+        for _ in range(20):
+            session.send_client_message("Alice", "hello " * 100)
+        assert estimate_tokens(ai.calls[-2][0]["content"]) <= 1000
+        assert prompt_budget.estimate_messages(ai.calls[-1]) <= 1500
+    finally:
+        prompt_budget.set_budget(previous)
@@ -0,0 +1,72 @@
+from talkmatch import metrics, prompt_builder
+from talkmatch.chat import AMBASSADOR_SYSTEM_PROMPT, ChatSession
+from talkmatch.fake_openai import FakeOpenAI
+from talkmatch.matcher import build_prompt
+from talkmatch.prompts import BUILD_PROFILE_PROMPT
+from talkmatch.storage import ProfileStore
+from talkmatch.usage import UsageLedger
+
+
+class CaptureAI:
+    def __init__(self):
+        self.calls = []
+
+    def get_response(self, messages):
+        self.calls.append(list(messages))
+        return "<USER_INFO>likes hiking</USER_INFO>"
+
+
+def test_chat_prompt_prefix_is_stable_across_turns(tmp_path):
+    ai = CaptureAI()
+    session = ChatSession(ai_client=ai, profile_store=ProfileStore(base_dir=tmp_path))
+    session.ambassador.set_persona("Bob")
+    session.send_client_message("Alice", "Hi")
+    session.send_client_message("Alice", "How are you?")
+    first, second = ai.calls[1], ai.calls[3]
+    assert first[0]["content"] == AMBASSADOR_SYSTEM_PROMPT
+    # Everything but the trailing instruction is reused verbatim next turn.
+    assert second[: len(first) - 1] == first[:-1]
+    assert second[-1]["content"].startswith(prompt_builder.PERSONA_INSTRUCTIONS)
+
+
+def test_single_shot_prompts_put_variable_text_last():
+    a1 = build_prompt("A", "B", {"A": "profile a", "B": "profile b"})
+    a2 = build_prompt("A", "C", {"A": "profile a", "C": "profile c"})
+    shared = a1[: a1.index("Person B")]
+    assert a2.startswith(shared) and shared.startswith(prompt_builder.MATCH_INSTRUCTIONS)
+    prefix = prompt_builder.static_prefix(BUILD_PROFILE_PROMPT)
+    prompt = prompt_builder.profile_prompt(BUILD_PROFILE_PROMPT, "old", "new")
+    assert prompt.startswith(prefix) and "Return only the updated profile" in prefix
+
+
+def test_fake_backend_reports_cached_prefix_and_profile_merge():
+    backend = FakeOpenAI()
+    history = [{"role": "system", "content": "x" * 8000}]
+    create = backend.chat.completions.create
+    first = create(messages=history + [{"role": "user", "content": "hi"}])
+    second = create(messages=history + [{"role": "user", "content": "hello"}])
+    assert first.usage.prompt_tokens_details.cached_tokens == 0
+    assert second.usage.prompt_tokens_details.cached_tokens >= 1024
+    prompt = prompt_builder.profile_prompt(BUILD_PROFILE_PROMPT, "old", "new")
+    reply = backend.reply_for([{"role": "user", "content": prompt}])
+    assert reply == "<USER_INFO>old new</USER_INFO>"
+
+
+def test_tracker_and_ledger_report_cache_savings():
+    previous = metrics.set_sink(metrics.InMemorySink())
+    try:
+        tracker = prompt_builder.PrefixTracker()
+        history = [{"role": "system", "content": "x" * 8000}]
+        tracker.observe("chat", "A", history + [{"role": "user", "content": "a"}])
+        _, cacheable = tracker.observe("chat", "A", history + [{"role": "user", "content": "b"}])
+        assert cacheable >= 1024 and cacheable % 128 == 0
+        counters = {c["name"]: c["value"] for c in metrics.get_sink().snapshot()["counters"]}
+        assert counters["prompt_cacheable_tokens_estimated"] == cacheable
+    finally:
+        metrics.set_sink(previous)
+
+    ledger = UsageLedger()
+    ledger.record("chat", "A", 2000, 10, cached_tokens=1500)
+    summary = ledger.summary()["chat"]
+    assert summary["cache_hit_rate"] == 0.75
+    assert summary["savings"] > 0
@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from talkmatch.ai import AIClient, ai_call
+from talkmatch.fake_openai import FakeAPIError, FakeOpenAI
+from talkmatch.matcher import Matcher
+from talkmatch.resilience import (
+    AITimeoutError,
+    AIWorkersBusyError,
+    CircuitBreaker,
+    CircuitOpenError,
+    Resilience,
+    ResilientAIClient,
+    RetryPolicy,
+)
+
+
+class FlakyAI:
+    """Fail with the given status codes before answering."""
+
+    def __init__(self, failures, reply="ok"):
+        self.failures = list(failures)
+        self.reply = reply
+        self.calls = 0
+
+    def get_response(self, messages):
+        self.calls += 1
+        if self.failures:
+            raise FakeAPIError(self.failures.pop(0), "boom")
+        return self.reply
+
+
+def _resilience(**policy):
+    return Resilience(policy=RetryPolicy(**policy), sleep=lambda s: None, seed=1)
+
+
+def test_retries_transient_errors():
+    inner = FlakyAI([429, 503])
+    client = ResilientAIClient(inner, _resilience())
+    assert client.get_response([{"role": "user", "content": "hi"}]) == "ok"
+    assert inner.calls == 3
+
+
+def test_does_not_retry_client_errors():
+    inner = FlakyAI([400])
+    client = ResilientAIClient(inner, _resilience())
+    with pytest.raises(FakeAPIError):
+        client.get_response([])
+    assert inner.calls == 1
+
+
+def test_breaker_fast_fails_background_but_not_chat():
+    res = _resilience(max_attempts=1)
+    res.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    inner = FlakyAI([500])
+    client = ResilientAIClient(inner, res)
+    with pytest.raises(FakeAPIError):
+        client.get_response([])
+    with pytest.raises(CircuitOpenError):
+        with ai_call("match"):
+            client.get_response([])
+    assert inner.calls == 1
+    with ai_call("chat"):
+        assert client.get_response([]) == "ok"
+
+
+def test_timeout_and_hedging_for_interactive_calls():
+    release = threading.Event()
+
+    class SlowFirst:
+        def __init__(self):
+            self.calls = 0
+
+        def get_response(self, messages):
+            self.calls += 1
+            if self.calls == 1:
+                release.wait(2)
+            return f"reply {self.calls}"
+
+    res = _resilience(hedge_percentile=50, hedge_min_samples=1)
+    res.latency.add("chat", 0.01)
+    inner = SlowFirst()
+    client = ResilientAIClient(inner, res)
+    with ai_call("chat"):
+        started = time.perf_counter()
+        assert client.get_response([]) == "reply 2"
+    assert time.perf_counter() - started < 1
+    release.set()
+
+
+def test_matcher_survives_failed_pairs(tmp_path):
+    users = ["A", "B", "C"]
+    matcher = Matcher(users, path=tmp_path / "matrix.json")
+    ai = FlakyAI([400], reply="0.7")
+    matcher.calculate(ai)
+    assert matcher.remaining == [("A", "B")]
+    assert matcher.matrix["A"]["C"] == 0.7
+
+
+def test_ledger_attaches_through_wrapper():
+    wrapped = ResilientAIClient(AIClient(openai_client=FakeOpenAI()), _resilience())
+    assert wrapped.ledger is None
+    wrapped.ledger = "ledger"
+    assert wrapped.inner.ledger == "ledger"
+
+
+def test_timed_out_attempts_do_not_queue_later_calls():
+    release = threading.Event()
+
+    class Hanging:
+        def __init__(self):
+            self.calls = 0
+
+        def get_response(self, messages):
+            self.calls += 1
+            release.wait(5)
+            return "late"
+
+    res = Resilience(
+        policy=RetryPolicy(default_timeout=0.05, max_attempts=2),
+        workers=1,
+        sleep=lambda s: None,
+    )
+    inner = Hanging()
+    client = ResilientAIClient(inner, res)
+    started = time.perf_counter()
+    with pytest.raises(AITimeoutError):
+        client.get_response([])
+    # The retry found the only worker still busy and failed without queueing.
+    assert inner.calls == 1
+    assert time.perf_counter() - started < 1
+    release.set()
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+    breaker.record_failure()
+    assert not breaker.allow()
+    now[0] = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()  # The probe is still out.
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_busy_workers_do_not_open_the_breaker():
+    res = Resilience(
+        policy=RetryPolicy(max_attempts=2),
+        breaker=CircuitBreaker(failure_threshold=1),
+        workers=1,
+        sleep=lambda s: None,
+    )
+    inner = FlakyAI([])
+    client = ResilientAIClient(inner, res)
+    res.slots.acquire()  # Another call holds the only worker.
+    with ai_call("match"), pytest.raises(AIWorkersBusyError):
+        client.get_response([])
+    res.slots.release()
+    assert inner.calls == 0
+    assert res.breaker.state == "closed"
+    with ai_call("match"):
+        assert client.get_response([]) == "ok"
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from talkmatch.personas import Persona
+from talkmatch.scheduler import SchedulePolicy
+from talkmatch.session_manager import SessionManager
+
+
+class ScoringAI:
+    """Score every pair 0.8; optionally block until released."""
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.calls = 0
+
+    def get_response(self, messages):
+        self.calls += 1
+        if self.gate is not None:
+            self.gate.wait(5)
+        return "0.8"
+
+
+def _manager(tmp_path, ai, policy=None, names="ABC"):
+    return SessionManager(
+        personas=[Persona(n, n) for n in names],
+        base_dir=tmp_path,
+        ai_client_factory=lambda: ai,
+        filters=[],
+        schedule=policy,
+    )
+
+
+def _wait(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_runs_score_only_pairs_touching_new_or_changed_users(tmp_path):
+    ai = ScoringAI()
+    manager = _manager(tmp_path, ai, SchedulePolicy(push_interval=0))
+    pushed = []
+    manager.update_callback = pushed.append
+    scheduler = manager.scheduler
+
+    assert scheduler.run_once()
+    assert ai.calls == 3
+    assert len(pushed) >= 3  # Assignments were pushed while scoring.
+    assert manager.sessions["A"].ambassador.persona in {"B", "C"}
+
+    manager.profile_store.versions["A"] = 5
+    assert not scheduler.run_once()  # Changed, but waits for the interval.
+    scheduler.policy.interval = 0
+    assert scheduler.run_once()
+    assert ai.calls == 5
+
+    manager.add_user("D")
+    scheduler.policy.interval = 300
+    assert scheduler.run_once()  # A newly ready user matches right away.
+    assert ai.calls == 8
+    assert not scheduler.run_once()
+
+
+def test_background_runs_coalesce_and_cancel(tmp_path):
+    gate = threading.Event()
+    ai = ScoringAI(gate)
+    manager = _manager(tmp_path, ai, SchedulePolicy(poll=0.01, debounce=0), names="ABCD")
+    scheduler = manager.scheduler
+    scheduler.start()
+    try:
+        _wait(lambda: ai.calls == 1)
+        assert scheduler.running
+        scheduler.trigger()
+        scheduler.trigger()
+        assert scheduler.progress.coalesced == 2
+        scheduler.cancel()
+        gate.set()
+        _wait(lambda: scheduler.progress.cancelled == 1)
+        # The coalesced trigger runs once and finishes the cancelled pairs.
+        _wait(lambda: scheduler.progress.runs == 2 and not scheduler.running)
+        assert ai.calls == 6  # The pair in flight when cancelled is kept.
+        assert all(
+            manager.matcher.matrix[u][v] == 0.8 for u in "ABCD" for v in "ABCD" if u != v
+        )
+    finally:
+        manager.close()
+
+
+def test_clear_waits_for_the_run_in_flight(tmp_path):
+    gate = threading.Event()
+    ai = ScoringAI(gate)
+    manager = _manager(tmp_path, ai, SchedulePolicy(poll=0.01, debounce=0))
+    manager.scheduler.start()
+    try:
+        _wait(lambda: ai.calls == 1)
+        cleared = threading.Thread(target=manager.clear)
+        cleared.start()
+        time.sleep(0.05)
+        assert cleared.is_alive()  # Blocked until the cancelled run ends.
+        gate.set()
+        cleared.join(5)
+        assert not cleared.is_alive()
+        assert all(not any(manager.matcher.matrix[u].values()) for u in "ABC")
+        assert all(s.ambassador.persona is None for s in manager.sessions.values())
+    finally:
+        manager.close()
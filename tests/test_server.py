@@ -0,0 +1,124 @@
+import asyncio
+import base64
+import json
+import os
+
+from talkmatch.personas import Persona
+from talkmatch.server import ChatServer, _encode_frame, _read_frame, stub_client_factory
+from talkmatch.session_manager import SessionManager
+
+
+async def _http(port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode() if payload is not None else b""
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: x\r\nConnection: close\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode()
+        + body
+    )
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, data = raw.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(data)
+
+
+def _masked(payload):
+    mask = os.urandom(4)
+    data = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bytes([0x81, 0x80 | len(payload)]) + mask + data
+
+
+def test_http_routes_drive_session_manager(tmp_path):
+    manager = SessionManager(
+        personas=[Persona("A", "a"), Persona("B", "b")],
+        base_dir=tmp_path,
+        ai_client_factory=stub_client_factory(),
+        filters=[],
+    )
+
+    async def scenario():
+        server = ChatServer(manager, port=0)
+        await server.start()
+        results = await asyncio.gather(
+            _http(server.port, "POST", "/users/A/messages", {"text": "hi"}),
+            _http(server.port, "POST", "/users/C/messages", {"text": "new here"}),
+        )
+        calc = await _http(server.port, "POST", "/calculate")
+        missing = await _http(server.port, "GET", "/users/nobody")
+        await server.stop()
+        return results, calc, missing
+
+    results, calc, missing = asyncio.run(scenario())
+    assert [status for status, _ in results] == [200, 200]
+    assert results[0][1]["reply"]
+    assert "C" in manager.sessions
+    assert calc[0] == 200
+    assert calc[1]["matches"]["A"][0][0] in {"B", "C"}
+    assert missing[0] == 404
+
+
+def test_websocket_subscription_receives_matches(tmp_path):
+    manager = SessionManager(
+        personas=[Persona("A", "a"), Persona("B", "b")],
+        base_dir=tmp_path,
+        ai_client_factory=stub_client_factory(),
+        filters=[],
+    )
+
+    async def scenario():
+        server = ChatServer(manager, port=0)
+        await server.start()
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write(
+            "GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\n"
+            f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\n\r\n".encode()
+        )
+        head = await reader.readuntil(b"\r\n\r\n")
+        writer.write(_masked(json.dumps({"type": "subscribe"}).encode()))
+        _, first = await _read_frame(reader)
+        writer.write(_masked(json.dumps({"type": "message", "user": "A", "text": "yo"}).encode()))
+        frames = [json.loads((await _read_frame(reader))[1]) for _ in range(2)]
+        writer.write(_encode_frame(b"", opcode=0x8))
+        await reader.read()
+        writer.close()
+        await server.stop()
+        return head, json.loads(first), frames
+
+    head, first, frames = asyncio.run(scenario())
+    assert head.startswith(b"HTTP/1.1 101")
+    assert first["type"] == "subscribe"
+    kinds = {frame["type"] for frame in frames}
+    assert kinds == {"matches", "message"}
+
+
+def test_malformed_content_length_gets_400(tmp_path):
+    manager = SessionManager(
+        personas=[Persona("A", "a")],
+        base_dir=tmp_path,
+        ai_client_factory=stub_client_factory(),
+        filters=[],
+    )
+
+    async def send(port, length):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(
+            f"POST /calculate HTTP/1.1\r\nHost: x\r\nContent-Length: {length}\r\n\r\n".encode()
+        )
+        await writer.drain()
+        raw = await reader.read()
+        writer.close()
+        head, _, data = raw.partition(b"\r\n\r\n")
+        return int(head.split()[1]), json.loads(data)
+
+    async def scenario():
+        server = ChatServer(manager, port=0)
+        await server.start()
+        replies = [await send(server.port, length) for length in ("abc", "-5")]
+        await server.stop()
+        return replies
+
+    for status, body in asyncio.run(scenario()):
+        assert status == 400
+        assert "Content-Length" in body["error"]
@@ -0,0 +1,57 @@
+from talkmatch.personas import Persona
+from talkmatch.sharding import HashRing, ShardRouter
+
+
+class DummyAI:
+    def get_response(self, messages):
+        return "0.9"
+
+
+def test_hash_ring_spreads_keys_and_moves_few_on_resize():
+    keys = [f"user{i}" for i in range(2000)]
+    four, five = HashRing(range(4)), HashRing(range(5))
+    counts = [sum(four.node_for(k) == shard for k in keys) for shard in range(4)]
+    assert min(counts) > 300
+    moved = [k for k in keys if four.node_for(k) != five.node_for(k)]
+    assert len(moved) < len(keys) * 0.35
+    assert all(five.node_for(k) == 4 for k in moved)
+
+
+def _router(tmp_path, shards, personas=()):
+    return ShardRouter(
+        shards=shards,
+        personas=list(personas),
+        base_dir=tmp_path,
+        ai_client_factory=DummyAI,
+        link_threshold=1,
+        filters=[],
+    )
+
+
+def test_router_links_across_shards_and_rebalances(tmp_path):
+    ring = HashRing(range(2))
+    names = [f"u{i}" for i in range(50)]
+    a = next(n for n in names if ring.node_for(n) == 0)
+    b = next(n for n in names if ring.node_for(n) == 1)
+    router = _router(tmp_path, 2, [Persona(a, "a"), Persona(b, "b")])
+    try:
+        assert router.sessions == {a: 0, b: 1}
+        router.calculate()
+        assert router.matcher.matrix[a][b] == 0.9
+        assert router.status(a) == f"Ambassador [acting as {b}]"
+        router.send_message(a, "pizza")
+        router.send_message(b, "pizza")
+        assert router.status(a) == f"Ambassador [linked with {b}]"
+        assert router.status(b) == f"Ambassador [linked with {a}]"
+        router.resize(3)
+        assert router.history(a)[0] == {"role": "user", "content": "pizza"}
+    finally:
+        router.close()
+
+    restarted = _router(tmp_path, 1)
+    try:
+        assert set(restarted.sessions) == {a, b}
+        assert restarted.status(b) == f"Ambassador [linked with {a}]"
+        assert [p.name for p in (tmp_path / "shards").iterdir()] == ["0"]
+    finally:
+        restarted.close()
@@ -0,0 +1,29 @@
+from talkmatch.simulator import Simulation, generate_personas, percentile
+
+
+def test_generate_personas_is_reproducible():
+    first = generate_personas(50, seed=3)
+    second = generate_personas(50, seed=3)
+    assert [p.name for p in first] == [p.name for p in second]
+    assert len({p.name for p in first}) == 50
+    assert first[0].attributes["languages"]
+    assert first[0].attributes["age"] in first[0].description
+
+
+def test_percentile_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+def test_simulation_reports_pipeline_metrics(tmp_path):
+    report = Simulation(
+        users=12, turns=2, concurrency=4, calculate_interval=0, base_dir=tmp_path
+    ).run()
+    assert report.messages == 24
+    assert report.errors == 0
+    # Each turn updates the profile and asks for a chat reply.
+    assert report.api_calls_per_message == 2.0
+    assert report.bytes_written > 0
+    assert report.p50 <= report.p95 <= report.p99
@@ -0,0 +1,52 @@
+from talkmatch.personas import Persona
+from talkmatch.session_manager import SessionManager
+
+
+class CountingAI:
+    calls = 0
+
+    def get_response(self, messages):
+        CountingAI.calls += 1
+        return "0.9"
+
+
+def _manager(tmp_path, **kwargs):
+    return SessionManager(
+        personas=[Persona("A", "a"), Persona("B", "b")],
+        base_dir=tmp_path,
+        ai_client_factory=CountingAI,
+        filters=[],
+        link_threshold=1,
+        **kwargs,
+    )
+
+
+def test_restart_restores_state_without_ai_calls(tmp_path):
+    manager = _manager(tmp_path)
+    manager.add_user("C", "new", {"age": "30"})
+    manager.calculate()
+    manager.send_message("A", "pizza")
+    manager.send_message("B", "pizza")
+    assert manager.sessions["A"].ambassador.state == "linked"
+    manager.profile_store.defer("C", "later")
+    manager.flush()
+
+    CountingAI.calls = 0
+    restarted = _manager(tmp_path)
+    assert CountingAI.calls == 0
+    a = restarted.sessions["A"].ambassador
+    assert (a.state, a.persona, a.link_target) == ("linked", "B", "B")
+    assert restarted.sessions["C"].ambassador.state in {"acting", "collecting_info"}
+    assert [p.attributes for p in restarted.personas if p.name == "C"] == [{"age": "30"}]
+    assert restarted.profile_store.pending == {"C": ["later"]}
+    assert restarted.profile_store.versions["A"] >= 1
+    assert restarted.matcher.matrix["A"]["B"] == 0.9
+
+
+def test_snapshot_is_written_periodically(tmp_path):
+    manager = _manager(tmp_path, snapshot_interval=0.0)
+    manager.calculate()
+    (tmp_path / "snapshot.json").unlink()
+    manager.send_message("A", "hi")
+    assert (tmp_path / "snapshot.json").exists()
+    assert not _manager(tmp_path / "empty").restore()
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from talkmatch import metrics
+from talkmatch.chat import ChatSession
+from talkmatch.gui.dashboard import DashboardModel
+from talkmatch.gui.persona_controller import PersonaChatController
+from talkmatch.gui.ui_queue import UIDispatcher
+from talkmatch.personas import Persona
+from talkmatch.simulator import Simulation
+from talkmatch.speculation import Speculator
+from talkmatch.storage import ProfileStore
+
+
+class FakeChatBox:
+    def __init__(self):
+        self.shown = []
+
+    def after(self, ms, callback):
+        return 1
+
+    def after_cancel(self, job):
+        pass
+
+    def display_message(self, role, content):
+        self.shown.append((role, content))
+
+
+class CountingAI:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.calls = 0
+
+    def get_response(self, messages):
+        self.calls += 1
+        return f"{self.prefix} {self.calls}"
+
+
+def _wait(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_take_hits_only_for_the_speculated_state():
+    sink = metrics.InMemorySink()
+    previous = metrics.set_sink(sink)
+    try:
+        speculator = Speculator("test")
+        gate = threading.Event()
+        speculator.start(3, lambda: gate.wait(5) and "next")
+        gate.set()
+        assert speculator.take(3) == "next"  # Waits for the one in flight.
+        assert speculator.take(3) is None  # Used up.
+        speculator.start(4, lambda: "stale")
+        assert speculator.take(5) is None
+        speculator.start(5, lambda: "dropped")
+        speculator.invalidate()
+        assert speculator.take(5) is None
+        assert speculator.hit_rate == 0.25
+        speculator.close()
+        state = DashboardModel().update(sink.snapshot())
+        assert state.speculation_hit_rate == 0.25
+        assert "Speculation hits: 25%" in state.lines()
+    finally:
+        metrics.set_sink(previous)
+
+
+def test_controller_uses_speculation_until_the_user_types(tmp_path):
+    box = FakeChatBox()
+    dispatcher = UIDispatcher(box)
+    session = ChatSession(
+        ai_client=CountingAI("reply"), profile_store=ProfileStore(base_dir=tmp_path)
+    )
+    persona_ai = CountingAI("persona")
+    controller = PersonaChatController(
+        box, Persona("Ann", "likes tea"), session,
+        dispatcher=dispatcher, persona_ai=persona_ai, speculate=True,
+    )
+    session.messages.append({"role": "assistant", "content": "hi"})
+    controller.speculate()
+    _wait(lambda: persona_ai.calls == 1)
+    assert controller.next_message()
+    _wait(lambda: session.messages.count_role("assistant") == 2)
+    dispatcher.drain()
+    # The reply started the next speculation; the typed message drops it.
+    _wait(lambda: persona_ai.calls == 2)
+    assert controller.send_message("typed")
+    _wait(lambda: session.messages.count_role("assistant") == 3)
+    _wait(lambda: persona_ai.calls == 3)
+    assert controller.next_message()
+    _wait(lambda: session.messages.count_role("assistant") == 4)
+    dispatcher.drain()
+    persona_lines = [text for role, text in box.shown if role == "Ann"]
+    assert persona_lines == ["persona 1", "typed", "persona 3"]
+    assert controller.speculator.hits == 2
+    controller.close()
+
+
+def test_simulation_reports_speculation_hit_rate(tmp_path):
+    report = Simulation(
+        users=6, turns=3, concurrency=3, calculate_interval=0, base_dir=tmp_path,
+        speculate=True,
+    ).run()
+    assert report.messages == 18
+    assert report.speculation_hit_rate == 1.0
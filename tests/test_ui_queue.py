@@ -0,0 +1,102 @@
+import threading
+import time
+
+from talkmatch.chat import ChatSession
+from talkmatch.gui.persona_controller import PersonaChatController
+from talkmatch.gui.ui_queue import UIDispatcher, WorkQueue
+from talkmatch.personas import Persona
+from talkmatch.storage import ProfileStore
+
+
+class FakeWidget:
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, callback):
+        self.scheduled.append(callback)
+        return len(self.scheduled)
+
+    def after_cancel(self, job):
+        pass
+
+
+class FakeChatBox(FakeWidget):
+    def __init__(self):
+        super().__init__()
+        self.shown = []
+
+    def display_message(self, role, content):
+        self.shown.append((role, content))
+
+
+class GatedAI:
+    """Persona AI that blocks until released, counting its calls."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def get_response(self, messages):
+        self.calls += 1
+        self.release.wait(5)
+        return f"persona {self.calls}"
+
+
+class EchoAI:
+    def get_response(self, messages):
+        return "reply"
+
+
+def _wait(predicate):
+    deadline = time.monotonic() + 5
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_work_queue_refuses_tasks_beyond_its_bound():
+    gate = threading.Event()
+    work = WorkQueue(maxsize=2)
+    assert work.submit(lambda: gate.wait(5))
+    _wait(lambda: work.pending() == 0)
+    assert work.submit(lambda: None)
+    assert work.submit(lambda: None)
+    assert not work.submit(lambda: None)
+    gate.set()
+    work.close()
+
+
+def test_dispatcher_runs_posted_callbacks_in_one_frame():
+    widget = FakeWidget()
+    dispatcher = UIDispatcher(widget)
+    seen = []
+    for i in range(5):
+        dispatcher.post(lambda i=i: seen.append(i))
+    widget.scheduled.pop()()
+    assert seen == [0, 1, 2, 3, 4]
+    assert len(widget.scheduled) == 1  # Polling continues.
+
+
+def test_superseded_persona_generations_are_cancelled(tmp_path):
+    box = FakeChatBox()
+    dispatcher = UIDispatcher(box)
+    session = ChatSession(ai_client=EchoAI(), profile_store=ProfileStore(base_dir=tmp_path))
+    controller = PersonaChatController(
+        box, Persona("Ann", "likes tea"), session, dispatcher=dispatcher, persona_ai=GatedAI()
+    )
+    controller.next_message()
+    _wait(lambda: controller.persona_ai.calls == 1)
+    controller.next_message()
+    controller.next_message()
+    controller.persona_ai.release.set()
+    _wait(lambda: controller.work_queue.pending() == 0 and controller.persona_ai.calls == 2)
+    _wait(lambda: session.messages.count_role("assistant") == 1)
+    dispatcher.drain()
+    # The first call was superseded while in flight, the second never ran.
+    assert box.shown == [("Ann", "persona 2"), (session.ambassador_label(), "reply")]
+
+    assert controller.send_message("hello")
+    _wait(lambda: session.messages.count_role("assistant") == 2)
+    dispatcher.drain()
+    assert box.shown[-2:] == [("Ann", "hello"), (session.ambassador_label(), "reply")]
+    controller.close()
@@ -0,0 +1,62 @@
+from talkmatch.ai import AIClient
+from talkmatch.fake_openai import FakeOpenAI
+from talkmatch.personas import Persona
+from talkmatch.session_manager import SessionManager
+from talkmatch.storage import UsageStore
+from talkmatch.usage import Budget, UsageLedger
+
+
+def test_ledger_attributes_usage_and_persists(tmp_path):
+    store = UsageStore(tmp_path / "usage.json")
+    ledger = UsageLedger(store=store, clock=lambda: 7200.0)
+    ledger.record("chat", "A", 100, 20)
+    ledger.record("match", None, 50, 1)
+    assert ledger.tokens() == 171
+    assert ledger.tokens("chat") == 120
+    assert ledger.user_hour("A") == 120
+    assert ledger.global_hour() == 171
+    assert ledger.cost() > 0
+    ledger.flush()
+
+    reloaded = UsageLedger(store=UsageStore(tmp_path / "usage.json"), clock=lambda: 7200.0)
+    assert reloaded.by_user["A"]["calls"] == 1
+    assert reloaded.user_hour("A") == 120
+
+
+def _manager(tmp_path, budget):
+    backend = FakeOpenAI()
+    return SessionManager(
+        personas=[Persona("A", "a"), Persona("B", "b"), Persona("C", "c")],
+        base_dir=tmp_path,
+        ai_client_factory=lambda: AIClient(openai_client=backend),
+        filters=[],
+        budget=budget,
+    ), backend
+
+
+def test_profile_rebuild_deferred_when_user_over_budget(tmp_path):
+    manager, backend = _manager(tmp_path, Budget(per_user_hour=1))
+    manager.send_message("A", "first")
+    manager.send_message("A", "second")
+    assert backend.calls["profile"] == 1
+    assert manager.profile_store.pending == {"A": ["second"]}
+
+    manager.budget.per_user_hour = None
+    manager.run_deferred()
+    assert backend.calls["profile"] == 2
+    assert "second" in manager.profile_store.read("A")
+    assert manager.profile_store.pending == {}
+
+
+def test_calculate_budget_defers_remaining_pairs(tmp_path):
+    manager, backend = _manager(tmp_path, Budget(per_calculate=1))
+    manager.calculate()
+    assert backend.calls["match"] == 1
+    assert manager.deferred_calculate
+    assert len(manager.matcher.remaining) == 2
+
+    manager.budget.per_calculate = None
+    manager.run_deferred()
+    assert backend.calls["match"] == 3
+    assert not manager.deferred_calculate
+    assert manager.usage.tokens("match") > 0